@@ -36,17 +36,69 @@ import requests
 
 from splunk.persistconn.application import PersistentServerConnectionApplication
 import json
+from warmup import Warmup, is_status_request, prime_http_session, read_app_setting, warmup_enabled
 
 ADDON_NAME = 'cim-plicity'
 
 logfile = os.sep.join([os.environ['SPLUNK_HOME'], 'var', 'log', 'splunk', f'{ADDON_NAME}.log'])
 logging.basicConfig(filename=logfile,level=logging.DEBUG)
 
+# Regex for common patterns used by the local field extraction fallback
+LOCAL_FIELD_PATTERNS = {
+    'timestamp': r'(?P<timestamp>\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?Z?)',
+    'ip_address': r'(?P<ip_address>(?:[0-9]{1,3}\.){3}[0-9]{1,3})',
+    'log_level': r'(?P<log_level>INFO|WARN|WARNING|ERROR|DEBUG|FATAL|CRITICAL)',
+    'email': r'(?P<email>[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})',
+}
+
+# Key-value pairs
+# This regex is simplified; a more robust one might be needed for complex cases
+LOCAL_KV_PATTERN = r'([a-zA-Z0-9_]+)=("([^"]*)"|([^\s,]+))'
+
+# Common timestamp patterns
+TIMESTAMP_PATTERNS = [
+    (r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}', '%Y-%m-%dT%H:%M:%S'),  # ISO 8601
+    (r'\w{3} \d{1,2} \d{2}:\d{2}:\d{2}', '%b %d %H:%M:%S'),  # Syslog
+    (r'\d{1,2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2}', '%d/%b/%Y:%H:%M:%S'),  # Apache
+    (r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}', '%Y-%m-%d %H:%M:%S'),  # Standard
+]
+
+_compiled_catalogs = None
+
+
+def compile_pattern_catalogs():
+    """Compile the local extraction and timestamp catalogs once per process."""
+    global _compiled_catalogs
+    if _compiled_catalogs is None:
+        _compiled_catalogs = {
+            'fields': {name: re.compile(pattern) for name, pattern in LOCAL_FIELD_PATTERNS.items()},
+            'kv': re.compile(LOCAL_KV_PATTERN),
+            'timestamps': [(re.compile(pattern), format_str) for pattern, format_str in TIMESTAMP_PATTERNS],
+        }
+    return _compiled_catalogs
+
 
 class AiDetection(PersistentServerConnectionApplication):
     def __init__(self, _command_line, _command_arg):
         super(PersistentServerConnectionApplication, self).__init__()
         self.service = None
+        # Reused across requests so the connection to the LLM endpoint stays pooled
+        self.http_session = requests.Session()
+        self.warmup = Warmup('ai_detection')
+        if warmup_enabled('ai_detection'):
+            self.warmup.start(self.warm_up)
+
+    def warm_up(self):
+        """
+        Compile the regex catalogs and open a connection to the configured LLM endpoint.
+        """
+        catalogs = compile_pattern_catalogs()
+        api_endpoint = read_app_setting('ai_configuration', 'api_endpoint')
+        primed = prime_http_session(self.http_session, api_endpoint) if api_endpoint else False
+        return {
+            'patterns': len(catalogs['fields']) + len(catalogs['timestamps']) + 1,
+            'http_session_primed': primed,
+        }
 
     def get_ai_secret(self):
         """
@@ -124,7 +176,7 @@ class AiDetection(PersistentServerConnectionApplication):
                 model = 'anthropic/claude-3-5-sonnet-20241022'
             logging.info(f"Using model: {model}")
 
-            response = requests.post(
+            response = self.http_session.post(
                 url=account_conf_file.get("ai_configuration").get("api_endpoint"),
                 headers={
                     "Authorization": f"Bearer {api_key}",
@@ -210,21 +262,14 @@ class AiDetection(PersistentServerConnectionApplication):
     def local_field_extraction(self, sample_data):
         logging.info("Performing local field extraction.")
         fields = []
-        # Regex for common patterns
-        patterns = {
-            'timestamp': r'(?P<timestamp>\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?Z?)',
-            'ip_address': r'(?P<ip_address>(?:[0-9]{1,3}\.){3}[0-9]{1,3})',
-            'log_level': r'(?P<log_level>INFO|WARN|WARNING|ERROR|DEBUG|FATAL|CRITICAL)',
-            'email': r'(?P<email>[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})',
-        }
+        catalogs = compile_pattern_catalogs()
 
-        for name, pattern in patterns.items():
-            if re.search(pattern, sample_data):
-                fields.append({'name': name, 'regex': pattern})
+        for name, compiled_pattern in catalogs['fields'].items():
+            if compiled_pattern.search(sample_data):
+                fields.append({'name': name, 'regex': LOCAL_FIELD_PATTERNS[name]})
 
         # Key-value pairs
-        # This regex is simplified; a more robust one might be needed for complex cases
-        kv_matches = re.finditer(r'([a-zA-Z0-9_]+)=("([^"]*)"|([^\s,]+))', sample_data)
+        kv_matches = catalogs['kv'].finditer(sample_data)
         for match in kv_matches:
             field_name = match.group(1)
             # Avoid adding duplicates from the generic patterns above
@@ -238,16 +283,8 @@ class AiDetection(PersistentServerConnectionApplication):
         time_prefix = ""
         max_lookahead = "25"
         
-        # Common timestamp patterns
-        timestamp_patterns = [
-            (r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}', '%Y-%m-%dT%H:%M:%S'),  # ISO 8601
-            (r'\w{3} \d{1,2} \d{2}:\d{2}:\d{2}', '%b %d %H:%M:%S'),  # Syslog
-            (r'\d{1,2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2}', '%d/%b/%Y:%H:%M:%S'),  # Apache
-            (r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}', '%Y-%m-%d %H:%M:%S'),  # Standard
-        ]
-        
-        for pattern, format_str in timestamp_patterns:
-            if re.search(pattern, sample_data):
+        for compiled_pattern, format_str in catalogs['timestamps']:
+            if compiled_pattern.search(sample_data):
                 time_format = format_str
                 break
         
@@ -323,6 +360,8 @@ class AiDetection(PersistentServerConnectionApplication):
         """
         logging.info("Starting AI detection rest handler")
         inbound_payload = json.loads(in_string)
+        if is_status_request(inbound_payload):
+            return {'payload': {'warmup': self.warmup.status()}, 'status': 200}
         self.system_session_key = inbound_payload['system_authtoken']
         self.user_name = inbound_payload['session']['user']
         try:
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Throughput and recall benchmark for the PII detection backends.
+Runs the scrubadub and Presidio backends over the same synthetic corpus of
+events with planted PII and reports events/s, MB/s and recall per type.
+A finding counts towards recall when its type matches the planted type and
+its span overlaps the planted span.
+
+Usage:
+    python benchmark_pii_backends.py
+    python benchmark_pii_backends.py --events 5000 --batch-size 64
+    python benchmark_pii_backends.py --backends presidio --spacy-model en_core_web_lg --output backends.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+# Add the lib directory to the path so we can import our modules
+lib_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib'))
+if lib_path not in sys.path:
+    sys.path.insert(0, lib_path)
+
+from pii_detection_logic import PiiDetectionLogic, BACKENDS
+
+FIRST_NAMES = ['John', 'Maria', 'Wei', 'Aisha', 'Lars', 'Priya', 'Tom', 'Elena']
+LAST_NAMES = ['Smith', 'Garcia', 'Chen', 'Okafor', 'Jensen', 'Patel', 'Brown', 'Rossi']
+
+# Planted value generators, keyed by the type both backends report
+GENERATORS = {
+    'email': lambda rnd: f"{rnd.choice(FIRST_NAMES).lower()}.{rnd.choice(LAST_NAMES).lower()}@example.com",
+    'phone': lambda rnd: f"({rnd.randint(201, 989)}) {rnd.randint(200, 999)}-{rnd.randint(1000, 9999)}",
+    'credit_card': lambda rnd: rnd.choice(['4111 1111 1111 1111', '5500 0000 0000 0004', '3400 000000 00009']),
+    'social_security_number': lambda rnd: f"{rnd.randint(100, 665)}-{rnd.randint(10, 99)}-{rnd.randint(1000, 9999)}",
+    'IpAddressDetector': lambda rnd: f"{rnd.randint(1, 223)}.{rnd.randint(0, 255)}.{rnd.randint(0, 255)}.{rnd.randint(1, 254)}",
+    'url': lambda rnd: f"https://portal.example.com/users/{rnd.randint(1000, 9999)}",
+    'name': lambda rnd: f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}",
+}
+
+TEMPLATES = [
+    '{ts} INFO auth: login succeeded for user {name} email={email} src={IpAddressDetector}',
+    '{ts} WARN billing: card {credit_card} declined, customer contacted on {phone}',
+    '{{"time": "{ts}", "level": "INFO", "ssn": "{social_security_number}", "referrer": "{url}"}}',
+    '{IpAddressDetector} - - [{ts}] "GET /profile?email={email} HTTP/1.1" 200 512',
+    '{ts} DEBUG request_id={request_id} duration_ms={duration} status=ok',
+]
+
+
+def build_corpus(count: int, seed: int = 7):
+    """
+    Build events with planted PII.
+    Returns:
+        tuple: (events, labels) where labels[i] is a list of (type, start, end)
+    """
+    rnd = random.Random(seed)
+    events, labels = [], []
+    for index in range(count):
+        template = TEMPLATES[index % len(TEMPLATES)]
+        values = {name: generate(rnd) for name, generate in GENERATORS.items()}
+        values.update(ts=f"2024-05-{rnd.randint(10, 28)}T12:{rnd.randint(10, 59)}:00Z",
+                      request_id=f"{rnd.getrandbits(32):08x}", duration=rnd.randint(1, 900))
+        event = template.format(**values)
+        planted = []
+        for name in GENERATORS:
+            if '{' + name + '}' in template:
+                start = event.find(values[name])
+                planted.append((name, start, start + len(values[name])))
+        events.append(event)
+        labels.append(planted)
+    return events, labels
+
+
+def recall_by_type(labels, results):
+    """Count planted values found per type."""
+    recall = {}
+    for planted, event_result in zip(labels, results):
+        for pii_type, start, end in planted:
+            counts = recall.setdefault(pii_type, {'planted': 0, 'found': 0})
+            counts['planted'] += 1
+            if any(res['type'] == pii_type and res['start'] < end and start < res['end']
+                   for res in event_result['pii_results']):
+                counts['found'] += 1
+    for counts in recall.values():
+        counts['recall'] = round(counts['found'] / counts['planted'], 3) if counts['planted'] else None
+    return recall
+
+
+def run_backend(backend: str, events, labels, backend_options):
+    """Warm the backend up on one event, then time a batch scan of the corpus."""
+    logic = PiiDetectionLogic(backend=backend, backend_options=backend_options)
+    warm_start = time.perf_counter()
+    warm = logic.detect_pii_batch(events[:1])
+    warmup_s = time.perf_counter() - warm_start
+    if 'error' in warm:
+        return {'backend': backend, 'error': warm['error']}
+
+    start = time.perf_counter()
+    results = logic.detect_pii_batch(events)
+    elapsed = time.perf_counter() - start
+    if 'error' in results:
+        return {'backend': backend, 'error': results['error']}
+
+    recall = recall_by_type(labels, results['results'])
+    planted = sum(counts['planted'] for counts in recall.values())
+    found = sum(counts['found'] for counts in recall.values())
+    size_mb = sum(len(event) for event in events) / (1024 * 1024)
+    return {
+        'backend': backend,
+        'warmup_s': round(warmup_s, 3),
+        'seconds': round(elapsed, 3),
+        'events_per_s': round(len(events) / elapsed, 1) if elapsed else None,
+        'mb_per_s': round(size_mb / elapsed, 3) if elapsed else None,
+        'total_detected': results['total_detected'],
+        'recall': round(found / planted, 3) if planted else None,
+        'recall_by_type': recall,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare PII backends on throughput and recall')
+    parser.add_argument('--backends', type=str, default=','.join(BACKENDS), help='Comma-separated backends to run')
+    parser.add_argument('--events', type=int, default=2000, help='Number of synthetic events')
+    parser.add_argument('--seed', type=int, default=7, help='Corpus random seed')
+    parser.add_argument('--spacy-model', type=str, help='spaCy model for the presidio backend')
+    parser.add_argument('--batch-size', type=int, help='nlp.pipe batch size for the presidio backend')
+    parser.add_argument('--output', type=str, help='Write results as JSON to this file')
+
+    args = parser.parse_args()
+
+    backend_options = {}
+    if args.spacy_model:
+        backend_options['spacy_model'] = args.spacy_model
+    if args.batch_size:
+        backend_options['nlp_batch_size'] = args.batch_size
+
+    events, labels = build_corpus(args.events, args.seed)
+    print(f"🔍 Benchmarking {args.backends} on {len(events)} events")
+    print()
+
+    report = []
+    for backend in args.backends.split(','):
+        result = run_backend(backend, events, labels, backend_options)
+        report.append(result)
+        if 'error' in result:
+            print(f"❌ {backend}: {result['error']}")
+            continue
+        print(f"✅ {backend}: {result['events_per_s']} events/s, {result['mb_per_s']} MB/s, "
+              f"recall {result['recall']} (warm-up {result['warmup_s']}s)")
+        for pii_type, counts in sorted(result['recall_by_type'].items()):
+            print(f"   - {pii_type:25} {counts['found']:>6}/{counts['planted']:<6} recall {counts['recall']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(report, output, indent=2)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the PII handler.
+Each module import and detector build is timed in a fresh interpreter, so the
+numbers match what the first request after splunkd spawns the persistent
+process pays. Exits non-zero when any measurement exceeds its budget.
+
+Usage:
+    python benchmark_startup.py
+    python benchmark_startup.py --budget scrubadub=1500 --budget detector:TextBlobNameDetector=3000
+    $SPLUNK_HOME/bin/python3 benchmark_startup.py --output startup.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+import configparser
+
+lib_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib'))
+default_conf = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'default', 'cim-plicity_settings.conf'))
+
+# Modules on the PII handler's import path, cheapest first
+DEFAULT_MODULES = ['lazy_imports', 'pii_result_cache', 'pii_detection_logic', 'scrubadub', 'ip_address_detector']
+
+# Budgets in milliseconds; anything not listed falls back to --default-budget
+DEFAULT_BUDGETS_MS = {
+    'lazy_imports': 50,
+    'pii_result_cache': 50,
+    'pii_detection_logic': 150,
+    'scrubadub': 2000,
+    'ip_address_detector': 2000,
+}
+
+SNIPPET = """
+import sys, time, json
+sys.path.insert(0, {lib_path!r})
+{setup}
+start = time.perf_counter()
+{statement}
+print(json.dumps((time.perf_counter() - start) * 1000))
+"""
+
+
+def configured_detectors(conf_path: str):
+    """Read pii_detectors from cim-plicity_settings.conf."""
+    parser = configparser.ConfigParser(strict=False, interpolation=None)
+    parser.read(conf_path)
+    value = parser.get('ai_configuration', 'pii_detectors', fallback='')
+    return [name for name in value.split('|') if name]
+
+
+def time_in_subprocess(python: str, statement: str, setup: str = '') -> float:
+    """Run statement in a fresh interpreter and return its duration in ms."""
+    code = SNIPPET.format(lib_path=lib_path, setup=setup, statement=statement)
+    completed = subprocess.run([python, '-c', code], capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr else 'failed')
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark(python: str, modules, detectors, budgets, default_budget: float):
+    """
+    Measure import and detector build times against their budgets.
+    Returns:
+        list: One dict per measurement with name, ms, budget_ms and status
+    """
+    measurements = []
+    for module in modules:
+        measurements.append((module, f'import {module}', ''))
+    for detector in detectors:
+        # Detectors are timed after scrubadub is loaded, so only their own cost counts
+        measurements.append((f'detector:{detector}',
+                             f'pii_detection_logic.build_detector({detector!r})',
+                             'import pii_detection_logic, scrubadub'))
+
+    results = []
+    for name, statement, setup in measurements:
+        budget = budgets.get(name, default_budget)
+        try:
+            elapsed = time_in_subprocess(python, statement, setup)
+            status = 'ok' if elapsed <= budget else 'over_budget'
+        except RuntimeError as e:
+            elapsed, status = None, f'error: {e}'
+        results.append({'name': name, 'ms': elapsed, 'budget_ms': budget, 'status': status})
+    return results
+
+
+def parse_budgets(values):
+    budgets = dict(DEFAULT_BUDGETS_MS)
+    for value in values or []:
+        name, _, limit = value.rpartition('=')
+        budgets[name] = float(limit)
+    return budgets
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark PII handler cold-start imports')
+    parser.add_argument('--python', default=sys.executable, help='Interpreter to benchmark (e.g. $SPLUNK_HOME/bin/python3)')
+    parser.add_argument('--modules', type=str, help='Comma-separated modules to time')
+    parser.add_argument('--detectors', type=str, help='Comma-separated detectors to time (default: pii_detectors from default conf)')
+    parser.add_argument('--budget', action='append', help='Budget as name=ms; detectors use detector:<name>=ms')
+    parser.add_argument('--default-budget', type=float, default=1000, help='Budget in ms for anything without its own')
+    parser.add_argument('--output', type=str, help='Write results as JSON to this file')
+
+    args = parser.parse_args()
+
+    modules = args.modules.split(',') if args.modules else DEFAULT_MODULES
+    detectors = args.detectors.split(',') if args.detectors else configured_detectors(default_conf)
+    results = run_benchmark(args.python, modules, detectors, parse_budgets(args.budget), args.default_budget)
+
+    print(f"{'name':55} {'ms':>10} {'budget':>10}  status")
+    for result in results:
+        elapsed = f"{result['ms']:.1f}" if result['ms'] is not None else '-'
+        print(f"{result['name']:55} {elapsed:>10} {result['budget_ms']:>10.0f}  {result['status']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(results, output, indent=2)
+
+    failures = [result for result in results if result['status'] != 'ok']
+    if failures:
+        print(f"✗ {len(failures)} measurement(s) over budget or failed")
+        sys.exit(1)
+    print("✓ All imports within budget")
@@ -35,12 +35,16 @@ new_paths.append(os.path.join(dirname(dirname(__file__)), "lib"))
 new_paths.insert(0, os.path.sep.join([os.path.dirname(__file__), ta_name]))
 sys.path = new_paths
 
+from warmup import Warmup, is_status_request, prime_http_session, warmup_enabled
+
 ADDON_NAME = 'cim-plicity'
 
 # Setup logging
 logfile = os.sep.join([os.environ['SPLUNK_HOME'], 'var', 'log', 'splunk', f'{ADDON_NAME}_cim_mapping.log'])
 logging.basicConfig(filename=logfile, level=logging.DEBUG)
 
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+
 # Define CIM fields statically within the script
 CIM_FIELDS = {
     "authentication": [
@@ -74,6 +78,17 @@ class CimMappingHandler(PersistentServerConnectionApplication):
     def __init__(self, _command_line, _command_arg):
         super(CimMappingHandler, self).__init__()
         self.service = None
+        # Reused across requests so the connection to OpenRouter stays pooled
+        self.http_session = requests.Session()
+        self.warmup = Warmup('cim_mapping')
+        if warmup_enabled('cim_mapping'):
+            self.warmup.start(self.warm_up)
+
+    def warm_up(self):
+        """
+        Open a connection to OpenRouter ahead of the first mapping request.
+        """
+        return {'http_session_primed': prime_http_session(self.http_session, OPENROUTER_URL)}
 
     def get_ai_secret(self):
         try:
@@ -128,8 +143,8 @@ class CimMappingHandler(PersistentServerConnectionApplication):
 
         try:
             logging.info(f"Sending CIM mapping request to OpenRouter for model: {cim_model}")
-            response = requests.post(
-                url="https://openrouter.ai/api/v1/chat/completions",
+            response = self.http_session.post(
+                url=OPENROUTER_URL,
                 headers={
                     "Authorization": f"Bearer {api_key}",
                     "X-Title": "Cim-plicity-CIM-Mapping",
@@ -175,6 +190,8 @@ class CimMappingHandler(PersistentServerConnectionApplication):
         logging.info("Starting CIM Mapping REST handler")
         try:
             inbound_payload = json.loads(in_string)
+            if is_status_request(inbound_payload):
+                return {'payload': {'warmup': self.warmup.status()}, 'status': 200}
             self.system_session_key = inbound_payload.get('system_authtoken')
             
             if not self.system_session_key:
@@ -38,19 +38,26 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..',
 # print(sys.path)
 
 import logging
-from splunktaucclib.splunk_aoblib.setup_util import Setup_Util
-from solnlib import conf_manager
-from base64 import b64encode
-import splunk.entity
-import splunk.Intersplunk
-import splunklib.client as client
-import splunklib.results as results
+# Only what the PII path uses is imported here; scrubadub and its detectors load lazily on first use
+from solnlib import conf_manager, utils
 
 from splunk.persistconn.application import PersistentServerConnectionApplication
 import json
 
 # Import the abstracted PII detection logic
-from pii_detection_logic import PiiDetectionLogic
+from pii_detection_logic import (
+    PiiDetectionLogic, DETECTOR_REGISTRY, PATTERN_CACHE, DEFAULT_PARALLEL_THRESHOLD, BACKENDS,
+    compile_entity_type_patterns
+)
+from pii_result_cache import DEFAULT_LINE_CACHE_SIZE, LineResultCache, ResultCache
+from presidio_backend import SETTING_KEYS as PRESIDIO_SETTING_KEYS
+from lazy_imports import import_times
+from pii_diagnostics import DETECTOR_HISTOGRAMS
+from regex_safety import DEFAULT_PATTERN_TIMEOUT_MS
+from pii_validators import DEFAULT_VALIDATION_MODE, VALIDATION_MODES
+from pii_sampling import DEFAULT_CONFIDENCE, DEFAULT_SAMPLE_SIZE, SAMPLING_METHODS
+from rule_cost import DEFAULT_EPS
+from warmup import Warmup, is_status_request, read_app_setting, warmup_enabled
 
 logfile = os.sep.join([os.environ['SPLUNK_HOME'], 'var', 'log', 'splunk', 'cim-plicity.log'])
 logging.basicConfig(filename=logfile,level=logging.DEBUG)
@@ -58,6 +65,17 @@ logging.info(sys.path)
 
 ADDON_NAME = 'cim-plicity'
 
+# Keys of the detection results passed back to the client
+RESPONSE_KEYS = ('pii_results', 'pii_groups', 'results', 'summary', 'suggestion', 'diagnostics',
+                 'partial', 'cut_detectors', 'coverage', 'rejected_patterns', 'validation',
+                 'sampling', 'prevalence', 'redact_preview', 'rule_cost')
+
+# Results survive persistent-process restarts here when result_cache_persist is enabled
+RESULT_CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'local', 'pii_result_cache'))
+RESULT_CACHE = ResultCache()
+# Per-line scan results, so re-running detection on an edited sample only scans the edited lines
+LINE_CACHE = LineResultCache()
+
 class PiiDetection(PersistentServerConnectionApplication):
     """
     PersistentServerConnectionApplication for PII detection using scrubadub.
@@ -66,6 +84,33 @@ class PiiDetection(PersistentServerConnectionApplication):
 
     def __init__(self, _command_line: Any, _command_arg: Any) -> None:
         super(PersistentServerConnectionApplication, self).__init__()
+        # Opt-in: preload detectors in the background so the first request doesn't pay for it
+        self.warmup = Warmup('pii_detection')
+        if warmup_enabled('pii_detection'):
+            self.warmup.start(self.warm_up)
+
+    def warm_up(self) -> Dict[str, Any]:
+        """Build the configured detector set (or load the spaCy model) and compile the entity type patterns."""
+        patterns = compile_entity_type_patterns()
+        if read_app_setting('pii_detection', 'pii_backend', 'scrubadub') == 'presidio':
+            from presidio_backend import backend_from_settings
+            backend_from_settings({key: read_app_setting('pii_detection', key) for key in PRESIDIO_SETTING_KEYS}).load()
+            return {
+                'backend': 'presidio',
+                'patterns': len(patterns),
+                'import_times_ms': import_times(),
+            }
+        configured = read_app_setting('ai_configuration', 'pii_detectors', '')
+        selected_detectors = configured.split('|') if configured else PiiDetectionLogic().selected_detectors
+        DETECTOR_REGISTRY.refresh(selected_detectors)
+        detectors = DETECTOR_REGISTRY.get_detectors(selected_detectors)
+        DETECTOR_REGISTRY.get_scrubber(selected_detectors)
+        return {
+            'backend': 'scrubadub',
+            'detectors': len(detectors),
+            'patterns': len(patterns),
+            'import_times_ms': import_times(),
+        }
 
     def get_pii_detection_data(self, search_string: str) -> None:
         """Placeholder for future implementation."""
@@ -91,6 +136,19 @@ class PiiDetection(PersistentServerConnectionApplication):
             ]
         return selected_detectors
     
+    def get_pii_settings(self) -> Dict[str, Any]:
+        """Read the optional [pii_detection] stanza of cim-plicity_settings.conf."""
+        try:
+            cfm = conf_manager.ConfManager(
+                    self.system_session_key,
+                    ADDON_NAME,
+                    realm=f"__REST_CREDENTIAL__#{ADDON_NAME}#configs/conf-cim-plicity_settings",
+            )
+            return cfm.get_conf("cim-plicity_settings").get("pii_detection") or {}
+        except Exception as e:
+            logging.warning(f"Could not read pii_detection settings, using defaults: {e}")
+            return {}
+    
     # Handle a syncronous from splunkd.
     def handle(self, in_string: str) -> Union[str, Dict[str, Any]]:
         """
@@ -112,45 +170,174 @@ class PiiDetection(PersistentServerConnectionApplication):
             logging.error("Input is not a dictionary.")
             return {'payload': {'error': 'Input must be a JSON object.'}, 'status': 400}
         logging.info(f"Payload keys: {list(inbound_payload.keys())}")
+        if is_status_request(inbound_payload):
+            return {'payload': {'warmup': self.warmup.status(), 'detector_histograms': DETECTOR_HISTOGRAMS.summary()}, 'status': 200}
         # Mask PII in logs: only log text length and hash
         posted_data = None
         text_to_analyze = ''
+        events = None
         try:
             posted_data = json.loads(inbound_payload.get('payload', '{}'))
             text_to_analyze = posted_data.get('text', '')
+            events = posted_data.get('events')
         except Exception as e:
             logging.error(f"Malformed payload: {e}")
             return {'payload': {'error': 'Malformed payload, must be valid JSON.'}, 'status': 400}
+        if events is not None:
+            if not isinstance(events, list) or not all(isinstance(event, str) for event in events):
+                logging.warning("Events must be a list of strings.")
+                return {'payload': {'error': 'events must be a list of strings'}, 'status': 400}
+            if not events:
+                logging.warning("No events provided for PII detection.")
+                return {'payload': {'error': 'No events provided for PII detection'}, 'status': 400}
+            text_to_analyze = '\n'.join(events)
         if not text_to_analyze:
             logging.warning("No text provided for PII detection.")
             return {'payload': {'error': 'No text provided for PII detection'}, 'status': 400}
-        text_hash = hashlib.sha256(text_to_analyze.encode('utf-8')).hexdigest()
-        logging.info(f"Text to analyze: length={len(text_to_analyze)}, sha256={text_hash}")
+        # Hash the event list itself so ["a\nb"] and ["a", "b"] don't share cache entries
+        hashed_input = json.dumps(events) if events is not None else text_to_analyze
+        text_hash = hashlib.sha256(hashed_input.encode('utf-8')).hexdigest()
+        logging.info(f"Text to analyze: length={len(text_to_analyze)}, events={len(events) if events else 1}, sha256={text_hash}")
         
         # Use the abstracted PII detection logic
         try:
             selected_detectors = self.get_detectors_list()
             logging.info(f"Selected detectors: {selected_detectors}")
+            # Drop cached detectors if pii_detectors changed since the last request
+            DETECTOR_REGISTRY.refresh(selected_detectors)
             
             # Extract custom patterns from the request
             custom_patterns = posted_data.get('custom_patterns', [])
             logging.info(f"Custom patterns: {custom_patterns}")
             
+            pii_settings = self.get_pii_settings()
+            backend = pii_settings.get('pii_backend') or 'scrubadub'
+            if backend not in BACKENDS:
+                return {'payload': {'error': f"Unknown pii_backend '{backend}'. Expected one of: {', '.join(BACKENDS)}"}, 'status': 400}
+            backend_options = {key: pii_settings.get(key) for key in PRESIDIO_SETTING_KEYS} if backend == 'presidio' else {}
+            
+            # Aggregated mode groups findings by (type, field) to keep the response small
+            aggregate = bool(posted_data.get('aggregate', False))
+            
+            # Redaction preview applies the generated SEDCMD rules to the sample
+            preview = bool(posted_data.get('redact_preview', False))
+            minimize = preview and bool(posted_data.get('minimize_rules', False))
+            
+            # Rule cost mode benchmarks the generated SEDCMD and EXTRACT rules at an events-per-second rate
+            rule_cost = posted_data.get('rule_cost')
+            rule_cost_eps = None
+            if rule_cost:
+                rule_cost = rule_cost if isinstance(rule_cost, dict) else {}
+                try:
+                    rule_cost_eps = float(rule_cost.get('eps') or pii_settings.get('rule_cost_eps') or DEFAULT_EPS)
+                except (TypeError, ValueError):
+                    return {'payload': {'error': 'rule_cost eps must be a number'}, 'status': 400}
+                if not rule_cost_eps > 0:
+                    return {'payload': {'error': 'rule_cost eps must be greater than 0'}, 'status': 400}
+            
+            # Sampling mode scans a sample of lines and estimates per-type and per-field prevalence
+            sample = posted_data.get('sample')
+            sample_options = None
+            if sample:
+                sample = sample if isinstance(sample, dict) else {}
+                try:
+                    sample_size = int(sample.get('size') or pii_settings.get('sample_size') or DEFAULT_SAMPLE_SIZE)
+                except (TypeError, ValueError):
+                    return {'payload': {'error': 'sample size must be an integer'}, 'status': 400}
+                try:
+                    confidence = float(sample.get('confidence') or DEFAULT_CONFIDENCE)
+                except (TypeError, ValueError):
+                    return {'payload': {'error': 'sample confidence must be a number'}, 'status': 400}
+                sample_options = {
+                    'sample_size': sample_size,
+                    'method': sample.get('method') or pii_settings.get('sample_method') or 'reservoir',
+                    'seed': sample.get('seed'),
+                    'confidence': confidence,
+                }
+                if sample_options['method'] not in SAMPLING_METHODS:
+                    return {'payload': {'error': f"Unknown sampling method '{sample_options['method']}'. Expected one of: {', '.join(SAMPLING_METHODS)}"}, 'status': 400}
+                if sample_size <= 0:
+                    return {'payload': {'error': 'sample size must be greater than 0'}, 'status': 400}
+                if sample_options['seed'] is not None and not isinstance(sample_options['seed'], int):
+                    return {'payload': {'error': 'sample seed must be an integer'}, 'status': 400}
+                if not 0 < sample_options['confidence'] < 1:
+                    return {'payload': {'error': 'sample confidence must be between 0 and 1'}, 'status': 400}
+            
+            # Card/SSN/NINO candidates failing their checksum or allocation rules are dropped by default
+            validation = pii_settings.get('validation') or DEFAULT_VALIDATION_MODE
+            if validation not in VALIDATION_MODES:
+                return {'payload': {'error': f"Unknown validation mode '{validation}'. Expected one of: {', '.join(VALIDATION_MODES)}"}, 'status': 400}
+            
+            # Diagnostics time every detector, so they are never served from or stored in the cache
+            diagnostics = bool(posted_data.get('diagnostics', False)) or utils.is_true(pii_settings.get('diagnostics', 'false'))
+            
+            # Serve repeat scans of the same sample from the result cache
+            RESULT_CACHE.configure(
+                ttl=float(pii_settings.get('result_cache_ttl') or 600),
+                maxsize=int(pii_settings.get('result_cache_size') or 64),
+                persist_dir=RESULT_CACHE_DIR if utils.is_true(pii_settings.get('result_cache_persist', 'false')) else None,
+            )
+            line_cache = None
+            if utils.is_true(pii_settings.get('line_cache', 'true')):
+                LINE_CACHE.configure(maxsize=int(pii_settings.get('line_cache_size') or DEFAULT_LINE_CACHE_SIZE))
+                line_cache = LINE_CACHE
+            cache_key = ResultCache.make_key(text_hash, selected_detectors, custom_patterns,
+                                             aggregate=aggregate, batch=events is not None,
+                                             backend=backend, backend_options=backend_options,
+                                             validation=validation, sample=sample_options,
+                                             line_cache=line_cache is not None, redact_preview=preview,
+                                             minimize_rules=minimize, rule_cost=rule_cost_eps)
+            cached_payload = RESULT_CACHE.get(cache_key) if not diagnostics else None
+            if cached_payload is not None:
+                logging.info(f"Serving PII results from cache: {RESULT_CACHE.stats()}")
+                return {'payload': cached_payload, 'status': 200}
+            
             # Create PII detection logic instance with selected detectors and custom patterns
-            pii_logic = PiiDetectionLogic(selected_detectors, custom_patterns)
+            pii_logic = PiiDetectionLogic(
+                selected_detectors,
+                custom_patterns,
+                parallel=utils.is_true(pii_settings.get('parallel', 'false')),
+                parallel_threshold=int(pii_settings.get('parallel_threshold') or DEFAULT_PARALLEL_THRESHOLD),
+                max_workers=int(pii_settings.get('parallel_workers') or 0) or None,
+                backend=backend,
+                backend_options=backend_options,
+                diagnostics=diagnostics,
+                time_budget_ms=float(posted_data.get('time_budget_ms') or pii_settings.get('time_budget_ms') or 0),
+                detector_budget_ms=float(pii_settings.get('detector_budget_ms') or 0),
+                pattern_timeout_ms=float(pii_settings.get('custom_pattern_timeout_ms') or DEFAULT_PATTERN_TIMEOUT_MS),
+                validation=validation,
+                line_cache=line_cache,
+            )
             
             # Perform PII detection using the abstracted logic
-            results = pii_logic.detect_pii(text_to_analyze)
+            if preview:
+                results = pii_logic.redact_preview(text_to_analyze, minimize=minimize)
+            elif rule_cost_eps is not None:
+                results = pii_logic.estimate_rule_cost(text_to_analyze, rule_cost_eps)
+            elif sample_options is not None:
+                results = pii_logic.detect_pii_sampled(events if events is not None else text_to_analyze, **sample_options)
+            elif events is not None:
+                results = pii_logic.detect_pii_batch(events, aggregate=aggregate)
+            else:
+                results = pii_logic.detect_pii(text_to_analyze, aggregate=aggregate)
+            logging.info(f"Detector registry stats: {DETECTOR_REGISTRY.stats()}")
+            logging.info(f"Custom pattern cache stats: {PATTERN_CACHE.stats()}")
+            logging.info(f"Line cache stats: {LINE_CACHE.stats()}")
+            logging.info(f"Lazy import times (ms): {import_times()}")
             
             if 'error' in results:
                 logging.error(f"Error during PII analysis: {results['error']}", exc_info=True)
                 return {'payload': {'error': results['error']}, 'status': 500}
             
             # Return the results in the expected format
-            response_payload = {
-                'pii_results': results['pii_results'],
-                'suggestion': results['suggestion']
-            }
+            response_payload = {key: results[key] for key in RESPONSE_KEYS if key in results}
+            if results.get('partial'):
+                logging.warning(f"Partial PII results: coverage={results['coverage']}, cut={results['cut_detectors']}")
+            if diagnostics:
+                logging.info(f"PII scan diagnostics: {results['diagnostics']}")
+            elif not results.get('partial'):
+                # Partial results depend on timing, so only complete scans are cached
+                RESULT_CACHE.put(cache_key, response_payload)
             return {'payload': response_payload, 'status': 200}
             
         except Exception as e:
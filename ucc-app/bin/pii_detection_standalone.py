@@ -274,6 +274,12 @@ if __name__ == "__main__":
     parser.add_argument('--test-ip', action='store_true', help='Test custom IP detector')
     parser.add_argument('--text', type=str, help='Test specific text')
     parser.add_argument('--detectors', type=str, help='Comma-separated list of detectors to test')
+    parser.add_argument('--file', type=str, help='Stream-scan a file and print one JSON finding per line')
+    parser.add_argument('--chunk-size', type=int, default=256 * 1024, help='Chunk size in characters for --file scans')
+    parser.add_argument('--sample', type=int, help='Scan only this many lines of --file and print prevalence estimates')
+    parser.add_argument('--sample-method', type=str, default='reservoir', help='reservoir or stratified (with --sample)')
+    parser.add_argument('--seed', type=int, help='Random seed for a reproducible --sample')
+    parser.add_argument('--confidence', type=float, default=0.95, help='Confidence level of --sample intervals')
     
     args = parser.parse_args()
     
@@ -281,6 +287,26 @@ if __name__ == "__main__":
         test_pii_detection_standalone()
     elif args.test_ip:
         test_custom_ip_detector()
+    elif args.file and args.sample:
+        from pii_detection_logic import PiiDetectionLogic
+        detectors = args.detectors.split(',') if args.detectors else None
+        logic = PiiDetectionLogic(detectors)
+        with open(args.file, 'r', encoding='utf-8', errors='replace') as source:
+            results = logic.detect_pii_sampled(source, sample_size=args.sample, method=args.sample_method,
+                                               seed=args.seed, confidence=args.confidence)
+        print(json.dumps(results, indent=2))
+        if 'error' in results:
+            sys.exit(1)
+    elif args.file:
+        from pii_detection_logic import PiiDetectionLogic
+        detectors = args.detectors.split(',') if args.detectors else None
+        logic = PiiDetectionLogic(detectors)
+        total = 0
+        with open(args.file, 'r', encoding='utf-8', errors='replace') as source:
+            for finding in logic.iter_pii(source, chunk_size=args.chunk_size):
+                print(json.dumps(finding))
+                total += 1
+        print(f"Detected {total} PII items in {args.file}", file=sys.stderr)
     elif args.text:
         detectors = args.detectors.split(',') if args.detectors else None
         tester = PiiDetectionTester(detectors)
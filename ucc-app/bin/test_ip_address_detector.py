@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for the single-pass network address detector: validation, address
+families, suffixes and range classification.
+"""
+
+import sys
+import os
+
+# Add the lib directory to the path so we can import our modules
+lib_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib'))
+if lib_path not in sys.path:
+    sys.path.insert(0, lib_path)
+
+from ip_address_detector import ADDRESS_FAMILY_PATTERNS, AddressRangeTable, IpAddressDetector, NETWORK_ADDRESS_REGEX
+
+
+def _findings(text):
+    return [(filth.text, filth.kind) for filth in IpAddressDetector().iter_filth(text)]
+
+
+def test_ipv4_validation():
+    """Octets are range checked; version strings and longer dotted runs are not addresses."""
+    found = _findings("src=10.1.2.3 dst=8.8.8.8 bad=999.999.999.999 256.1.1.1 01.2.3.4 "
+                      "version 2.3.4.5 ver=1.0.0.1 v1.2.3.4 oid 1.3.6.1.4.1 release : \"5.6.7.8 server=4.4.4.4")
+    assert found == [('10.1.2.3', 'ipv4'), ('8.8.8.8', 'ipv4'), ('4.4.4.4', 'ipv4')], found
+    # An address at the very start of the text has no character before it
+    assert _findings("10.0.0.1 - - GET /") == [('10.0.0.1', 'ipv4')]
+    assert [f.beg for f in IpAddressDetector().iter_filth("fe80::1%eth0")] == [0]
+    print("✓ Invalid octets and version strings are rejected")
+
+
+def test_suffixes_and_families():
+    """CIDR, ports, IPv6 (compressed, bracketed, IPv4-embedded) and MAC addresses."""
+    text = ("net 192.168.0.0/24 from outside:1.2.3.4/5555 to 10.0.0.1:443 "
+            "in: 10.0.0.2.51000 > 8.8.4.4.53: UDP "
+            "v6 2001:db8::1 [2001:4860::8888]:8443 ::ffff:10.0.0.1 fe80::1 a::b abc::def "
+            "mac 00:1A:2b:3c:4d:5e 0011.2233.4455 time 12:34:56 date 2024-05-10 port 1.2.3.4:99999")
+    filth = {f.text: f for f in IpAddressDetector().iter_filth(text)}
+    assert filth['192.168.0.0/24'].prefix_length == 24
+    assert filth['10.0.0.1:443'].port == 443
+    assert filth['1.2.3.4'].port is None
+    assert filth['10.0.0.2.51000'].port == 51000 and filth['8.8.4.4.53'].address == '8.8.4.4'
+    assert filth['[2001:4860::8888]:8443'].address == '2001:4860::8888'
+    assert filth['[2001:4860::8888]:8443'].port == 8443
+    assert {filth[text].kind for text in ('2001:db8::1', '::ffff:10.0.0.1', 'fe80::1')} == {'ipv6'}
+    assert filth['00:1A:2b:3c:4d:5e'].kind == 'mac' and filth['0011.2233.4455'].type == 'mac_address'
+    for absent in ('a::b', 'abc::def', '12:34:56', '2024-05-10', '1.2.3.4:99999'):
+        assert absent not in filth, absent
+
+    samples = {'ipv4': '10.0.0.1', 'mac': '00:1a:2b:3c:4d:5e', 'ipv6': 'fe80::1', 'ipv6_bracketed': '[2001:db8::1]'}
+    assert list(ADDRESS_FAMILY_PATTERNS) == list(samples)
+    for family, sample in samples.items():
+        # The regex consumes the boundary character before the address
+        match = NETWORK_ADDRESS_REGEX.fullmatch(' ' + sample)
+        assert match and match.lastgroup == family, (family, match)
+    print(f"✓ {len(filth)} addresses with prefixes, ports and families")
+
+
+def test_classification():
+    """Addresses are classified through the range table."""
+    expected = {
+        '10.20.30.40': 'private', '172.31.0.1': 'private', '192.168.1.1': 'private',
+        '127.0.0.1': 'loopback', '169.254.1.1': 'link_local', '8.8.8.8': 'public',
+        '224.0.0.251': 'multicast', '192.0.2.10': 'reserved',
+        '::1': 'loopback', 'fd12:3456::1': 'private', 'fe80::1': 'link_local',
+        '2a00:1450::1': 'public', '::ffff:192.168.0.1': 'private',
+    }
+    filth = {f.address: f for f in IpAddressDetector().iter_filth(' '.join(expected))}
+    for address, classification in expected.items():
+        assert filth[address].classification == classification, (address, filth[address].classification)
+
+    table = AddressRangeTable([('10.0.0.0/8', 'private'), ('127.0.0.0/8', 'loopback')])
+    assert table.classify(0x0A000001) == 'private'
+    assert table.classify(0x0B000000) == 'public'
+    assert table.classify(0) == 'public'
+    print("✓ Range table classifies private, public, loopback and the rest")
+
+
+if __name__ == "__main__":
+    test_ipv4_validation()
+    test_suffixes_and_families()
+    test_classification()
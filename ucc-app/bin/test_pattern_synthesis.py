@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Tests for value patterns synthesized from observed PII instances, and the per-type regex learner.
+"""
+
+import sys
+import os
+import re
+
+# Add the lib directory to the path so we can import our modules
+lib_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib'))
+if lib_path not in sys.path:
+    sys.path.insert(0, lib_path)
+
+from pattern_synthesis import ValuePatterns, synthesize_pattern
+from pii_detection_logic import PiiDetectionLogic, generate_sedcmd_regex, get_value_pattern_for_type
+
+
+def test_synthesize_pattern():
+    """Runs keep their class and observed lengths, even when constant; repeated parts fold; separators stay literal."""
+    assert synthesize_pattern(['AB 12 34 56 C', 'CD 98 76 54 A', 'ZX 11 22 33 B']) == \
+        '(?<![A-Za-z0-9])[A-Z]{2} [0-9]{2} [0-9]{2} [0-9]{2} [A-Z](?![A-Za-z0-9])'
+    assert synthesize_pattern(['10.0.0.1', '192.168.1.20', '8.8.8.8']) == \
+        r'(?<![A-Za-z0-9])[0-9]{1,3}\.[0-9]{1,3}\.[0-9]\.[0-9]{1,2}(?![A-Za-z0-9])'
+    assert synthesize_pattern(['10.0.0.1', '192.168.1.20', '8.8.8.8', '1.2.3']) == \
+        r'(?<![A-Za-z0-9])[0-9]{1,3}(?:\.[0-9]{1,3}){2,3}(?![A-Za-z0-9])'
+    iso = '(?<![A-Za-z0-9])[0-9]{4}-[0-9]{2}-[0-9]{2}[A-Z][0-9]{2}:[0-9]{2}:[0-9]{2}[A-Z](?![A-Za-z0-9])'
+    assert synthesize_pattern(['2024-01-02T10:00:00Z', '2023-12-31T23:59:59Z', '2024-06-01T00:00:01Z']) == iso
+    # A year and month shared by every value are not frozen into the pattern
+    assert synthesize_pattern(['2024-01-02T10:00:00Z', '2024-01-05T11:00:00Z', '2024-01-09T12:30:00Z']) == iso
+    assert re.search(iso, '2025-07-30T08:15:00Z')
+    assert synthesize_pattern(['10.0.0.1', '10.0.0.2', '10.0.0.3']) == \
+        r'(?<![A-Za-z0-9])[0-9]{2}\.[0-9]\.[0-9]\.[0-9](?![A-Za-z0-9])'
+
+    names = ['John Smith', 'Mary Ann Jones', 'Bob Li', 'ALICE COOPER']
+    pattern = re.compile(synthesize_pattern(names))
+    assert all(pattern.fullmatch(name) for name in names)
+    assert not pattern.search('x' * 20) and not pattern.fullmatch('Jo 42')
+
+    # Too few values, or values with nothing in common, fall back to the static patterns
+    assert synthesize_pattern(['a@b.com', 'x.y@example.org']) is None
+    assert synthesize_pattern(['a@b.com', 'x.y@example.org', 'u1@test.co.uk']) is None
+    print(f"✓ Names: {pattern.pattern}")
+
+
+def test_value_pattern_preference():
+    """Rule generators prefer the verified synthesized pattern and fall back to the static table."""
+    text = 'ssn=123-45-6789 ssn=234-56-7890 ssn=345-67-8901 ip=10.0.0.1 ip=10.0.0.2 ip=10.0.0.3'
+    value_patterns = ValuePatterns({'social_security_number': ['123-45-6789', '234-56-7890', '345-67-8901'],
+                                    'IpAddressDetector': ['10.0.0.1', '10.0.0.2', '10.0.0.3'],
+                                    'name': ['John Smith', 'Mary Ann Jones', 'Bob Li']})
+    ssn = '(?<![A-Za-z0-9])[0-9]{3}-[0-9]{2}-[0-9]{4}(?![A-Za-z0-9])'
+    assert get_value_pattern_for_type('social_security_number', value_patterns) == ssn
+    assert generate_sedcmd_regex(text, 4, 15, 'social_security_number', '123-45-6789', value_patterns=value_patterns) == \
+        {'pattern': f'ssn=({ssn})', 'replacement': 'ssn=[REDACTED_SOCIAL_SECURITY_NUMBER]'}
+    ip_rule = generate_sedcmd_regex(text, 51, 59, 'IpAddressDetector', '10.0.0.1', value_patterns=value_patterns)
+    assert ip_rule['pattern'] == r'ip=((?<![A-Za-z0-9])[0-9]{2}\.[0-9]\.[0-9]\.[0-9](?![A-Za-z0-9]))'
+    # Names get a pattern bounded by the observed shapes instead of the greedy [A-Za-z\s]+
+    names = get_value_pattern_for_type('name', value_patterns)
+    assert names == '(?<![A-Za-z0-9])[A-Za-z]{2,5}(?: [A-Za-z]{2,5}){1,2}(?![A-Za-z0-9])'
+    assert [match.group() for match in re.finditer(names, 'name=Mary Ann Jones status=active')] == ['Mary Ann Jones']
+
+    # Types without values in the sample keep the static table, under either name
+    assert get_value_pattern_for_type('US_SSN', value_patterns) == r'\d{3}[-.]?\d{2}[-.]?\d{4}'
+    assert get_value_pattern_for_type('phone', value_patterns) == r'\d{3}[-.]?\d{3}[-.]?\d{4}'
+    # So do values that don't generalize, like mixed address families
+    mixed = ValuePatterns({'IpAddressDetector': ['10.0.0.1', '00:1a:2b:3c:4d:5e', 'fe80::1']})
+    assert get_value_pattern_for_type('IpAddressDetector', mixed, '10.0.0.1') == r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}'
+    assert get_value_pattern_for_type('IpAddressDetector', mixed, '00:1a:2b:3c:4d:5e').startswith(r'\b(?:[0-9A-Fa-f]{2}')
+
+    # A synthesized pattern that matches non-PII text ('order=555-12-3456') is not used
+    text = 'ssn=123-45-6789 ssn=234-56-7890 ssn=345-67-8901 order=555-12-3456'
+    results = [{'type': 'social_security_number', 'text': value, 'start': text.index(value),
+                'end': text.index(value) + len(value)} for value in ('123-45-6789', '234-56-7890', '345-67-8901')]
+    rejected = ValuePatterns.from_results(results, text)
+    assert get_value_pattern_for_type('social_security_number', rejected) == r'\d{3}[-.]?\d{2}[-.]?\d{4}'
+
+    logic = PiiDetectionLogic(['SocialSecurityNumberDetector'])
+    assert logic.generate_regex_for_pii('123-45-6789', 'social_security_number', value_patterns) == ssn
+    assert logic.generate_regex_for_pii('123-45-6789', 'social_security_number', rejected) == \
+        r'\b\d{3}[-.]?\d{2}[-.]?\d{4}\b'
+    assert logic.generate_regex_for_pii('123-45-6789', 'SocialSecurityNumberDetector', value_patterns) == \
+        r'\b\d{3}[-.]?\d{2}[-.]?\d{4}\b'
+    print("✓ Synthesized patterns preferred")
+
+
+def test_learned_patterns():
+    """Other detector types get one regex per type where their values generalize, never one that matches non-PII text."""
+    text = ('nino=AB123456C plate=AB12 CDE handle=@alice\n'
+            'nino=CE987654A plate=XY65 ABC handle=@Bob_99\n'
+            'nino=JK135792B plate=LM70 ZZZ handle=@carol postcode=SW1A 1AA\n'
+            'status=ok code=XX99 QQQ postcode=M1 1AE')
+    values = {'NationalInsuranceNumberDetector': ['AB123456C', 'CE987654A', 'JK135792B'],
+              'VehicleLicencePlateDetector': ['AB12 CDE', 'XY65 ABC', 'LM70 ZZZ'],
+              'TwitterDetector': ['@alice', '@Bob_99', '@carol'],
+              'PostalCodeDetector': ['SW1A 1AA', 'M1 1AE']}
+    results = [{'type': entity_type, 'text': value, 'start': text.index(value), 'end': text.index(value) + len(value)}
+               for entity_type, entity_values in values.items() for value in entity_values]
+    value_patterns = ValuePatterns.from_results(results, text)
+    logic = PiiDetectionLogic([])
+    learned = {entity_type: logic.generate_regex_for_pii(entity_values[0], entity_type, value_patterns)
+               for entity_type, entity_values in values.items()}
+
+    assert learned['NationalInsuranceNumberDetector'] == '(?<![A-Za-z0-9])[A-Z]{2}[0-9]{6}[A-Z](?![A-Za-z0-9])'
+    assert learned['TwitterDetector'] == '@[A-Za-z0-9_]{5,6}(?![A-Za-z0-9_])'
+    # 'code=XX99 QQQ' has the plates' shape, so each plate falls back to its escaped value
+    assert 'VehicleLicencePlateDetector' in value_patterns.rejected
+    assert learned['VehicleLicencePlateDetector'] == r'AB12\ CDE'
+    # Two values are too few to generalize from
+    assert learned['PostalCodeDetector'] == r'SW1A\ 1AA'
+    for entity_type, pattern in learned.items():
+        assert re.search(pattern, values[entity_type][0])
+        assert value_patterns.matches_non_pii(pattern) is None
+    # Without any values the escaped text is still returned
+    assert logic.generate_regex_for_pii('a+b', 'OtherDetector', ValuePatterns()) == r'a\+b'
+    print(f"✓ Learned: {learned}")
+
+
+if __name__ == "__main__":
+    test_synthesize_pattern()
+    test_value_pattern_preference()
+    test_learned_patterns()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Tests for per-detector diagnostics (timing proxy, per-call block and rolling histograms).
+"""
+
+import sys
+import os
+import time
+
+# Add the lib directory to the path so we can import our modules
+lib_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib'))
+if lib_path not in sys.path:
+    sys.path.insert(0, lib_path)
+
+import scrubadub
+
+from pii_diagnostics import DetectorHistograms, ScanBudget, ScanDiagnostics, timed_detector
+from pii_detection_logic import PiiDetectionLogic
+
+
+def test_timed_detector():
+    """The proxy records candidates under the configured name and delegates attributes."""
+    diagnostics = ScanDiagnostics()
+    timed = timed_detector(scrubadub.detectors.EmailDetector(), diagnostics, 'EmailDetector')
+    assert [f.text for f in timed.iter_filth('mail a@example.com, b@example.com or c@example.com')] == \
+        ['a@example.com', 'b@example.com', 'c@example.com']
+    assert timed.name == 'email'
+    diagnostics.emitted('email', 2)
+    diagnostics.skip('OtherDetector')
+
+    block = diagnostics.as_dict()
+    row = block['detectors'][0]
+    assert row['name'] == 'EmailDetector' and row['candidates'] == 3 and row['emitted'] == 2
+    assert block['skipped'] == {'OtherDetector': 1}
+    print(f"✓ Timed detector: {row}")
+
+
+def test_timed_stock_detectors():
+    """Stock detectors only implement iter_filth; Scrubber must still fall back to it through the proxy."""
+    diagnostics = ScanDiagnostics()
+    scrubber = scrubadub.Scrubber(detector_list=[])
+    scrubber.add_detector(timed_detector(scrubadub.detectors.EmailDetector(), diagnostics, 'EmailDetector'))
+    filth = list(scrubber.iter_filth('mail john@example.com or jane@example.org'))
+    assert [f.text for f in filth] == ['john@example.com', 'jane@example.org']
+    assert diagnostics.as_dict()['detectors'][0]['candidates'] == 2
+
+    # A diagnostics scan times every detector through the proxy and still finds what a plain scan does
+    text = 'user=jdoe email=john@example.com from 10.0.0.1\n' * 50
+    detectors = ['EmailDetector', 'IpAddressDetector']
+    serial = PiiDetectionLogic(detectors).detect_pii(text)
+    response = PiiDetectionLogic(detectors, diagnostics=True).detect_pii(text)
+    assert 'error' not in response, response['error']
+    assert response['pii_results'] == serial['pii_results']
+    rows = {row['name']: row for row in response['diagnostics']['detectors']}
+    assert rows['EmailDetector']['candidates'] == 50 and rows['IpAddressDetector']['candidates'] == 50
+    print(f"✓ Stock detectors timed: {diagnostics.as_dict()['detectors'][0]}")
+
+
+def test_histograms():
+    """Histograms keep a rolling window per name."""
+    histograms = DetectorHistograms(window=3)
+    for seconds in (0.00005, 0.002, 0.02, 2.0):
+        diagnostics = ScanDiagnostics()
+        diagnostics.record('SlowDetector', seconds, 1)
+        histograms.observe(diagnostics)
+
+    summary = histograms.summary()['SlowDetector']
+    assert summary['calls'] == 4 and summary['window'] == 3
+    assert summary['buckets']['le_0.1'] == 0 and summary['buckets']['le_5000'] == 1
+    assert summary['max_ms'] == 2000.0
+    print(f"✓ Histograms: p50={summary['p50_ms']}ms p95={summary['p95_ms']}ms")
+
+
+def test_scan_budget():
+    """Detectors over budget are cut; an expired request budget marks the scan partial."""
+    budget = ScanBudget(detector_budget_ms=10)
+    budget.timing.record('SlowDetector', 0.05, 1)
+    budget.timing.record('FastDetector', 0.001, 1)
+    budget.advance(250, 1000)
+    assert budget.active(['SlowDetector', 'FastDetector']) == {'FastDetector'}
+    budget.advance(1000, 1000)
+    outcome = budget.as_dict()
+    assert outcome['partial'] and outcome['coverage'] == 1.0
+    assert outcome['cut_detectors'] == [{'name': 'SlowDetector', 'ms': 50.0, 'coverage': 0.25}]
+
+    budget = ScanBudget(request_budget_ms=1)
+    assert not budget.out_of_time()
+    time.sleep(0.01)
+    assert budget.out_of_time()
+    budget.advance(3, 10)
+    assert budget.as_dict() == {'partial': True, 'cut_detectors': [], 'coverage': 0.3}
+    print(f"✓ Budgets: {outcome}")
+
+
+if __name__ == "__main__":
+    test_timed_detector()
+    test_timed_stock_detectors()
+    test_histograms()
+    test_scan_budget()
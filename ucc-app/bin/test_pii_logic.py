@@ -77,6 +77,54 @@ def test_pii_logic():
             for item in multi_results['pii_results']:
                 print(f"   - {item['type']}: '{item['text']}' (position {item['start']}-{item['end']})")
         
+        print()
+        
+        # Test 4: Detector registry reuse across instances
+        print("4. Testing detector registry reuse...")
+        from pii_detection_logic import DETECTOR_REGISTRY
+        
+        before = DETECTOR_REGISTRY.stats()
+        PiiDetectionLogic(['EmailDetector', 'IpAddressDetector', 'CreditCardDetector']).detect_pii(multi_test_text)
+        after = DETECTOR_REGISTRY.stats()
+        
+        if after['misses'] == before['misses'] and after['hits'] > before['hits']:
+            print(f"✅ Registry reused cached detectors: {after}")
+        else:
+            print(f"❌ Registry rebuilt detectors: {before} -> {after}")
+        
+        print()
+        
+        # Test 5: Compiled custom pattern cache
+        print("5. Testing compiled custom pattern cache...")
+        from pii_detection_logic import PATTERN_CACHE
+        
+        patterns = [{'name': 'employee_id', 'regex': r'EMP-\d{6}'}, {'name': 'broken', 'regex': r'EMP-(\d'}]
+        pattern_logic = PiiDetectionLogic(['EmailDetector'], patterns)
+        pattern_logic.detect_custom_patterns("badge EMP-123456 issued")
+        before = PATTERN_CACHE.stats()
+        custom_results = pattern_logic.detect_custom_patterns("badge EMP-654321 issued")
+        after = PATTERN_CACHE.stats()
+        
+        if len(custom_results) == 1 and after['misses'] == before['misses']:
+            print(f"✅ Custom patterns served from cache: {after}")
+        else:
+            print(f"❌ Custom patterns recompiled: {before} -> {after}")
+        
+        print()
+        
+        # Test 6: Batch detection over several events
+        print("6. Testing batch detection...")
+        batch_events = ["10.0.0.1 - - GET /index.html", "user=jdoe email=john@email.com", "no pii here"]
+        batch_results = multi_logic.detect_pii_batch(batch_events)
+        
+        if 'error' in batch_results:
+            print(f"❌ Error: {batch_results['error']}")
+        else:
+            print(f"✅ Batch summary: {batch_results['summary']}")
+            for event_result in batch_results['results']:
+                for item in event_result['pii_results']:
+                    print(f"   - event {event_result['event_index']}: {item['type']} '{item['text']}' field={item['field']}")
+        
         print()
         print("🎉 Logic testing completed successfully!")
         
@@ -87,5 +135,92 @@ def test_pii_logic():
     except Exception as e:
         print(f"❌ Unexpected Error: {e}")
 
+def _findings(response):
+    assert 'error' not in response, response.get('error')
+    return sorted((res['type'], res['text'], res['start'], res['end']) for res in response['pii_results'])
+
+
+def test_prefilter_matches_full_scan():
+    """Skipping detectors whose markers are absent never changes what scrubadub finds."""
+    from pii_detection_logic import PiiDetectionLogic
+    
+    texts = [
+        "contact john at example dot com for access",
+        "mail JOHN AT EXAMPLE DOT COM today",
+        "user=jdoe email=john@example.com from 10.0.0.1",
+        "card 4111 1111 1111 1111 ssn 123-45-6789 call 020 7946 0958",
+        "see https://example.com/path or www.example.org",
+        "no personal data in this line",
+    ]
+    detectors = ['EmailDetector', 'UrlDetector', 'CreditCardDetector', 'PhoneDetector', 'TwitterDetector']
+    filtered = PiiDetectionLogic(detectors)
+    unfiltered = PiiDetectionLogic(detectors, prefilter=False)
+    for text in texts:
+        assert _findings(filtered.detect_pii(text)) == _findings(unfiltered.detect_pii(text)), text
+    assert [res[1] for res in _findings(filtered.detect_pii(texts[0]))] == ['john at example dot com']
+    print("✓ Prefilter on and off find the same PII, including obfuscated emails")
+
+
+def test_parallel_matches_serial():
+    """Pool scans return the same results as a serial scan, address kind and range included."""
+    from pii_detection_logic import PiiDetectionLogic
+    
+    text = '\n'.join(f"src=10.0.{index}.1 dst=8.8.8.8 via fe80::{index:x} mac=00:1a:2b:3c:4d:{index:02x}"
+                     for index in range(200))
+    serial = PiiDetectionLogic(['IpAddressDetector']).detect_pii(text)
+    parallel = PiiDetectionLogic(['IpAddressDetector'], parallel=True, parallel_threshold=1, max_workers=2)
+    assert 'error' not in serial and len(serial['pii_results']) == 800
+    assert {res.get('classification') for res in serial['pii_results']} >= {'private', 'public', 'link_local'}
+    assert parallel.detect_pii(text)['pii_results'] == serial['pii_results']
+    print("✓ Parallel scan matches the serial scan")
+
+
+def test_scan_modes_match_full_scan():
+    """Diagnostics, budgets, the line cache, prefilter off and the process pool all find what a plain scan does."""
+    from pii_detection_logic import PiiDetectionLogic
+    from pii_result_cache import LineResultCache
+    
+    text = '\n'.join(
+        f"user=u{index} email=u{index}@example.com src=10.0.{index}.1 card 4111 1111 1111 1111 "
+        f"see https://example.com/u{index}" if index % 4 else f"customer record {index}\ndate of birth:\n12/05/1980 ok"
+        for index in range(40))
+    modes = {
+        'diagnostics': {'diagnostics': True},
+        'budget': {'time_budget_ms': 60000, 'budget_chunk_size': 500},
+        'line_cache': {'line_cache': LineResultCache()},
+        'no_prefilter': {'prefilter': False},
+        'parallel': {'parallel': True, 'parallel_threshold': 1, 'max_workers': 2},
+        'parallel_line_cache': {'parallel': True, 'parallel_threshold': 1, 'max_workers': 2,
+                                'line_cache': LineResultCache()},
+    }
+    for detectors in (['EmailDetector', 'IpAddressDetector', 'CreditCardDetector', 'UrlDetector'],
+                      ['EmailDetector', 'IpAddressDetector', 'DateOfBirthDetector']):
+        serial = _findings(PiiDetectionLogic(detectors).detect_pii(text))
+        assert len(serial) > 60
+        for mode, options in modes.items():
+            assert _findings(PiiDetectionLogic(detectors, **options).detect_pii(text)) == serial, (mode, detectors)
+    assert ('date_of_birth', '12/05/1980') in [finding[:2] for finding in serial]
+    print(f"✓ {len(modes)} scan modes match the full scan")
+
+
+def test_field_from_key_before_value():
+    """A finding takes the key before it, not the next key on the line, and its rule then covers it."""
+    from pii_detection_logic import PiiDetectionLogic
+    
+    text = '\n'.join(f"user=u{index} email=u{index}@example.com src=10.0.0.{index}" for index in range(3))
+    logic = PiiDetectionLogic(['EmailDetector', 'IpAddressDetector'])
+    results = logic.detect_pii(text)['pii_results']
+    fields = [(res['type'], res['field']) for res in results]
+    assert fields == [('email', 'email'), ('IpAddressDetector', 'src')] * 3, fields
+    assert results[0]['text'] == 'u0@example.com' and text[results[0]['start']:results[0]['end']] == 'u0@example.com'
+    preview = logic.redact_preview(text)['redact_preview']
+    assert preview['missed'] == [] and preview['covered'] == 6
+    print("✓ Fields come from the key before the finding")
+
+
 if __name__ == "__main__":
-    test_pii_logic() 
\ No newline at end of file
+    test_pii_logic()
+    test_prefilter_matches_full_scan()
+    test_parallel_matches_serial() 
+    test_scan_modes_match_full_scan()
+    test_field_from_key_before_value()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Tests for the PII result cache (TTL, eviction and on-disk persistence) and the
+per-line cache behind incremental re-scans, which is checked against full scans with the real detectors.
+"""
+
+import sys
+import os
+import time
+import tempfile
+
+# Add the lib directory to the path so we can import our modules
+lib_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib'))
+if lib_path not in sys.path:
+    sys.path.insert(0, lib_path)
+
+from pii_result_cache import LineResultCache, ResultCache
+from pii_detection_logic import PiiDetectionLogic
+
+
+def test_key_fingerprint():
+    """Keys change with detectors, custom patterns and options."""
+    base = ResultCache.make_key('abc', ['EmailDetector'], [])
+    assert base == ResultCache.make_key('abc', ['EmailDetector'], [])
+    assert base != ResultCache.make_key('abc', ['EmailDetector', 'UrlDetector'], [])
+    assert base != ResultCache.make_key('abc', ['EmailDetector'], [{'name': 'emp', 'regex': r'EMP-\d+'}])
+    assert base != ResultCache.make_key('abc', ['EmailDetector'], [], aggregate=True)
+    print("✓ Cache keys fingerprint detectors, patterns and options")
+
+
+def test_ttl_and_eviction():
+    """Entries expire after the TTL and the oldest entry is evicted first."""
+    cache = ResultCache(ttl=0.05, maxsize=2)
+    cache.put('a', {'pii_results': []})
+    assert cache.get('a') == {'pii_results': []}
+    time.sleep(0.1)
+    assert cache.get('a') is None
+
+    cache.configure(ttl=60, maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+    print(f"✓ TTL and LRU eviction: {cache.stats()}")
+
+
+def test_persistence():
+    """Persisted results are served by a fresh cache instance."""
+    with tempfile.TemporaryDirectory() as persist_dir:
+        ResultCache(ttl=60, maxsize=4, persist_dir=persist_dir).put('k', {'suggestion': 'No PII detected.'})
+        restarted = ResultCache(ttl=60, maxsize=4, persist_dir=persist_dir)
+        assert restarted.get('k') == {'suggestion': 'No PII detected.'}
+        assert restarted.stats()['disk_hits'] == 1
+    print("✓ Results survive a restart when persistence is enabled")
+
+
+def test_line_cache():
+    """Lines are cached per configuration and evicted oldest first."""
+    cache = LineResultCache(maxsize=2)
+    keys = [cache.line_key(line) for line in ('a', 'b', 'c')]
+    cache.put_many('cfg', {keys[0]: (), keys[1]: ('x',)})
+    assert cache.get_many('cfg', keys) == [(), ('x',), None]
+    assert cache.get_many('other', keys[:1]) == [None]
+    cache.put_many('cfg', {keys[2]: ()})
+    assert cache.get_many('cfg', keys) == [None, ('x',), ()]
+    assert cache.stats()['evictions'] == 1
+    print(f"✓ Line cache: {cache.stats()}")
+
+
+def test_incremental_rescan():
+    """An edited sample rescans only new or changed lines and matches a full scan, serial or in the pool."""
+    lines = [f"user=u{index} email=u{index}@example.com src=10.0.0.{index}" if index % 3 else f"user=u{index} action=login"
+             for index in range(30)]
+    detectors = ['EmailDetector', 'IpAddressDetector']
+    cache = LineResultCache()
+    incremental = PiiDetectionLogic(detectors, line_cache=cache)
+    full = PiiDetectionLogic(detectors)
+
+    assert incremental.detect_pii('\n'.join(lines)) == full.detect_pii('\n'.join(lines))
+    edited = lines[:5] + ['new line owner=x@y.com'] + lines[5:20] + [lines[20].replace('u20@', 'changed@')] + lines[21:]
+    misses = cache.stats()['misses']
+    result = incremental.detect_pii('\n'.join(edited))
+    assert cache.stats()['misses'] - misses == 2
+    assert result == full.detect_pii('\n'.join(edited))
+    assert result['total_detected'] == 41
+
+    # With parallel on as well, uncached lines are scanned in the pool rather than bypassing the cache
+    pooled_cache = LineResultCache()
+    pooled = PiiDetectionLogic(detectors, parallel=True, parallel_threshold=1, max_workers=2, line_cache=pooled_cache,
+                               diagnostics=True)
+    pooled_result = pooled.detect_pii('\n'.join(edited))
+    assert 'ProcessPool' in [row['name'] for row in pooled_result.pop('diagnostics')['detectors']]
+    assert pooled_result == result
+    assert pooled_cache.stats()['misses'] == len(edited)
+    print(f"✓ Incremental re-scan: 2 of {len(edited)} lines scanned, {cache.stats()}")
+
+
+def test_cross_line_detectors_with_line_cache():
+    """Dates of birth whose context words are on an earlier line are still found, and the other detectors use the cache."""
+    texts = ["customer record\ndate of birth:\n12/05/1980 ok", "born on\n1980-01-05 mail a@b.com"]
+    cache = LineResultCache()
+    for text in texts:
+        full = PiiDetectionLogic(['DateOfBirthDetector', 'EmailDetector']).detect_pii(text)
+        cached = PiiDetectionLogic(['DateOfBirthDetector', 'EmailDetector'], line_cache=cache).detect_pii(text)
+        assert [res['type'] for res in full['pii_results']][:1] == ['date_of_birth']
+        assert cached == full
+    assert cache.stats()['misses'] == 5
+    print("✓ Cross-line detectors scan the whole text next to the line cache")
+
+
+def test_line_cache_default_detectors():
+    """With the default detector set, a re-scan is served from the line cache and matches a full scan."""
+    lines = [
+        "2024-01-05 login user=alice email=alice@example.com src=10.0.0.1",
+        "customer record for John Smith, date of birth:",
+        "12/05/1980 phone +44 20 7946 0958 card 4111 1111 1111 1111",
+        "visit https://example.com/profile?id=42 from 192.168.1.20",
+        "born on 1980-01-05, twitter @alice_w",
+    ]
+    detectors = PiiDetectionLogic().selected_detectors
+    try:
+        import nltk
+        nltk.data.find('tokenizers/punkt_tab')
+    except LookupError:
+        # TextBlobNameDetector needs the NLTK punkt corpus, which is downloaded separately
+        detectors = [name for name in detectors if name != 'TextBlobNameDetector']
+    cache = LineResultCache()
+    incremental = PiiDetectionLogic(detectors, line_cache=cache)
+    full = PiiDetectionLogic(detectors)
+    first = incremental.detect_pii('\n'.join(lines))
+    assert 'error' not in first
+    assert first == full.detect_pii('\n'.join(lines))
+    
+    edited = lines[:3] + ['contact bob@example.org about 1980-01-05'] + lines[3:]
+    hits = cache.stats()['hits']
+    result = incremental.detect_pii('\n'.join(edited))
+    assert cache.stats()['hits'] - hits == len(lines)
+    assert result == full.detect_pii('\n'.join(edited))
+    assert 'date_of_birth' in [res['type'] for res in result['pii_results']]
+    print(f"✓ Default detectors: {len(lines)} of {len(edited)} lines served from the line cache")
+
+
+if __name__ == "__main__":
+    test_key_fingerprint()
+    test_ttl_and_eviction()
+    test_persistence()
+    test_line_cache()
+    test_incremental_rescan()
+    test_cross_line_detectors_with_line_cache()
+    test_line_cache_default_detectors()
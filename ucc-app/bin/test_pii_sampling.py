@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Tests for line sampling (reservoir and stratified) and prevalence estimation.
+"""
+
+import sys
+import os
+
+# Add the lib directory to the path so we can import our modules
+lib_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib'))
+if lib_path not in sys.path:
+    sys.path.insert(0, lib_path)
+
+from pii_sampling import (
+    allocate_sample, draw_sample, estimate_prevalence, line_shape, reservoir_sample, stratified_sample, wilson_interval
+)
+
+LINES = [f"user=u{index} action=login" if index % 10 else f"user=u{index} email=u{index}@example.com"
+         for index in range(20000)]
+
+
+def test_reservoir_sample():
+    """The reservoir keeps sample_size lines in input order and counts every non-blank line."""
+    sample = reservoir_sample('\n'.join(LINES) + '\n\n', 500, seed=1)
+    assert sample.total_lines == 20000 and len(sample.lines) == 500
+    positions = [int(line.split()[0][6:]) for line in sample.lines]
+    assert positions == sorted(positions) and len(set(positions)) == 500
+    assert reservoir_sample(LINES, 500, seed=1).lines == sample.lines
+    small = reservoir_sample(['a\n', '\n', 'b'], 10)
+    assert small.lines == ['a', 'b'] and small.total_lines == 2
+    print(f"✓ Reservoir: {len(sample.lines)} of {sample.total_lines} lines")
+
+
+def test_stratified_sample():
+    """Strata follow line shape and are allocated in proportion to their size."""
+    assert line_shape('user=a action=b') == ('action', 'user')
+    assert line_shape('{"user": "a", "mail": "b"}') == ('mail', 'user')
+    assert line_shape('plain text') == ('text',)
+
+    sample = stratified_sample(LINES, 500, seed=2)
+    strata = {row['shape']: (row['lines'], row['sampled']) for row in sample.as_dict()['strata']}
+    assert strata == {'email|user': (2000, 50), 'action|user': (18000, 450)}
+
+    # Many small strata never push the sample past its size
+    many = [f"k{index % 40}=x" for index in range(4000)] + [f"big=x n={index}" for index in range(96000)]
+    for size in (10, 50, 500):
+        sample = stratified_sample(many, size, seed=4)
+        assert len(sample.lines) == size, (size, len(sample.lines))
+        assert (min(sample.sampled) >= 1) == (size >= 41)
+    assert allocate_sample(5, [1, 1, 1, 97], [1, 1, 1, 5]) == [1, 1, 1, 2]
+    assert allocate_sample(2, [10, 30, 60], [10, 30, 60]) == [0, 1, 1]
+    assert allocate_sample(100, [10, 20], [3, 20]) == [3, 20]
+    try:
+        draw_sample(LINES, 10, 'systematic')
+        raise AssertionError("expected ValueError")
+    except ValueError:
+        pass
+    print(f"✓ Stratified: {strata}")
+
+
+def test_prevalence():
+    """Rates extrapolate to the whole input with an interval that contains the true rate."""
+    sample = reservoir_sample(LINES, 1000, seed=3)
+    results = [[{'type': 'email', 'field': 'email'}] if 'email=' in line else [] for line in sample.lines]
+    prevalence = estimate_prevalence(sample, results)
+    by_type = prevalence['by_type'][0]
+    assert by_type['type'] == 'email' and prevalence['by_field'][0]['field'] == 'email'
+    assert by_type['ci'][0] <= 0.1 <= by_type['ci'][1]
+    assert by_type['estimated_lines_ci'][0] <= 2000 <= by_type['estimated_lines_ci'][1]
+
+    # A sample of the whole input is exact
+    full = reservoir_sample(LINES[:100], 1000)
+    results = [[{'type': 'email', 'field': 'email'}] * 2 if 'email=' in line else [] for line in full.lines]
+    row = estimate_prevalence(full, results)['by_type'][0]
+    assert row['rate'] == 0.1 and row['ci'] == [0.1, 0.1] and row['estimated_occurrences'] == 20
+
+    low, high = wilson_interval(0.0, 1000, 1.96)
+    assert low == 0.0 and 0 < high < 0.01
+    print(f"✓ Prevalence: rate={by_type['rate']} ci={by_type['ci']}")
+
+
+if __name__ == "__main__":
+    test_reservoir_sample()
+    test_stratified_sample()
+    test_prevalence()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for the bulk PII validators (Luhn, SSA rules, NINO prefixes) and the validation stage.
+"""
+
+import sys
+import os
+
+# Add the lib directory to the path so we can import our modules
+lib_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib'))
+if lib_path not in sys.path:
+    sys.path.insert(0, lib_path)
+
+import pii_validators
+from pii_validators import luhn_valid, validate_cards, validate_findings, validate_ninos, validate_ssns
+from pii_detection_logic import ChunkFilth, PiiDetectionLogic
+
+
+def test_validators():
+    """Each validator accepts real-shaped values and rejects impossible ones."""
+    assert luhn_valid('4111111111111111') and not luhn_valid('4111111111111112')
+    assert validate_cards(['4111 1111 1111 1111', '5500-0000-0000-0004', '1234 5678 9012 3456', '4111']) == \
+        [True, True, False, False]
+    assert validate_ssns(['123-45-6789', '000-12-3456', '666-12-3456', '912-34-5678',
+                          '123-00-4567', '123-45-0000', '078-05-1120', '12-345-678']) == \
+        [True, False, False, False, False, False, False, False]
+    assert validate_ninos(['AB 12 34 56 C', 'ab123456', 'DA123456A', 'AO123456A',
+                           'GB123456A', 'AB123456E', 'AB12345A']) == \
+        [True, True, False, False, False, False, False]
+    assert validate_findings(['credit_card', 'email', 'social_security_number'],
+                             ['4111111111111112', 'a@b.co', '123-45-6789']) == [False, None, True]
+    print("✓ Luhn, SSA and NINO rules")
+
+
+def test_large_batches():
+    """Batches over the NumPy threshold give the same answers (NumPy is used when installed)."""
+    cards = [next(f"4{index:014d}{check}" for check in range(10) if luhn_valid(f"4{index:014d}{check}"))
+             for index in range(200)]
+    assert all(validate_cards(cards))
+    assert not any(validate_cards([card[:-1] + str((int(card[-1]) + 1) % 10) for card in cards]))
+    ssns = [f"{area:03d}-45-6789" for area in range(0, 1000, 5)]
+    assert validate_ssns(ssns) == [0 < area < 900 and area != 666 for area in range(0, 1000, 5)]
+    print(f"✓ Batches of {len(cards)} cards and {len(ssns)} SSNs (numpy: {pii_validators.get_numpy() is not None})")
+
+
+def test_validation_stage():
+    """Failing candidates are dropped, or down-scored and flagged, before enrichment."""
+    text = "order=4111111111111112 card=4111111111111111 ssn=666-12-3456"
+    filth = [ChunkFilth('credit_card', '4111111111111112', 6, 22),
+             ChunkFilth('credit_card', '4111111111111111', 28, 44),
+             ChunkFilth('social_security_number', '666-12-3456', 49, 60)]
+
+    logic = PiiDetectionLogic(['CreditCardDetector'])
+    logic._validation_counts = {'checked': 0, 'failed': {}}
+    results = logic._build_pii_results(text, filth)
+    assert [res['text'] for res in results] == ['4111111111111111']
+    response = {}
+    logic._finish_response(response)
+    assert response['validation'] == {'mode': 'drop', 'checked': 3, 'failed': 2,
+                                      'failed_by_type': {'credit_card': 1, 'social_security_number': 1}}
+
+    logic = PiiDetectionLogic(['CreditCardDetector'], validation='score')
+    results = logic._build_pii_results(text, filth)
+    assert [(res['score'], res.get('validation')) for res in results] == \
+        [(0.2, 'failed'), (1.0, None), (0.2, 'failed')]
+
+    logic = PiiDetectionLogic(['CreditCardDetector'], validation='off')
+    assert len(logic._build_pii_results(text, filth)) == 3
+    try:
+        PiiDetectionLogic(validation='strict')
+        raise AssertionError("expected ValueError")
+    except ValueError:
+        pass
+    print("✓ Drop, score and off modes")
+
+
+if __name__ == "__main__":
+    test_validators()
+    test_large_batches()
+    test_validation_stage()
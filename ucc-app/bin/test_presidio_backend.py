@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Tests for the Presidio backend configuration, type mapping and result handling.
+These don't load spaCy, so they run without presidio-analyzer installed; analysis
+runs against a fake BatchAnalyzerEngine.
+"""
+
+import re
+import sys
+import os
+from collections import namedtuple
+
+# Add the lib directory to the path so we can import our modules
+lib_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib'))
+if lib_path not in sys.path:
+    sys.path.insert(0, lib_path)
+
+import presidio_backend
+from presidio_backend import DEFAULT_DISABLED_COMPONENTS, backend_from_settings, presidio_type
+from pii_detection_logic import PiiDetectionLogic
+
+# Shape of presidio_analyzer.RecognizerResult as far as the backend reads it
+RecognizerResult = namedtuple('RecognizerResult', ['entity_type', 'start', 'end', 'score'])
+
+
+class FakeBatchAnalyzer:
+    """
+    Stand-in for BatchAnalyzerEngine: recognizes emails and US SSNs by regex,
+    scores SSNs low and, like Presidio, drops results below score_threshold.
+    """
+    recognizers = (('EMAIL_ADDRESS', re.compile(r'\S+@\S+\.com'), 0.95),
+                   ('US_SSN', re.compile(r'\d{3}-\d{2}-\d{4}'), 0.4),
+                   ('LOCATION', re.compile(r'London'), 0.85))
+
+    def __init__(self):
+        self.calls = []
+
+    def analyze_iterator(self, texts, language, batch_size=1, entities=None, score_threshold=None):
+        texts = list(texts)
+        self.calls.append({'texts': len(texts), 'language': language, 'batch_size': batch_size,
+                           'entities': entities, 'score_threshold': score_threshold})
+        for text in texts:
+            # Presidio does not order its results
+            yield [RecognizerResult(entity_type, match.start(), match.end(), score)
+                   for entity_type, regex, score in reversed(self.recognizers)
+                   if entities is None or entity_type in entities
+                   if score >= (score_threshold or 0)
+                   for match in regex.finditer(text)]
+
+
+def install_fake_analyzer(model_name: str) -> FakeBatchAnalyzer:
+    """Register a fake engine as the loaded analyzer for a model, so get_batch_analyzer never loads spaCy."""
+    engine = FakeBatchAnalyzer()
+    presidio_backend._engines[(model_name, 'en', DEFAULT_DISABLED_COMPONENTS)] = engine
+    return engine
+
+
+def test_settings():
+    """Conf strings are parsed into backend options, with defaults for blanks."""
+    backend = backend_from_settings({})
+    assert backend.model_name == 'en_core_web_md' and backend.batch_size == 32
+    assert backend.disabled_components == DEFAULT_DISABLED_COMPONENTS and backend.entities is None
+
+    backend = backend_from_settings({
+        'spacy_model': 'en_core_web_lg',
+        'nlp_batch_size': '128',
+        'presidio_score_threshold': '0.7',
+        'presidio_entities': 'EMAIL_ADDRESS|PERSON',
+        'spacy_disable_components': 'parser|lemmatizer',
+    })
+    assert backend.model_name == 'en_core_web_lg' and backend.batch_size == 128
+    assert backend.score_threshold == 0.7
+    assert backend.entities == ['EMAIL_ADDRESS', 'PERSON']
+    assert backend.disabled_components == ('parser', 'lemmatizer')
+    print("✓ Presidio settings parsed")
+
+
+def test_type_mapping():
+    """Presidio entity types use the scrubadub type names where one exists."""
+    assert presidio_type('EMAIL_ADDRESS') == 'email'
+    assert presidio_type('IP_ADDRESS') == 'IpAddressDetector'
+    assert presidio_type('LOCATION') == 'location'
+    print("✓ Presidio entity types mapped")
+
+
+def test_analyze_batch():
+    """Results are mapped to scrubadub types, thresholded, ordered and kept with their own text."""
+    engine = install_fake_analyzer('fake_model_batch')
+    backend = backend_from_settings({'spacy_model': 'fake_model_batch', 'nlp_batch_size': '7',
+                                     'presidio_score_threshold': '0.3'})
+    texts = ['ssn 123-45-6789 for a@example.com in London', 'nothing here', 'mail b@example.com']
+    filth_by_text = backend.analyze_batch(texts)
+    assert engine.calls == [{'texts': 3, 'language': 'en', 'batch_size': 7, 'entities': None, 'score_threshold': 0.3}]
+    assert [[(f.detector_name, f.text, f.beg, f.end, f.score) for f in filth] for filth in filth_by_text] == [
+        [('social_security_number', '123-45-6789', 4, 15, 0.4), ('email', 'a@example.com', 20, 33, 0.95),
+         ('location', 'London', 37, 43, 0.85)],
+        [],
+        [('email', 'b@example.com', 5, 18, 0.95)],
+    ]
+    assert backend.analyze_batch([]) == [] and len(engine.calls) == 1
+
+    strict = backend_from_settings({'spacy_model': 'fake_model_batch', 'presidio_score_threshold': '0.5',
+                                    'presidio_entities': 'EMAIL_ADDRESS|US_SSN'})
+    assert [f.detector_name for f in strict.iter_filth(texts[0])] == ['email']
+    assert engine.calls[-1]['entities'] == ['EMAIL_ADDRESS', 'US_SSN'] and engine.calls[-1]['batch_size'] == 32
+    print("✓ Presidio results mapped, thresholded and ordered")
+
+
+def test_presidio_events():
+    """A batch request through the presidio backend maps each finding to its event and offsets."""
+    engine = install_fake_analyzer('fake_model_events')
+    logic = PiiDetectionLogic(backend='presidio', backend_options={'spacy_model': 'fake_model_events',
+                                                                    'nlp_batch_size': '2'})
+    events = ['user=u0 email=a@example.com', 'no pii', 'from London email=b@example.com']
+    response = logic.detect_pii_batch(events)
+    assert 'error' not in response, response['error']
+    assert engine.calls[0]['texts'] == 3 and engine.calls[0]['batch_size'] == 2
+    found = [(res['event_index'], item['type'], item['text'], item['field'])
+             for res in response['results'] for item in res['pii_results']]
+    assert found == [(0, 'email', 'a@example.com', 'email'), (2, 'location', 'London', 'location'),
+                     (2, 'email', 'b@example.com', 'email')], found
+    for res in response['results']:
+        for item in res['pii_results']:
+            assert events[res['event_index']][item['start']:item['end']] == item['text']
+    print("✓ Presidio findings mapped to their events")
+
+
+def test_unknown_backend():
+    """An unknown backend name is rejected up front."""
+    try:
+        PiiDetectionLogic(backend='nope')
+    except ValueError:
+        print("✓ Unknown backend rejected")
+        return
+    raise AssertionError("expected ValueError")
+
+
+if __name__ == "__main__":
+    test_settings()
+    test_type_mapping()
+    test_analyze_batch()
+    test_presidio_events()
+    test_unknown_backend()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Tests for custom pattern safety (the static backtracking check and per-match
+timeouts) and for the single-pass custom pattern matcher.
+"""
+
+import sys
+import os
+import re
+
+# Add the lib directory to the path so we can import our modules
+lib_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib'))
+if lib_path not in sys.path:
+    sys.path.insert(0, lib_path)
+
+import regex_safety
+from regex_safety import PatternTimeout, check_pattern, iter_matches, line_bounded
+from pii_detection_logic import CustomPatternMatcher
+
+
+def test_check_pattern():
+    """Nested quantifiers are rejected; ordinary PII patterns pass."""
+    for pattern in [r'(a+)+', r'(\w+\s?)+$', r'(x+x+)+y', r'(?:\d+)*', r'(\w+.)+@', 'a' * 1200]:
+        assert check_pattern(pattern), pattern
+    for pattern in [r'EMP-\d{6}', r'\b\d{3}-\d{2}-\d{4}\b', r'(\d{1,3}\.){3}\d{1,3}',
+                    r'[a-z0-9._%+-]+@([a-z0-9-]+\.)+[a-z]{2,}', r'user=(\S+)', r'(ab|cd)+']:
+        assert check_pattern(pattern) is None, pattern
+    print("✓ Static check rejects nested quantifiers only")
+
+
+def test_matcher_rejections():
+    """Unsafe and invalid patterns are reported with a reason and never run."""
+    matcher = CustomPatternMatcher([
+        {'name': 'employee_id', 'regex': r'EMP-\d+'},
+        {'name': 'greedy', 'regex': r'(\w+\s?)+$'},
+        {'name': 'broken', 'regex': r'([a-z'},
+    ])
+    assert [res['text'] for res in matcher.find_all('id EMP-42')] == ['EMP-42']
+    reasons = {rejected['name']: rejected['reason'] for rejected in matcher.rejected}
+    assert reasons['greedy'].startswith('nested quantifier')
+    assert reasons['broken'].startswith('invalid regex')
+    print(f"✓ Rejections reported: {reasons}")
+
+
+def test_overlapping_patterns():
+    """Overlapping patterns each report every match, as their own finditer would."""
+    patterns = [{'name': 'employee_id', 'regex': r'EMP\d+'},
+                {'name': 'digits', 'regex': r'\d{3}'},
+                {'name': 'badge', 'regex': r'[A-Z]{2}-\d{2}'},
+                {'name': 'handle', 'regex': r'@[a-z]+'}]
+    text = 'id EMP12345 badge AB-12 @ops'
+    matcher = CustomPatternMatcher(patterns)
+    expected = sorted(((index, match.start(), match.group())
+                       for index, pattern in enumerate(patterns)
+                       for match in re.finditer(pattern['regex'], text, re.IGNORECASE)))
+    found = sorted((index, match.start(), match.group()) for index, match in matcher.finditer(text))
+    assert found == expected
+    assert ('digits', '123') in [(res['name'], res['text']) for res in matcher.find_all(text)]
+    # Every pattern is merged into the one combined pass
+    assert [index for index, _source in matcher.patterns.merged] == [0, 1, 2, 3]
+
+    # ID formats that share prefixes and digits, as custom patterns usually do
+    patterns = [{'name': 'employee_id', 'regex': r'EMP-\d{6}'},
+                {'name': 'customer_id', 'regex': r'CUST-\d{8}'},
+                {'name': 'ticket', 'regex': r'TKT\d+'},
+                {'name': 'code', 'regex': r'[A-Z]{3}-\d{4}'}]
+    text = ' '.join(f"EMP-{index:06d} CUST-{index:08d} TKT{index} ABC-{index:04d} emp-12" for index in range(50))
+    matcher = CustomPatternMatcher(patterns)
+    assert [index for index, _source in matcher.patterns.merged] == [0, 1, 2, 3]
+    expected = sorted(((index, match.start(), match.group())
+                       for index, pattern in enumerate(patterns)
+                       for match in re.finditer(pattern['regex'], text, re.IGNORECASE)))
+    assert sorted((index, match.start(), match.group()) for index, match in matcher.finditer(text)) == expected
+    assert ('code', 'EMP-0000') in [(res['name'], res['text']) for res in matcher.find_all(text)]
+    assert ('code', 'UST-0000') in [(res['name'], res['text']) for res in matcher.find_all(text)]
+    print(f"✓ Overlapping matches kept: {found}")
+
+
+class SlowPattern:
+    """Pattern whose searches always time out, as the regex module would report."""
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+
+    def search(self, text, pos=0, endpos=None, timeout=None):
+        raise TimeoutError('regex timed out')
+
+
+class RecordingPattern:
+    """Real pattern that records the span and timeout of every search."""
+
+    def __init__(self, pattern):
+        self.compiled = regex_safety.REGEX_ENGINE.compile(pattern)
+        self.pattern = pattern
+        self.searches = []
+
+    def search(self, text, pos=0, endpos=None, timeout=None):
+        self.searches.append((endpos - pos, timeout))
+        return self.compiled.search(text, pos, endpos)
+
+
+def test_timeout():
+    """A timed-out pattern is dropped and reported; the others still match."""
+    assert [m.group() for m in iter_matches(re.compile(r'\d+'), 'a1b22', None)] == ['1', '22']
+
+    supports_timeout = regex_safety.SUPPORTS_TIMEOUT
+    regex_safety.SUPPORTS_TIMEOUT = True
+    try:
+        try:
+            list(iter_matches(SlowPattern('x'), 'xxx', 50))
+            raise AssertionError("expected PatternTimeout")
+        except PatternTimeout as e:
+            assert 'timed out after 50 ms' in str(e)
+
+        matcher = CustomPatternMatcher([{'name': 'employee_id', 'regex': r'(?i)EMP-\d+'}], timeout_ms=50)
+        matcher.patterns.fallback = [(0, SlowPattern(r'EMP-\d+'))]
+        assert matcher.find_all('EMP-1') == []
+        assert matcher.rejected[0]['reason'] == 'timed out after 50 ms'
+    finally:
+        regex_safety.SUPPORTS_TIMEOUT = supports_timeout
+    print("✓ Timed-out patterns are dropped and reported")
+
+
+def test_timeout_windows():
+    """Large inputs are searched in line windows, or with a scaled timeout, finding the same matches."""
+    assert line_bounded(r'\bEMP-\d+\b') and line_bounded(r'[A-Z]{2}\d{6}(?!\d)')
+    assert not line_bounded(r'EMP\s+\d+') and not line_bounded(r'EMP-\d+$') and not line_bounded(r'a(?=\s)')
+
+    text = ''.join(f"ts=2024-01-01 host=web01 user=u{index} id=AB{index:06d}\n" for index in range(20000))
+    supports_timeout = regex_safety.SUPPORTS_TIMEOUT
+    regex_safety.SUPPORTS_TIMEOUT = True
+    try:
+        for pattern in (r'AB\d{6}', r'AB\d{6}\s'):
+            recording = RecordingPattern(pattern)
+            found = [match.group() for match in iter_matches(recording, text, 50)]
+            assert found == re.findall(pattern, text)
+            spans = [span for span, _timeout in recording.searches]
+            timeouts = [timeout for _span, timeout in recording.searches]
+            if line_bounded(pattern):
+                assert max(spans) <= regex_safety.TIMEOUT_WINDOW_CHARS + 100 and max(timeouts) < 0.051
+            else:
+                assert max(spans) == len(text) and max(timeouts) == 0.05 * len(text) / regex_safety.TIMEOUT_WINDOW_CHARS
+    finally:
+        regex_safety.SUPPORTS_TIMEOUT = supports_timeout
+
+    if supports_timeout:
+        # A linear pattern with no match in a large log is not mistaken for a catastrophic one
+        large = text * 12
+        compiled_pattern = regex_safety.REGEX_ENGINE.compile(r'[A-Z]{2}\d{7}')
+        assert list(iter_matches(compiled_pattern, large, 5)) == []
+    print(f"✓ {len(text)} characters searched in windows")
+
+
+if __name__ == "__main__":
+    test_check_pattern()
+    test_matcher_rejections()
+    test_overlapping_patterns()
+    test_timeout()
+    test_timeout_windows()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for the SEDCMD and EXTRACT rule cost estimator.
+"""
+
+import sys
+import os
+
+# Add the lib directory to the path so we can import our modules
+lib_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib'))
+if lib_path not in sys.path:
+    sys.path.insert(0, lib_path)
+
+import rule_cost
+from rule_cost import adversarial_inputs, bench_events, benchmark_rule, estimate_rule_cost, extract_rules_for_findings
+from pii_detection_logic import PATTERN_CACHE
+
+EMAIL_EXTRACT = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+TEXT = '\n'.join(f"user=u{index} email=u{index}@example.com" for index in range(500)) + '\n\n'
+
+
+def _finding(value, finding_type='EMAIL_ADDRESS'):
+    start = TEXT.index(value)
+    return {'type': finding_type, 'text': value, 'start': start, 'end': start + len(value),
+            'field': 'email', 'regex_pattern': EMAIL_EXTRACT}
+
+
+def test_rule_inputs():
+    """Findings collapse to one EXTRACT per type and pattern; events and adversarial inputs are built from the sample."""
+    findings = [_finding('u1@example.com'), _finding('u2@example.com')]
+    assert extract_rules_for_findings(findings) == [{'pattern': EMAIL_EXTRACT, 'type': 'EMAIL_ADDRESS', 'findings': 2}]
+    assert len(bench_events(TEXT)) == 500
+    assert len(bench_events('x\n' * (rule_cost.MAX_BENCH_EVENTS * 2))) == rule_cost.MAX_BENCH_EVENTS
+
+    inputs = adversarial_inputs(PATTERN_CACHE.get(r'email=(\S+)'), bench_events(TEXT), length=100)
+    assert set(inputs) >= {'run_of_letters', 'longest_event', 'repeated_match', 'near_miss'}
+    assert all(len(value) == 100 for value in inputs.values())
+    assert inputs['near_miss'].startswith('email=u0@example.co')
+    print(f"✓ {len(inputs)} adversarial inputs")
+
+
+def test_estimate_rule_cost():
+    """Every rule is timed, ranked by cost and projected to cores at the requested rate."""
+    cost = estimate_rule_cost(TEXT, [_finding('u1@example.com')], eps=40000)
+    assert cost['eps'] == 40000 and cost['events'] == 500
+    assert [row['kind'] for row in cost['rules']] in (['sedcmd', 'extract'], ['extract', 'sedcmd'])
+    costs = [row['us_per_event'] for row in cost['rules']]
+    assert costs == sorted(costs, reverse=True)
+    for row in cost['rules']:
+        assert abs(row['cores'] - 40000 * row['us_per_event'] / 1e6) < 1e-3
+        assert row['worst_case_us'] > 0 and row['worst_case_input'] in adversarial_inputs(
+            PATTERN_CACHE.get(row['pattern']), bench_events(TEXT))
+    sedcmd_row = next(row for row in cost['rules'] if row['kind'] == 'sedcmd')
+    assert cost['totals']['sedcmd']['us_per_event'] == sedcmd_row['us_per_event']
+
+    assert cost['over_budget'] == []
+
+    # Without a timeout, patterns prone to catastrophic backtracking are not run on adversarial input
+    risky = benchmark_rule({'pattern': r'(\w+\s?)+$', 'replacement': 'x'}, 'sedcmd', ['short event'], 1000,
+                           timeout_ms=None)
+    assert 'risk' in risky and 'worst_case_us' not in risky and 'us_per_event' in risky
+    if rule_cost.SUPPORTS_TIMEOUT:
+        # With one, they run and a search that exceeds it is reported over budget
+        for kind in ('sedcmd', 'extract'):
+            slow = benchmark_rule({'pattern': r'(a+)+b', 'replacement': 'x'}, kind, ['short event'], 1000, timeout_ms=20)
+            assert slow['over_budget'] == 'timed out after 20 ms' and slow['worst_case_input'] == 'run_of_letters'
+            assert 'risk' in slow and 'worst_case_us' not in slow
+    invalid = benchmark_rule({'pattern': r'(unclosed'}, 'extract', ['event'], 1000)
+    assert 'error' in invalid and 'us_per_event' not in invalid
+    print(f"✓ Rule cost: {cost['totals']}")
+
+
+if __name__ == "__main__":
+    test_rule_inputs()
+    test_estimate_rule_cost()
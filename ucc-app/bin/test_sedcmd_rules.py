@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for SEDCMD rule generation, rule minimization and the one-pass redaction preview.
+"""
+
+import sys
+import os
+
+# Add the lib directory to the path so we can import our modules
+lib_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib'))
+if lib_path not in sys.path:
+    sys.path.insert(0, lib_path)
+
+from sedcmd_rules import (
+    SedcmdRuleSet, apply_sequential, minimize_rules, missed_findings, redact_preview, rules_for_findings
+)
+
+TEXT = 'user=bob email=bob@example.com\n{"mail": "a@b.com"}\nplain c@d.com'
+
+
+def _finding(text, value, finding_type='email'):
+    start = TEXT.index(value)
+    return {'type': finding_type, 'text': value, 'start': start, 'end': start + len(value), 'field': ''}
+
+
+def test_rules_for_findings():
+    """Findings in the same field share one rule."""
+    findings = [_finding(TEXT, 'bob@example.com'), _finding(TEXT, 'a@b.com'), _finding(TEXT, 'bob@example.com')]
+    rules = rules_for_findings(TEXT, findings)
+    assert [(rule['replacement'], rule['findings']) for rule in rules] == \
+        [('email=[REDACTED_EMAIL]', 2), ('"mail":"[REDACTED_EMAIL]"', 1)]
+    print(f"✓ {len(findings)} findings -> {len(rules)} rules")
+
+
+def test_redact_preview():
+    """Rules are applied together; uncovered findings and per-rule stats are reported."""
+    findings = [_finding(TEXT, 'bob@example.com'), _finding(TEXT, 'a@b.com'), _finding(TEXT, 'c@d.com')]
+    preview = redact_preview(TEXT, findings, rules=[
+        {'pattern': r'email=([^\s,="]+)', 'replacement': 'email=[REDACTED_EMAIL]'},
+        {'pattern': r'"mail"\s*:\s*"([^\s,="]+)"', 'replacement': '"mail":"[REDACTED_EMAIL]"'},
+        {'pattern': r'^user=(\w+)', 'replacement': r'user=\1-x'},
+        {'pattern': r'([a-z]+)@(?:\1)?d\.com', 'replacement': '<d>'},
+        {'pattern': r'(unclosed', 'replacement': 'x'},
+    ])
+    assert preview['redacted_text'] == 'user=bob-x email=[REDACTED_EMAIL]\n{"mail":"[REDACTED_EMAIL]"}\nplain <d>'
+    assert [rule['matches'] for rule in preview['rules']] == [1, 1, 1, 1, 0]
+    assert all('ms' in rule for rule in preview['rules'][:4]) and 'ms' not in preview['rules'][4]
+    assert preview['covered'] == 3 and preview['missed'] == []
+    assert preview['invalid_rules'][0]['pattern'] == '(unclosed'
+
+    # Rules share the custom pattern matcher's combined pass; the backreference rule runs on its own
+    rule_set = SedcmdRuleSet(preview['rules'])
+    assert [rule_index for rule_index, _pattern in rule_set.patterns.merged] == [0, 1, 2]
+    assert [rule_index for rule_index, _pattern in rule_set.patterns.fallback] == [3]
+
+    spans = SedcmdRuleSet([{'pattern': r'email=\S+', 'replacement': 'x'}]).matches(TEXT)
+    assert [res['text'] for res in missed_findings(findings, spans)] == ['a@b.com', 'c@d.com']
+    print(f"✓ Preview: {preview['covered']}/{preview['total_findings']} covered in {preview['pass_ms']} ms")
+
+
+def test_minimize_rules():
+    """Rules collapse by field and replacement, and the minimized set redacts the sample identically."""
+    text = 'email=a@b.com user_email=c@d.com\n{"mail": "e@f.com", "from": "g@h.com"}\nip 10.0.0.1 and 10.0.0.2'
+    rules = [
+        {'pattern': r'email=([^\s,="]+)', 'replacement': 'email=[REDACTED_EMAIL]', 'findings': 1},
+        {'pattern': r'user_email=([^\s,="]+)', 'replacement': 'user_email=[REDACTED_EMAIL]', 'findings': 1},
+        {'pattern': r'email=([^\s,="]+)', 'replacement': 'email=[REDACTED_EMAIL]', 'findings': 2},
+        {'pattern': r'"mail"\s*:\s*"([^\s,="]+)"', 'replacement': '"mail":"[REDACTED_EMAIL]"', 'findings': 1},
+        {'pattern': r'"from"\s*:\s*"([^\s,="]+)"', 'replacement': '"from":"[REDACTED_EMAIL]"', 'findings': 1},
+        {'pattern': r'10\.0\.0\.1', 'replacement': '[REDACTED_IP]', 'findings': 1},
+        {'pattern': r'10\.0\.0\.2', 'replacement': '[REDACTED_IP]', 'findings': 1},
+    ]
+    minimized, summary = minimize_rules(text, rules)
+    assert summary == {'original_rules': 7, 'deduplicated_rules': 6, 'minimized_rules': 3,
+                       'reverted_merges': 0, 'verified': True}
+    assert minimized[0] == {'pattern': r'(user_email|email)=([^\s,="]+)', 'replacement': r'\1=[REDACTED_EMAIL]',
+                            'findings': 4, 'merged_from': 2}
+    assert apply_sequential(text, minimized) == apply_sequential(text, rules) == \
+        'email=[REDACTED_EMAIL] user_email=[REDACTED_EMAIL]\n' \
+        '{"mail":"[REDACTED_EMAIL]", "from":"[REDACTED_EMAIL]"}\nip [REDACTED_IP] and [REDACTED_IP]'
+
+    # Sequential rules can feed each other; a merge that changes the outcome is reverted
+    chained = [{'pattern': 'ab', 'replacement': 'X'}, {'pattern': 'Xc', 'replacement': 'X'}]
+    minimized, chained_summary = minimize_rules('abc', chained)
+    assert minimized == chained and chained_summary['reverted_merges'] == 1 and chained_summary['verified']
+
+    preview = redact_preview(text, [], rules=rules, minimize=True)
+    assert len(preview['rules']) == 3 and preview['minimization']['minimized_rules'] == 3
+    print(f"✓ Minimized {summary['original_rules']} -> {summary['minimized_rules']} rules")
+
+
+if __name__ == "__main__":
+    test_rules_for_findings()
+    test_redact_preview()
+    test_minimize_rules()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Tests for the handler warm-up helper (background readiness and status requests).
+"""
+
+import sys
+import os
+import json
+
+# Add the lib directory to the path so we can import our modules
+lib_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib'))
+if lib_path not in sys.path:
+    sys.path.insert(0, lib_path)
+
+from warmup import Warmup, is_status_request
+
+
+def test_status_request():
+    """{"action": "status"} payloads and action=status queries are status requests; a bare GET is not."""
+    assert not is_status_request({'method': 'GET'})
+    assert not is_status_request({'method': 'GET', 'query': [['text', 'hello']]})
+    assert is_status_request({'method': 'GET', 'query': [['action', 'status']]})
+    assert is_status_request({'method': 'GET', 'query': {'action': 'status'}})
+    assert is_status_request({'method': 'POST', 'payload': json.dumps({'action': 'status'})})
+    assert not is_status_request({'method': 'POST', 'payload': json.dumps({'text': 'hello'})})
+    assert not is_status_request({'method': 'POST', 'payload': 'not json'})
+    print("✓ Status requests recognised")
+
+
+def test_warmup_states():
+    """Warm-up reports disabled, ready and failed states."""
+    idle = Warmup('idle')
+    assert idle.status()['state'] == 'disabled' and idle.status()['ready']
+
+    ok = Warmup('ok')
+    ok.start(lambda: {'detectors': 3})
+    assert ok.wait(5)
+    status = ok.status()
+    assert status['state'] == 'ready' and status['details'] == {'detectors': 3}
+    assert status['duration_ms'] is not None
+
+    def fail():
+        raise RuntimeError('boom')
+
+    broken = Warmup('broken')
+    broken.start(fail)
+    assert broken.wait(5)
+    assert broken.status()['state'] == 'failed' and not broken.status()['ready']
+    assert broken.status()['error'] == 'boom'
+    print(f"✓ Warm-up states: {status}")
+
+
+if __name__ == "__main__":
+    test_status_request()
+    test_warmup_states()
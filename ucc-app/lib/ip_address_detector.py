@@ -1,22 +1,265 @@
+"""
+Network address detector.
+Finds IPv4 (octets validated to 0-255, optional /CIDR or :port), IPv6
+including compressed and IPv4-embedded forms (optionally [bracketed]:port)
+and MAC addresses with one candidate regex pass. IPv6 candidates are
+validated with inet_pton. Each address is classified as private/public/
+loopback (or link_local, multicast, reserved) on first access, by a bisect
+lookup in a precomputed range table.
+"""
+
 import re
+import socket
+import ipaddress
+from bisect import bisect_right
+from typing import Iterable, Optional, Tuple
+
 from scrubadub.detectors.base import Detector
 from scrubadub.filth.base import Filth
 
+_OCTET = r'(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)'
+_IPV4 = rf'{_OCTET}\.{_OCTET}\.{_OCTET}\.{_OCTET}'
+_PORT = r'(?:6553[0-5]|655[0-2]\d|65[0-4]\d\d|6[0-4]\d{3}|[1-5]\d{4}|[1-9]\d{0,3}|0)(?!\d)'
+_HEX = r'[0-9A-Fa-f]'
+# Two to eight hex groups separated by ':', optionally ending in a dotted quad. The groups
+# must hold a decimal digit somewhere unless all eight are written out: 'a::b' and
+# 'abc::def' are scope operators and hex words, not addresses. This is only the shape of an
+# IPv6 address; candidates are validated with inet_pton before they are reported.
+_IPV6_CANDIDATE = (
+    rf'(?={_HEX}{{0,4}}:)(?=[0-9A-Fa-f:]*\d|(?:{_HEX}{{1,4}}:){{7}}{_HEX})'
+    rf'{_HEX}{{0,4}}(?::{_HEX}{{0,4}}){{2,7}}(?:(?:\.\d{{1,3}}){{3}})?'
+)
+
+# NETWORK_ADDRESS_REGEX is a single candidate scan over every family. It consumes the
+# character before the address (whitespace or ASCII punctuation other than '.'), which is
+# rarer than digits and hex letters, so the engine skips ahead in C past most of the text
+# and no address starts inside a word or a dotted run. Two lookaheads then reject, cheapest
+# first, anything that does not start like an address or has no separator within its first
+# five characters. The detector scans ' ' + text so an address at offset 0 has a boundary too.
+_BOUNDARY = r'[\s!-\-/:-@\[-^`{-~](?=[0-9A-Fa-f:\[])(?=\[?[0-9A-Fa-f]{0,4}[:.\-])'
+
+# One pattern per address family, tried in this order. Each has a single group, named after
+# the family, so match.lastgroup is the family; the optional /prefix or :port follows the
+# group. Octets, prefixes and ports are range checked here, so the detector only has to
+# reject version strings and validate IPv6 candidates with inet_pton.
+ADDRESS_FAMILY_PATTERNS = {
+    # Dotted quad with a /prefix, :port, or tcpdump/pf style .port before ':' or ' >'
+    'ipv4': (
+        rf'(?P<ipv4>{_IPV4})'
+        rf'(?:/(?:3[0-2]|[12]?\d)(?!\d)|:{_PORT}|\.{_PORT}(?=:| >))?(?!\w|\.\d)'
+    ),
+    # Colon, dash or Cisco dotted MAC, or the 14-octet MAC= field iptables logs (destination
+    # MAC, source MAC, EtherType), which is consumed whole rather than rescanned from every
+    # octet. Must not follow a ':' (the middle of a longer hex run)
+    'mac': (
+        rf'(?<!:)(?P<mac>{_HEX}{{2}}(?::{_HEX}{{2}}){{5}}(?:(?::{_HEX}{{2}}){{8}})?'
+        rf'|{_HEX}{{2}}(?:-{_HEX}{{2}}){{5}}|{_HEX}{{4}}\.{_HEX}{{4}}\.{_HEX}{{4}})(?!\w|[:.\-]{_HEX})'
+    ),
+    # Unbracketed IPv6 with an optional /prefix; must not follow a ':' either
+    'ipv6': (
+        rf'(?<!:)(?P<ipv6>{_IPV6_CANDIDATE})'
+        r'(?:/(?:12[0-8]|1[01]\d|[1-9]?\d)(?!\d))?(?![\w:]|\.\d)'
+    ),
+    # [IPv6] with an optional :port
+    'ipv6_bracketed': rf'\[(?P<ipv6_bracketed>{_IPV6_CANDIDATE})\](?::{_PORT})?',
+}
+
+NETWORK_ADDRESS_REGEX = re.compile(_BOUNDARY + '(?:' + '|'.join(ADDRESS_FAMILY_PATTERNS.values()) + ')')
+
+# Words that make a dotted quad a version number rather than an address
+# Longest first, so the whole-word check sees 'rev' before 'v'
+VERSION_WORDS = ('firmware', 'version', 'release', 'build', 'ver', 'rev', 'v')
+VERSION_SEPARATORS = ' \t:=_"\'-'
+VERSION_CONTEXT_WINDOW = 16
+_VERSION_LAST_CHARS = frozenset(char for word in VERSION_WORDS for char in (word[-1], word[-1].upper()))
+# The two characters before a dotted quad that may follow a version word: a separator after
+# a letter that ends a version word, or after another separator
+_VERSION_PRETEST = frozenset(before + separator for before in _VERSION_LAST_CHARS | set(VERSION_SEPARATORS)
+                             for separator in VERSION_SEPARATORS)
+
+IPV4_RANGES = (
+    ('0.0.0.0/8', 'reserved'),
+    ('10.0.0.0/8', 'private'),
+    ('100.64.0.0/10', 'private'),
+    ('127.0.0.0/8', 'loopback'),
+    ('169.254.0.0/16', 'link_local'),
+    ('172.16.0.0/12', 'private'),
+    ('192.0.0.0/24', 'reserved'),
+    ('192.0.2.0/24', 'reserved'),
+    ('192.168.0.0/16', 'private'),
+    ('198.18.0.0/15', 'private'),
+    ('198.51.100.0/24', 'reserved'),
+    ('203.0.113.0/24', 'reserved'),
+    ('224.0.0.0/4', 'multicast'),
+    ('240.0.0.0/4', 'reserved'),
+)
+
+IPV6_RANGES = (
+    ('::/128', 'reserved'),
+    ('::1/128', 'loopback'),
+    ('64:ff9b::/96', 'reserved'),
+    ('2001:db8::/32', 'reserved'),
+    ('fc00::/7', 'private'),
+    ('fe80::/10', 'link_local'),
+    ('ff00::/8', 'multicast'),
+)
+
+_IPV4_MAPPED_PREFIX = 0xFFFF
+
+
+class AddressRangeTable:
+    """
+    Sorted, non-overlapping address ranges searched with bisect.
+    Addresses outside every range are 'public'.
+    """
+
+    def __init__(self, ranges: Iterable[Tuple[str, str]], default: str = 'public'):
+        """
+        Args:
+            ranges (iterable): (CIDR network, classification) pairs
+            default (str): Classification for addresses in no range
+        """
+        rows = sorted(
+            (int(network.network_address), int(network.broadcast_address), label)
+            for network, label in ((ipaddress.ip_network(cidr), label) for cidr, label in ranges)
+        )
+        self.starts = [row[0] for row in rows]
+        self.ends = [row[1] for row in rows]
+        self.labels = [row[2] for row in rows]
+        self.default = default
+
+    def classify(self, value: int) -> str:
+        index = bisect_right(self.starts, value) - 1
+        if index >= 0 and value <= self.ends[index]:
+            return self.labels[index]
+        return self.default
+
+
+IPV4_TABLE = AddressRangeTable(IPV4_RANGES)
+IPV6_TABLE = AddressRangeTable(IPV6_RANGES)
+
+
+def classify_ipv4(address: str) -> str:
+    """Classify a validated dotted-quad IPv4 address."""
+    return IPV4_TABLE.classify(int.from_bytes(socket.inet_aton(address), 'big'))
+
+
+def classify_ipv6(packed: bytes) -> str:
+    """Classify a packed IPv6 address; IPv4-mapped addresses take the IPv4 classification."""
+    value = int.from_bytes(packed, 'big')
+    if value >> 32 == _IPV4_MAPPED_PREFIX:
+        return IPV4_TABLE.classify(value & 0xFFFFFFFF)
+    return IPV6_TABLE.classify(value)
+
+
+def is_version_string(text: str, start: int) -> bool:
+    """Check whether the word just before a dotted quad marks it as a version number."""
+    before = text[start - VERSION_CONTEXT_WINDOW if start > VERSION_CONTEXT_WINDOW else 0:start]
+    before = before.rstrip(VERSION_SEPARATORS).lower()
+    if not before.endswith(VERSION_WORDS):
+        return False
+    # Whole words only: 'server' is not 'ver'
+    word = next(word for word in VERSION_WORDS if before.endswith(word))
+    boundary = len(before) - len(word)
+    return boundary == 0 or not before[boundary - 1].isalnum()
+
+
 class IpAddressFilth(Filth):
+    """
+    An IPv4 or IPv6 address, optionally with a /prefix or :port.
+    Classification, prefix length and port are parsed from the text on first
+    access, so the detection pass itself only validates.
+    """
     type = "ip_address"
+    # ipv4, ipv6 or mac
+    kind = 'ipv4'
+
+    @property
+    def address(self) -> str:
+        """The bare address, without brackets, prefix or port."""
+        text = self.text
+        if self.kind == 'mac':
+            return text
+        if self.kind == 'ipv6':
+            if text.startswith('['):
+                return text[1:text.index(']')]
+            return text.split('/', 1)[0]
+        address = text.split('/', 1)[0].split(':', 1)[0]
+        return address.rsplit('.', 1)[0] if address.count('.') == 4 else address
+
+    @property
+    def classification(self) -> Optional[str]:
+        """private, public, loopback, link_local, multicast or reserved."""
+        if self.kind == 'ipv4':
+            return classify_ipv4(self.address)
+        if self.kind == 'ipv6':
+            return classify_ipv6(socket.inet_pton(socket.AF_INET6, self.address))
+        return None
+
+    @property
+    def prefix_length(self) -> Optional[int]:
+        if self.kind == 'mac':
+            return None
+        _, slash, prefix = self.text.partition('/')
+        return int(prefix) if slash else None
+
+    @property
+    def port(self) -> Optional[int]:
+        if self.kind == 'mac':
+            return None
+        if self.kind == 'ipv6':
+            _, separator, port = self.text.partition(']:')
+        elif self.text.count('.') == 4:
+            # tcpdump/pf style address.port
+            _, separator, port = self.text.rpartition('.')
+        else:
+            _, separator, port = self.text.partition(':')
+        return int(port) if separator else None
+
+
+class Ipv6AddressFilth(IpAddressFilth):
+    kind = 'ipv6'
+
+
+class MacAddressFilth(IpAddressFilth):
+    type = "mac_address"
+    kind = 'mac'
+
 
 class IpAddressDetector(Detector):
     name = "IpAddressDetector"
     filth_cls = IpAddressFilth
 
-    ipv4_regex = re.compile(r"\b(?:[0-9]{1,3}\.){3}[0-9]{1,3}\b")
+    address_regex = NETWORK_ADDRESS_REGEX
 
     def iter_filth(self, text, document_name=None, **kwargs):
-        for match in self.ipv4_regex.finditer(text):
-            filth = self.filth_cls(
-                beg=match.start(),
-                end=match.end(),
-                text=match.group(),
-                detector_name=self.name
-            )
-            yield filth 
\ No newline at end of file
+        # Hot loop over every candidate in the document. The regex has already range checked
+        # octets, prefixes and ports, so a dotted quad only needs the version-word pre-test.
+        # inet_pton runs for IPv6 candidates only and classification runs lazily on the
+        # filth. Filth is built with positional arguments, which is measurably cheaper per
+        # match.
+        name = self.name
+        ipv4_filth_cls = self.filth_cls
+        version_pretest = _VERSION_PRETEST
+        for match in self.address_regex.finditer(' ' + text):
+            group = match.lastgroup
+            # The match starts at the boundary character; in the padded text that is the
+            # offset of the address itself in text
+            start, end = match.span()
+            end -= 1
+            if group == 'ipv4':
+                # Cheap inline pre-test (SRC=, dst , from ...) on the two characters before the
+                # address; only a possible version word context warrants the full check
+                if text[start - 2 if start > 2 else 0:start] in version_pretest and is_version_string(text, start):
+                    continue
+                filth_cls = ipv4_filth_cls
+            elif group == 'mac':
+                filth_cls = MacAddressFilth
+            else:
+                try:
+                    socket.inet_pton(socket.AF_INET6, match.group(group))
+                except OSError:
+                    continue
+                filth_cls = Ipv6AddressFilth
+            # beg, end, text, match, detector_name, document_name
+            yield filth_cls(start, end, text[start:end], None, name, document_name)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Lazy, timed imports for the PII handler.
+Heavy modules (scrubadub and its detectors) are only imported when first used,
+and every import made through this module records how long it took.
+"""
+
+import sys
+import time
+import logging
+import importlib
+import threading
+from collections import OrderedDict
+from typing import Dict
+
+_lock = threading.Lock()
+
+# Module name -> seconds spent importing it through import_module_timed
+IMPORT_TIMES = OrderedDict()
+
+
+def import_module_timed(name: str):
+    """
+    Import a module, recording the time taken if it was not already loaded.
+    Args:
+        name (str): Dotted module name
+    Returns:
+        module
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    with _lock:
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        elapsed = time.perf_counter() - start
+        IMPORT_TIMES.setdefault(name, elapsed)
+    logging.info(f"Imported {name} in {elapsed * 1000:.1f} ms")
+    return module
+
+
+def import_times() -> Dict[str, float]:
+    """Return recorded import times in milliseconds."""
+    return {name: round(seconds * 1000, 1) for name, seconds in IMPORT_TIMES.items()}
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = import_module_timed(self._name)
+        return self._module
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._module is not None or self._name in sys.modules
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self.is_loaded else 'not loaded'
+        return f"<LazyModule {self._name} ({state})>"
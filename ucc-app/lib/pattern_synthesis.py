@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Value patterns synthesized from the instances of a PII type seen in a sample.
+Each value is split into runs of one character class (upper, lower, digit)
+and literal separators; instances that share a shape are generalized into
+one pattern with the observed run lengths, coarsening the classes only
+when the shapes differ. The result is anchored, so it is both tighter and
+cheaper at index time than the built-in type patterns and the catch-all,
+and is preferred over them. A pattern that also matches the sample's text
+outside the findings is not used, and the built-in pattern is kept instead.
+"""
+
+import re
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Fewer distinct values than this are not generalized from
+MIN_EXAMPLES = 3
+# Distinct shapes a pattern may alternate between before a coarser class level is
+# tried; each alternative must cover at least two values
+MAX_ALTERNATIVES = 4
+# Distinct values considered per type
+MAX_EXAMPLES = 5000
+# Non-PII text kept to check learned patterns against, in characters
+MAX_NON_PII_CHARS = 1000000
+
+CLASS_REGEX = {
+    'upper': '[A-Z]',
+    'lower': '[a-z]',
+    'digit': '[0-9]',
+    'letter': '[A-Za-z]',
+    'alnum': '[A-Za-z0-9]',
+    'word': '[A-Za-z0-9_]',
+}
+
+# Run tokenizers from tightest to coarsest; anything else is a literal character
+CLASS_LEVELS = [
+    (re.compile(r'([A-Z]+)|([a-z]+)|([0-9]+)|(.)', re.S), ('upper', 'lower', 'digit')),
+    (re.compile(r'([A-Za-z]+)|([0-9]+)|(.)', re.S), ('letter', 'digit')),
+    (re.compile(r'([A-Za-z0-9]+)|(.)', re.S), ('alnum',)),
+    # Handles and usernames run letters, digits and underscores together
+    (re.compile(r'([A-Za-z0-9_]+)|(.)', re.S), ('word',)),
+]
+
+# Keeps a pattern that starts or ends with a class run from matching inside a longer run
+LEADING_ANCHOR = '(?<![A-Za-z0-9])'
+TRAILING_ANCHOR = '(?![A-Za-z0-9])'
+WORD_LEADING_ANCHOR = '(?<![A-Za-z0-9_])'
+WORD_TRAILING_ANCHOR = '(?![A-Za-z0-9_])'
+# Characters that need escaping in a pattern; re.escape also escapes spaces and dashes
+REGEX_SPECIAL = set('.^$*+?{}[]\\|()')
+
+
+def _escape(text: str) -> str:
+    return ''.join('\\' + char if char in REGEX_SPECIAL else char for char in text)
+
+
+def tokenize(value: str, level: int) -> List[Tuple[str, str]]:
+    """
+    Split a value into (class, run) tokens and (literal character, character) tokens.
+    Args:
+        value (str): Value to split
+        level (int): Index into CLASS_LEVELS
+    Returns:
+        list: Tokens in order
+    """
+    tokenizer, classes = CLASS_LEVELS[level]
+    tokens = []
+    for match in tokenizer.finditer(value):
+        group = match.lastindex
+        if group <= len(classes):
+            tokens.append((classes[group - 1], match.group(group)))
+        else:
+            tokens.append((match.group(group), match.group(group)))
+    return tokens
+
+
+def shape_of(tokens: List[Tuple[str, str]]) -> Tuple:
+    """
+    Shape key of a token list. A run class repeated with one separator,
+    like the words of a name or the octets of an address, folds into
+    ('repeat', class, separator) so instances with more or fewer parts share a shape.
+    """
+    if len(tokens) >= 3 and len(tokens) % 2:
+        runs, separators = tokens[::2], tokens[1::2]
+        run_class, separator = runs[0][0], separators[0][0]
+        if (run_class in CLASS_REGEX and separator not in CLASS_REGEX
+                and all(token[0] == run_class for token in runs)
+                and all(token[0] == separator for token in separators)):
+            return ('repeat', run_class, separator)
+    return tuple(token[0] for token in tokens)
+
+
+def _quantifier(low: int, high: int) -> str:
+    if low == high:
+        return '' if low == 1 else f'{{{low}}}'
+    return f'{{{low},{high}}}'
+
+
+def _shape_pattern(shape: Tuple, instances: List[List[Tuple[str, str]]]) -> str:
+    """
+    Pattern for the instances of one shape, with each run's observed length range.
+    Every run becomes its class, even when it is the same text in every instance
+    (like the month of timestamps from one month); only separators stay literal.
+    """
+    if shape[0] == 'repeat' and len({len(tokens) for tokens in instances}) == 1:
+        # Same number of parts everywhere: each part gets its own length range
+        shape = tuple(token[0] for token in instances[0])
+    if shape[0] == 'repeat':
+        _repeat, run_class, separator = shape
+        lengths = [len(run) for tokens in instances for _class, run in tokens[::2]]
+        counts = [len(tokens) // 2 for tokens in instances]
+        run = CLASS_REGEX[run_class] + _quantifier(min(lengths), max(lengths))
+        body = f'{run}(?:{_escape(separator)}{run}){_quantifier(min(counts), max(counts))}'
+        first_class = last_class = run_class
+    else:
+        parts = []
+        for position, token_class in enumerate(shape):
+            runs = {tokens[position][1] for tokens in instances}
+            if token_class in CLASS_REGEX:
+                lengths = [len(run) for run in runs]
+                parts.append(CLASS_REGEX[token_class] + _quantifier(min(lengths), max(lengths)))
+            else:
+                parts.append(_escape(runs.pop()))
+        body = ''.join(parts)
+        first_class, last_class = shape[0], shape[-1]
+    if first_class in CLASS_REGEX:
+        body = (WORD_LEADING_ANCHOR if first_class == 'word' else LEADING_ANCHOR) + body
+    if last_class in CLASS_REGEX:
+        body += WORD_TRAILING_ANCHOR if last_class == 'word' else TRAILING_ANCHOR
+    return body
+
+
+def synthesize_pattern(values: Iterable[str]) -> Optional[str]:
+    """
+    Generalize the observed values of one type into the tightest anchored pattern that matches all of them.
+    Class levels are tried from tightest to coarsest; the first level where all
+    values share one shape wins, otherwise the first level needing no more than
+    MAX_ALTERNATIVES shapes of at least two values each.
+    Args:
+        values (iterable): Observed values
+    Returns:
+        str: Regex pattern, or None when there are too few values or too many shapes
+    """
+    distinct = sorted(set(values))[:MAX_EXAMPLES]
+    if len(distinct) < MIN_EXAMPLES:
+        return None
+    candidate = None
+    for level in range(len(CLASS_LEVELS)):
+        shapes = {}
+        for value in distinct:
+            tokens = tokenize(value, level)
+            shapes.setdefault(shape_of(tokens), []).append(tokens)
+        if len(shapes) == 1 or (candidate is None and len(shapes) <= MAX_ALTERNATIVES
+                                and all(len(instances) > 1 for instances in shapes.values())):
+            # Most common shapes first, so the usual case matches on the first alternative
+            ordered = sorted(shapes.items(), key=lambda item: -len(item[1]))
+            alternatives = [_shape_pattern(shape, instances) for shape, instances in ordered]
+            candidate = alternatives[0] if len(alternatives) == 1 else '(?:' + '|'.join(alternatives) + ')'
+            if len(shapes) == 1:
+                break
+    if candidate is None:
+        return None
+    compiled_pattern = re.compile(candidate)
+    if not all(compiled_pattern.fullmatch(value) for value in distinct):
+        return None
+    return candidate
+
+
+class ValuePatterns:
+    """
+    Observed values per PII type, with the pattern synthesized from them computed once per type.
+    Text outside the findings, when added, is what a synthesized pattern must not match.
+    """
+
+    def __init__(self, examples: Optional[Dict[str, Iterable[str]]] = None):
+        """
+        Args:
+            examples (dict): PII type to observed values
+        """
+        self.examples = {}
+        self.non_pii = []
+        self._non_pii_chars = 0
+        self._non_pii_text = None
+        self._patterns = {}
+        self.rejected = {}
+        for entity_type, values in (examples or {}).items():
+            for value in values:
+                self.add(entity_type, value)
+
+    @classmethod
+    def from_results(cls, pii_results: List[Dict[str, Any]], text: Optional[str] = None) -> 'ValuePatterns':
+        """
+        Collect the values of PII results by type.
+        Args:
+            pii_results (list): PII results with type, text, start and end
+            text (str): Text the results were found in; the rest of it is kept as non-PII text
+        """
+        value_patterns = cls()
+        for result in pii_results:
+            value_patterns.add(result['type'], result['text'])
+        if text is not None:
+            value_patterns.add_non_pii(text, [(result['start'], result['end']) for result in pii_results])
+        return value_patterns
+
+    def add(self, entity_type: str, value: str) -> None:
+        self.examples.setdefault(entity_type, set()).add(value)
+        self._patterns.pop(entity_type, None)
+
+    def add_non_pii(self, text: str, spans: Iterable[Tuple[int, int]]) -> None:
+        """
+        Keep the parts of a text outside the given finding spans, up to MAX_NON_PII_CHARS in all.
+        Args:
+            text (str): Analyzed text
+            spans (iterable): (start, end) of every finding in the text
+        """
+        cursor = 0
+        for start, end in sorted(spans) + [(len(text), len(text))]:
+            if start > cursor and self._non_pii_chars < MAX_NON_PII_CHARS:
+                segment = text[cursor:start][:MAX_NON_PII_CHARS - self._non_pii_chars]
+                self.non_pii.append(segment)
+                self._non_pii_chars += len(segment)
+            cursor = max(cursor, end)
+        self._non_pii_text = None
+        self._patterns.clear()
+        self.rejected.clear()
+
+    def matches_non_pii(self, pattern: str) -> Optional[str]:
+        """Return the first non-PII text the pattern matches, or None."""
+        if not self.non_pii:
+            return None
+        if self._non_pii_text is None:
+            # Segments are joined by newlines, which values never span
+            self._non_pii_text = '\n'.join(self.non_pii)
+        match = re.search(pattern, self._non_pii_text)
+        return match.group(0) if match else None
+
+    def get(self, entity_type: str) -> Optional[str]:
+        """
+        Pattern synthesized from the values of a type, or None if it can't be
+        generalized or it also matches text outside the findings.
+        """
+        if entity_type not in self._patterns:
+            pattern = synthesize_pattern(self.examples.get(entity_type, ()))
+            false_positive = self.matches_non_pii(pattern) if pattern else None
+            if false_positive is not None:
+                logging.info(f"Synthesized pattern for {entity_type} matches non-PII text; not using it")
+                self.rejected[entity_type] = pattern
+                pattern = None
+            self._patterns[entity_type] = pattern
+        return self._patterns[entity_type]
@@ -10,8 +10,12 @@ import re
 import json
 import logging
 from typing import Any, Dict, List, Optional, Union
+import time
 import hashlib
-import importlib
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
 
 # Ensure the lib directory is at the front of sys.path
 lib_path = os.path.abspath(os.path.join(os.path.dirname(__file__)))
@@ -23,15 +27,26 @@ if lib_path not in sys.path:
 if bin_path not in sys.path:
     sys.path.insert(0, bin_path)
 
-# Import scrubadub and custom detector
-import scrubadub
-from scrubadub.detectors import CreditCardDetector, EmailDetector, UrlDetector
+# scrubadub and detector modules are imported on first use, not at process start
+from lazy_imports import LazyModule, import_module_timed
+from pii_diagnostics import DETECTOR_HISTOGRAMS, ScanBudget, ScanDiagnostics, timed_detector
+from pattern_synthesis import ValuePatterns
+from presidio_backend import PRESIDIO_TYPE_MAP
+from pii_sampling import DEFAULT_CONFIDENCE, DEFAULT_SAMPLE_SIZE, draw_sample, estimate_prevalence
+from pii_validators import DEFAULT_VALIDATION_MODE, FAILED_VALIDATION_SCORE, VALIDATION_MODES, validate_findings
+from regex_safety import (
+    DEFAULT_PATTERN_TIMEOUT_MS, REGEX_ENGINE, REGEX_ERRORS, PatternTimeout, check_pattern, iter_matches, match_at
+)
 
-# Add import for custom IP detector
-try:
-    from ip_address_detector import IpAddressDetector
-except ImportError:
-    IpAddressDetector = None
+scrubadub = LazyModule('scrubadub')
+
+# Detection backends selectable with the pii_backend setting
+BACKENDS = ('scrubadub', 'presidio')
+
+# Detectors shipped with the app, by module in lib/
+LOCAL_DETECTOR_MODULES = {
+    'IpAddressDetector': 'ip_address_detector',
+}
 
 # Module-level constant for entity type regex patterns
 ENTITY_TYPE_PATTERNS = {
@@ -45,23 +60,964 @@ ENTITY_TYPE_PATTERNS = {
     'URL': r'https?://[^\s"\'<>]+',  # More precise URL pattern - only full URLs with protocol
 }
 
+# IpAddressDetector also reports IPv6 and MAC addresses; rule regexes follow the address shape
+MAC_TEXT_REGEX = re.compile(r'[0-9A-Fa-f]{2}(?:[:-][0-9A-Fa-f]{2}){5,13}|[0-9A-Fa-f]{4}\.[0-9A-Fa-f]{4}\.[0-9A-Fa-f]{4}')
+MAC_RULE_PATTERN = r'\b(?:[0-9A-Fa-f]{2}(?:[:-][0-9A-Fa-f]{2}){5}|[0-9A-Fa-f]{4}\.[0-9A-Fa-f]{4}\.[0-9A-Fa-f]{4})\b'
+IPV6_RULE_PATTERN = (r'(?<![\w:])(?:(?:[0-9A-Fa-f]{1,4}:){7}[0-9A-Fa-f]{1,4}'
+                     r'|(?:[0-9A-Fa-f]{1,4}:){0,6}[0-9A-Fa-f]{0,4}::(?:[0-9A-Fa-f]{1,4}:){0,6}[0-9A-Fa-f]{0,4})(?![\w:])')
+
+# Result types (the names scrubadub reports, which Presidio types are mapped to) with a built-in value pattern
+STATIC_PATTERN_TYPES = {result_type: presidio_type for presidio_type, result_type in PRESIDIO_TYPE_MAP.items()
+                        if presidio_type in ENTITY_TYPE_PATTERNS}
+# Result types whose rule regex comes from a detector branch in generate_regex_for_pii
+RESULT_TYPE_DETECTORS = {'email': 'EmailDetector', 'credit_card': 'CreditCardDetector', 'phone': 'PhoneDetector',
+                         'social_security_number': 'SocialSecurityNumberDetector', 'url': 'UrlDetector'}
+
 # Pre-compile regexes for performance
 KV_REGEX = re.compile(r'(\w+)=')
 JSON_REGEX = re.compile(r'"(\w+)"\s*:\s*"')
 APACHE_IP_REGEX = re.compile(r'^\d+\.\d+\.\d+\.\d+')
 
+# Span regexes used by DocumentIndex
+KV_VALUE_REGEX = re.compile(r'(\w+)=("[^"\n]*"|[^\s,;"]*)')
+JSON_VALUE_REGEX = re.compile(r'"(\w+)"\s*:\s*("(?:[^"\\\n]|\\.)*"|[^\s,}\]]*)')
+QUOTED_REGEX = re.compile(r'"[^"\n]*"')
+BRACKETED_REGEX = re.compile(r'\[[^\]\n]*\]')
+APACHE_LINE_REGEX = re.compile(r'[ \t]*\d+\.\d+\.\d+\.\d+')
+
+# Characters either side of a finding searched for a nearby key
+CONTEXT_WINDOW = 50
+
+
+class DocumentIndex:
+    """
+    Span index built once per document for field inference.
+
+    Line starts, key=value spans, JSON key spans and quoted/bracketed regions
+    are tokenized in one pass each, so looking up the context of a finding is
+    a bisect instead of re-running the context regexes over a window.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.line_starts = [0] + [match.end() for match in re.finditer('\n', text)]
+        self.kv_keys = self._keys(KV_REGEX)
+        self.json_keys = self._keys(JSON_REGEX)
+        self.kv_values = self._values(KV_VALUE_REGEX)
+        self.json_values = self._values(JSON_VALUE_REGEX)
+        self.quoted = self._regions(QUOTED_REGEX)
+        self.bracketed = self._regions(BRACKETED_REGEX)
+        self._apache_lines = {}
+
+    def _keys(self, regex):
+        keys = [(match.start(), match.end(), match.group(1)) for match in regex.finditer(self.text)]
+        return [key[0] for key in keys], keys
+
+    def _values(self, regex):
+        values = [(match.start(2), match.end(2), match.group(1)) for match in regex.finditer(self.text)]
+        return [value[0] for value in values], values
+
+    def _regions(self, regex):
+        regions = [match.span() for match in regex.finditer(self.text)]
+        return [region[0] for region in regions], regions
+
+    @staticmethod
+    def _enclosing(spans, start: int, end: int):
+        starts, items = spans
+        position = bisect_right(starts, start) - 1
+        if position >= 0 and items[position][1] >= end:
+            return items[position]
+        return None
+
+    @staticmethod
+    def _nearest_key(keys, start: int, end: int) -> Optional[str]:
+        """
+        Return the closest key ending within CONTEXT_WINDOW before the finding.
+        Keys after the finding belong to the next value.
+        """
+        starts, items = keys
+        low = bisect_left(starts, start - CONTEXT_WINDOW)
+        high = bisect_right(starts, start)
+        for _key_start, key_end, key in reversed(items[low:high]):
+            if key_end <= start:
+                return key
+        return None
+
+    def line_start(self, position: int) -> int:
+        """Return the offset of the line containing position."""
+        return self.line_starts[bisect_right(self.line_starts, position) - 1]
+
+    def is_apache_line(self, position: int) -> bool:
+        """Check whether the line containing position starts with an IP address."""
+        line_start = self.line_start(position)
+        if line_start not in self._apache_lines:
+            self._apache_lines[line_start] = APACHE_LINE_REGEX.match(self.text, line_start) is not None
+        return self._apache_lines[line_start]
+
+    def classify(self, start: int, end: int):
+        """
+        Work out the context of a finding.
+        Args:
+            start (int): Start index of the PII entity.
+            end (int): End index of the PII entity.
+        Returns:
+            tuple: (kind, field) where kind is 'kv', 'json', 'apache_start',
+            'apache_bracket', 'apache_quote' or None
+        """
+        kv_value = self._enclosing(self.kv_values, start, end)
+        json_value = self._enclosing(self.json_values, start, end)
+        if kv_value and (not json_value or kv_value[0] >= json_value[0]):
+            return 'kv', kv_value[2]
+        if json_value:
+            return 'json', json_value[2]
+
+        if self.is_apache_line(start):
+            if start - self.line_start(start) < 20:
+                return 'apache_start', 'clientip'
+            if self._enclosing(self.bracketed, start, end):
+                return 'apache_bracket', 'timestamp'
+            if self._enclosing(self.quoted, start, end):
+                return 'apache_quote', 'request'
+
+        # Not inside a value: fall back to the nearest key around the finding
+        kv_key = self._nearest_key(self.kv_keys, start, end)
+        if kv_key:
+            return 'kv', kv_key
+        json_key = self._nearest_key(self.json_keys, start, end)
+        if json_key:
+            return 'json', json_key
+        return None, None
+
+
+def build_detector(detector_name: str):
+    """
+    Instantiate a single detector by its configured name.
+    Args:
+        detector_name (str): Detector name, optionally module-prefixed (e.g. en_GB.NationalInsuranceNumberDetector)
+    Returns:
+        Detector instance
+    """
+    # Only the module holding the selected detector is imported
+    if detector_name in LOCAL_DETECTOR_MODULES:
+        module = import_module_timed(LOCAL_DETECTOR_MODULES[detector_name])
+        return getattr(module, detector_name)()
+    # Handle module-prefixed detectors (e.g., en_GB.NationalInsuranceNumberDetector)
+    if '.' in detector_name:
+        module_path, class_name = detector_name.rsplit('.', 1)
+        module = import_module_timed(f'scrubadub.detectors.{module_path}')
+        return getattr(module, class_name)()
+    return getattr(scrubadub.detectors, detector_name)()
+
+
+class DetectorRegistry:
+    """
+    Process-wide cache of detector instances and Scrubbers.
+
+    Entries are keyed on the frozen detector list, so each detector and its
+    Scrubber are built once per process and shared by every PiiDetectionLogic
+    instance. Call refresh() with the currently configured detector list to
+    drop stale entries when the pii_detectors setting changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._configured = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _get_entry(self, detector_names) -> Dict[str, Any]:
+        key = tuple(detector_names)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                return entry
+            self.misses += 1
+            detectors = []
+            by_name = OrderedDict()
+            for detector_name in key:
+                try:
+                    detector = build_detector(detector_name)
+                    detectors.append(detector)
+                    by_name[detector_name] = detector
+                except Exception as e:
+                    print(f"Could not load detector {detector_name}: {e}")
+                    logging.error(f"Could not load detector {detector_name}: {e}")
+
+            if not detectors:
+                # fallback: add a basic detector to avoid empty list error
+                print("Warning: No detectors loaded successfully, using fallback EmailDetector")
+                logging.warning("No detectors loaded successfully, using fallback EmailDetector")
+                detectors.append(scrubadub.detectors.EmailDetector())
+                by_name['EmailDetector'] = detectors[0]
+
+            print(f"Successfully loaded {len(detectors)} detectors")
+            logging.info(f"Successfully loaded {len(detectors)} detectors")
+            entry = {
+                'detectors': detectors,
+                'by_name': by_name,
+                'scrubber': scrubadub.Scrubber(detector_list=detectors),
+                'subsets': {},
+            }
+            self._entries[key] = entry
+            return entry
+
+    def get_detectors(self, detector_names) -> List[Any]:
+        """Return the cached detector instances for the given detector list."""
+        return self._get_entry(detector_names)['detectors']
+
+    def get_scrubber(self, detector_names, active_names=None):
+        """
+        Return the cached Scrubber for the given detector list.
+        Args:
+            detector_names (list): Configured detector list
+            active_names (set): Optional subset of detector names to run; the
+                Scrubber for that subset shares the cached detector instances
+        Returns:
+            scrubadub.Scrubber, or None if no detector in the subset is active
+        """
+        entry = self._get_entry(detector_names)
+        if active_names is None:
+            return entry['scrubber']
+
+        subset_key = tuple(name for name in entry['by_name'] if name in active_names)
+        if len(subset_key) == len(entry['by_name']):
+            return entry['scrubber']
+        if not subset_key:
+            return None
+
+        with self._lock:
+            scrubber = entry['subsets'].get(subset_key)
+            if scrubber is None:
+                scrubber = scrubadub.Scrubber(detector_list=[entry['by_name'][name] for name in subset_key])
+                entry['subsets'][subset_key] = scrubber
+            return scrubber
+
+    def get_active_detectors(self, detector_names, active_names=None) -> List[Any]:
+        """
+        Return (name, detector) pairs for the subset that would run.
+        Args:
+            detector_names (list): Configured detector list
+            active_names (set): Optional subset of detector names to run
+        Returns:
+            list: Cached detector instances with their configured names
+        """
+        entry = self._get_entry(detector_names)
+        return [(name, detector) for name, detector in entry['by_name'].items()
+                if active_names is None or name in active_names]
+
+    def refresh(self, detector_names) -> bool:
+        """
+        Record the currently configured detector list, invalidating cached
+        entries when it differs from the previous one.
+        Args:
+            detector_names (list): Detector list read from cim-plicity_settings.conf
+        Returns:
+            bool: True if the cache was invalidated
+        """
+        key = tuple(detector_names)
+        with self._lock:
+            if self._configured is None or self._configured == key:
+                self._configured = key
+                return False
+            self._configured = key
+            self._entries.clear()
+            self.invalidations += 1
+        logging.info(f"Detector configuration changed, registry invalidated: {list(key)}")
+        return True
+
+    def invalidate(self) -> None:
+        """Drop every cached detector set."""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Return cache hit/miss counters."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'invalidations': self.invalidations,
+            }
+
+
+# Shared by every PiiDetectionLogic instance in the process
+DETECTOR_REGISTRY = DetectorRegistry()
+
+# Cheap markers that must be present before a detector can possibly match.
+# A detector runs when any of its markers is found; unlisted detectors always run.
+DETECTOR_PREREQUISITES = {
+    # EmailDetector also matches the obfuscated 'name at domain dot com'
+    'EmailDetector': ('at', 'at_word'),
+    'TwitterDetector': ('at',),
+    'UrlDetector': ('scheme', 'www'),
+    'SkypeDetector': ('skype',),
+    'IpAddressDetector': ('dotted_quad', 'hex_groups'),
+    'CreditCardDetector': ('digits4',),
+    'en_US.SocialSecurityNumberDetector': ('digits4',),
+    'PhoneDetector': ('digit',),
+    'DateOfBirthDetector': ('digit',),
+    'DriversLicenceDetector': ('digit',),
+    'PostalCodeDetector': ('digit',),
+    'VehicleLicencePlateDetector': ('digit',),
+    'en_GB.NationalInsuranceNumberDetector': ('digit',),
+    'en_GB.TaxReferenceNumberDetector': ('digit',),
+}
+
+MARKER_LITERALS = {
+    'at': '@',
+    'scheme': '://',
+    'www': 'www.',
+}
+
+# One character-class scan; alternatives are ordered so the most specific marker wins.
+# hex_groups (IPv6, MAC) is zero-width so the digits it covers still count as digit markers;
+# it needs four groups or '::', so times (12:34:56) and dates don't set it
+MARKER_REGEX = re.compile(
+    r'(?P<dotted_quad>\d{1,3}\.\d{1,3}\.\d{1,3}\.\d)'
+    r'|(?P<hex_groups>(?=(?:[0-9A-Fa-f]{1,4}[:-]){3}[0-9A-Fa-f]|::|[0-9A-Fa-f]{4}\.[0-9A-Fa-f]{4}\.))'
+    r'|(?P<digits4>\d{4})'
+    r'|(?P<digit>\d)'
+    r'|(?P<skype>[Ss][Kk][Yy][Pp][Ee])'
+    r'|(?P<at_word>\s[Aa][Tt]\s)'
+)
+# Finding a more specific marker implies the weaker ones
+MARKER_IMPLIES = {
+    'dotted_quad': ('digit',),
+    'digits4': ('digit',),
+}
+
+
+def scan_markers(text: str) -> set:
+    """
+    Find which prerequisite markers are present in the text.
+    Args:
+        text (str): Text to analyze
+    Returns:
+        set: Names of the markers found
+    """
+    found = {name for name, literal in MARKER_LITERALS.items() if literal in text}
+    wanted = set(MARKER_REGEX.groupindex)
+    for match in MARKER_REGEX.finditer(text):
+        marker = match.lastgroup
+        if marker not in found:
+            found.add(marker)
+            found.update(MARKER_IMPLIES.get(marker, ()))
+            if wanted <= found:
+                break
+    return found
+
+
+def select_detectors(detector_names, text: str) -> set:
+    """
+    Select the detectors whose prerequisites are met by the text.
+    Args:
+        detector_names (list): Configured detector list
+        text (str): Text to analyze
+    Returns:
+        set: Names of detectors worth running
+    """
+    markers = scan_markers(text)
+    return {
+        name for name in detector_names
+        if name not in DETECTOR_PREREQUISITES or markers.intersection(DETECTOR_PREREQUISITES[name])
+    }
+
+
+class CompiledPatternCache:
+    """
+    Bounded LRU of compiled custom regex patterns keyed by (regex source, flags).
+
+    Invalid patterns are remembered alongside valid ones so a bad regex is
+    compiled and logged once, not on every request. Patterns are compiled with
+    the `regex` module when it is installed, so matches can time out.
+    """
+
+    def __init__(self, maxsize: int = 256, engine=REGEX_ENGINE):
+        self.maxsize = maxsize
+        self.engine = engine
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, regex_pattern: str, flags: int = 0):
+        """
+        Return the compiled pattern, compiling and caching it on a miss.
+        Args:
+            regex_pattern (str): Regex source
+            flags (int): re module flags
+        Returns:
+            Compiled pattern, or None if the pattern is invalid
+        """
+        key = (regex_pattern, flags)
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                compiled, _error = self._entries[key]
+                return compiled
+            self.misses += 1
+
+        compiled, error = None, None
+        try:
+            compiled = self.engine.compile(regex_pattern, flags)
+        except REGEX_ERRORS as e:
+            error = str(e)
+            print(f"Invalid regex pattern '{regex_pattern}': {e}")
+            logging.warning(f"Invalid regex pattern '{regex_pattern}': {e}")
+
+        with self._lock:
+            self._entries[key] = (compiled, error)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return compiled
+
+    def error_for(self, regex_pattern: str, flags: int = 0) -> Optional[str]:
+        """Return the cached compile error for a pattern, if any."""
+        with self._lock:
+            entry = self._entries.get((regex_pattern, flags))
+        return entry[1] if entry else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit rate and eviction counters for tuning maxsize."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+            }
+
+
+# Shared by every PiiDetectionLogic instance in the process
+PATTERN_CACHE = CompiledPatternCache()
+
+# Leading global inline flags such as (?s) or (?x) would leak into other alternatives
+INLINE_FLAGS_REGEX = re.compile(r'^\(\?[aiLmsux]+\)')
+
+
+def _has_backreference(regex_pattern: str) -> bool:
+    """
+    Check whether a pattern refers to groups by number or name (\\1, \\g<1>, (?P=name), (?(1)...)).
+    Such references break once the pattern is wrapped inside a combined alternation.
+    """
+    i = 0
+    while i < len(regex_pattern):
+        char = regex_pattern[i]
+        if char == '\\' and i + 1 < len(regex_pattern):
+            following = regex_pattern[i + 1]
+            if following.isdigit() and following != '0' or following == 'g':
+                return True
+            i += 2
+            continue
+        if regex_pattern.startswith('(?P=', i) or regex_pattern.startswith('(?(', i):
+            return True
+        i += 1
+    return False
+
+
+class CombinedPattern:
+    """
+    Patterns joined into one alternation of named groups, so the text is walked once.
+
+    Patterns that cannot be merged safely (backreferences, named groups, global
+    inline flags, or patterns that match the empty string) are kept in
+    `fallback` to run in their own pass. One alternation reports only the
+    leftmost of overlapping matches; with overlapping=True every merged pattern
+    reports the same matches as its own finditer would instead.
+    """
+
+    def __init__(self, patterns, flags: int = 0, overlapping: bool = False):
+        """
+        Args:
+            patterns (iterable): (index, regex pattern, compiled pattern) for every valid pattern, in order
+            flags (int): Flags the patterns were compiled with
+            overlapping (bool): Recover the matches other patterns overlap
+        """
+        self.flags = flags
+        self.overlapping = overlapping
+        self.merged = []
+        self.fallback = []
+        for index, regex_pattern, compiled_pattern in patterns:
+            if self.can_merge(regex_pattern, compiled_pattern):
+                self.merged.append((index, regex_pattern))
+            else:
+                self.fallback.append((index, compiled_pattern))
+
+        self.combined = None
+        self.rest = None
+        if self.merged:
+            self.combined = PATTERN_CACHE.get(self._alternation(self.merged), flags)
+            if self.combined is None:
+                # Should not happen for individually valid patterns, but never lose matches
+                self.split()
+
+    @staticmethod
+    def _alternation(merged) -> str:
+        return '|'.join(f'(?P<_p{index}>{regex_pattern})' for index, regex_pattern in merged)
+
+    @staticmethod
+    def can_merge(regex_pattern: str, compiled_pattern) -> bool:
+        if compiled_pattern.groupindex:
+            return False
+        if INLINE_FLAGS_REGEX.match(regex_pattern):
+            return False
+        if _has_backreference(regex_pattern):
+            return False
+        if compiled_pattern.fullmatch('') is not None:
+            return False
+        return True
+
+    def split(self) -> None:
+        """Run the merged patterns one by one from now on."""
+        self.combined = None
+        self.rest = None
+        self.fallback.extend((index, PATTERN_CACHE.get(regex_pattern, self.flags)) for index, regex_pattern in self.merged)
+        self.fallback.sort(key=lambda item: item[0])
+        self.merged = []
+
+    def iter_combined(self, text: str, timeout_ms: Optional[float] = None):
+        """
+        Yield (pattern index, match) pairs from the combined pass.
+        Raises:
+            PatternTimeout: If a search of the combined pattern times out
+        """
+        if self.combined is None:
+            return
+        if self.overlapping:
+            yield from self._iter_overlapping(text, timeout_ms)
+            return
+        for match in iter_matches(self.combined, text, timeout_ms):
+            yield int(match.lastgroup[2:]), match
+
+    def _iter_overlapping(self, text: str, timeout_ms: Optional[float]):
+        # The combined pass is resumed one character after each match starts, so it stops at
+        # every position some pattern matches at. The alternation reports the first pattern
+        # that matches there; the patterns after it are tried anchored at the same position,
+        # which finds every (pattern, position) pair. A pattern's own finditer reports the
+        # first of them at or after the end of its previous match.
+        if self.rest is None:
+            # Alternation of the merged patterns after each group, None after the last one
+            self.rest = {f'_p{index}': PATTERN_CACHE.get(self._alternation(self.merged[position + 1:]), self.flags)
+                         for position, (index, _source) in enumerate(self.merged[:-1])}
+            self.rest[f'_p{self.merged[-1][0]}'] = None
+        rest = self.rest
+        resume = {}
+        for match in iter_matches(self.combined, text, timeout_ms, overlapped=True):
+            start = match.start()
+            while match is not None:
+                group = match.lastgroup
+                index = int(group[2:])
+                if start >= resume.get(index, 0):
+                    resume[index] = match.end() if match.end() > start else start + 1
+                    yield index, match
+                match = match_at(rest[group], text, start, timeout_ms) if rest[group] is not None else None
+
+
+class CustomPatternMatcher:
+    """
+    Single-pass matcher for custom PII patterns.
+
+    Patterns are merged into a CombinedPattern and the text is walked once;
+    patterns that cannot be merged fall back to their own finditer pass.
+    Where patterns overlap, the combined pass recovers the shadowed matches,
+    so every pattern reports the same matches as its own finditer would.
+
+    Patterns prone to catastrophic backtracking are rejected before they run,
+    and every search is limited to timeout_ms per match when the `regex`
+    module is available. Rejections are listed in `rejected` with a reason.
+    """
+
+    def __init__(self, custom_patterns: List[Dict[str, Any]], flags: int = re.IGNORECASE,
+                 timeout_ms: Optional[float] = DEFAULT_PATTERN_TIMEOUT_MS):
+        self.flags = flags
+        self.timeout_ms = timeout_ms
+        self.names = {}
+        self.sources = {}
+        self.rejected = []
+        valid = []
+
+        for index, pattern_info in enumerate(custom_patterns):
+            pattern_name = pattern_info.get('name', 'CUSTOM_PATTERN')
+            regex_pattern = pattern_info.get('regex', '')
+            if not regex_pattern:
+                continue
+
+            reason = check_pattern(regex_pattern)
+            if reason is not None:
+                self._reject(pattern_name, regex_pattern, reason)
+                continue
+
+            compiled_pattern = PATTERN_CACHE.get(regex_pattern, flags)
+            if compiled_pattern is None:
+                self._reject(pattern_name, regex_pattern,
+                             f"invalid regex: {PATTERN_CACHE.error_for(regex_pattern, flags)}")
+                continue
+
+            self.names[index] = pattern_name
+            self.sources[index] = regex_pattern
+            valid.append((index, regex_pattern, compiled_pattern))
+
+        self.patterns = CombinedPattern(valid, flags, overlapping=True)
+
+    def _reject(self, pattern_name: str, regex_pattern: str, reason: str) -> None:
+        print(f"Rejected custom pattern '{pattern_name}': {reason}")
+        logging.warning(f"Rejected custom pattern '{pattern_name}': {reason}")
+        self.rejected.append({'name': pattern_name, 'regex': regex_pattern, 'reason': reason})
+
+    def _result(self, index: int, match) -> Dict[str, Any]:
+        pattern_name = self.names[index]
+        return {
+            'type': pattern_name.upper(),
+            'text': match.group(),
+            'start': match.start(),
+            'end': match.end(),
+            'score': 0.9,  # High confidence for custom patterns
+            'detector': 'CustomPatternDetector',
+            'name': pattern_name
+        }
+
+    def finditer(self, text: str):
+        """
+        Yield (pattern index, match) pairs for every custom pattern hit.
+        Args:
+            text (str): Text to analyze
+        """
+        try:
+            hits = list(self.patterns.iter_combined(text, self.timeout_ms))
+        except PatternTimeout as e:
+            # Run the merged patterns one by one from now on, so a slow one can be singled out
+            logging.warning(f"Combined custom pattern {e}; retrying patterns individually")
+            self.patterns.split()
+        else:
+            yield from hits
+        for index, compiled_pattern in list(self.patterns.fallback):
+            try:
+                hits = list(iter_matches(compiled_pattern, text, self.timeout_ms))
+            except PatternTimeout as e:
+                # Drop the pattern for the rest of this request
+                self.patterns.fallback.remove((index, compiled_pattern))
+                self._reject(self.names.pop(index), self.sources.pop(index), str(e))
+                continue
+            for match in hits:
+                yield index, match
+
+    def find_all(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Find all custom pattern hits, ordered by pattern then position.
+        Args:
+            text (str): Text to analyze
+        Returns:
+            List of detected custom patterns with position and metadata
+        """
+        hits = sorted(self.finditer(text), key=lambda hit: (hit[0], hit[1].start()))
+        return [self._result(index, match) for index, match in hits]
+
+    def profile(self, text: str):
+        """
+        Time each pattern in its own pass, to attribute cost inside the combined regex.
+        Args:
+            text (str): Text to analyze
+        Yields:
+            tuple: (pattern name, seconds, match count)
+        """
+        for index, pattern_name in list(self.names.items()):
+            compiled_pattern = PATTERN_CACHE.get(self.sources[index], self.flags)
+            start = time.perf_counter()
+            count = 0
+            try:
+                for _match in iter_matches(compiled_pattern, text, self.timeout_ms):
+                    count += 1
+            except PatternTimeout:
+                pass
+            yield pattern_name, time.perf_counter() - start, count
+
+
+# Default chunk size (characters) for streaming scans
+DEFAULT_CHUNK_SIZE = 256 * 1024
+
+
+def iter_line_chunks(source, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Split input into line-aligned chunks without reading it all into memory.
+    Args:
+        source: A string, an open text file, or any iterable of lines. Strings
+            are sliced as-is; other lines without a trailing newline are
+            treated as newline-terminated.
+        chunk_size (int): Target chunk size in characters; a single longer line
+            becomes its own chunk
+    Yields:
+        tuple: (offset of the chunk in the whole input, chunk text)
+    """
+    if isinstance(source, str):
+        yield from _iter_text_chunks(source, chunk_size)
+        return
+
+    buffer = []
+    buffered = 0
+    offset = 0
+    for line in source:
+        if not line.endswith('\n'):
+            line += '\n'
+        if buffer and buffered + len(line) > chunk_size:
+            yield offset, ''.join(buffer)
+            offset += buffered
+            buffer = []
+            buffered = 0
+        buffer.append(line)
+        buffered += len(line)
+    if buffer:
+        yield offset, ''.join(buffer)
+
+
+def _iter_text_chunks(text: str, chunk_size: int):
+    """Slice a string into chunks ending after a newline, keeping offsets exact."""
+    offset = 0
+    while offset < len(text):
+        end = offset + chunk_size
+        if end >= len(text):
+            yield offset, text[offset:]
+            return
+        cut = text.rfind('\n', offset, end)
+        if cut == -1:
+            cut = text.find('\n', end)
+            if cut == -1:
+                cut = len(text) - 1
+        yield offset, text[offset:cut + 1]
+        offset = cut + 1
+
+
+# Chunk size (characters) when scanning under a time budget; budgets are checked between chunks
+DEFAULT_BUDGET_CHUNK_SIZE = 64 * 1024
+
+# Inputs at least this long (characters) are worth starting the process pool for
+DEFAULT_PARALLEL_THRESHOLD = 2 * 1024 * 1024
+# Lower bound on parallel chunk size so small chunks don't drown in IPC overhead
+MIN_PARALLEL_CHUNK_SIZE = 64 * 1024
+
+# Detectors whose findings depend on neighbouring lines: DateOfBirthDetector looks for
+# its context words on the lines around a date. With the line cache on, they still scan
+# the whole text and their findings are merged with the cached per-line findings.
+CROSS_LINE_DETECTORS = frozenset({'DateOfBirthDetector'})
+
+# Picklable stand-in for scrubadub filth returned by pool workers and budgeted scans, with
+# the optional attributes results are enriched from (Presidio score, IP address kind and range)
+ChunkFilth = namedtuple('ChunkFilth', ['detector_name', 'text', 'beg', 'end', 'score', 'kind', 'classification'],
+                        defaults=(1.0, None, None))
+# Filth kept per line by the line cache
+CachedFilth = ChunkFilth
+
+
+def portable_filth(f, offset: int = 0) -> ChunkFilth:
+    """
+    Copy filth into a ChunkFilth shifted by offset, keeping its score, kind and classification.
+    Scrubber merges overlapping hits (such as the repeated hits DateOfBirthDetector yields
+    for a date that occurs more than once) into MergedFilth, which has no detector name;
+    it is reported as its first hit over the merged span.
+    """
+    source = f.filths[0] if f.detector_name is None and getattr(f, 'filths', None) else f
+    return ChunkFilth(source.detector_name, f.text, f.beg + offset, f.end + offset, getattr(source, 'score', 1.0),
+                      getattr(source, 'kind', None), getattr(source, 'classification', None))
+
+
+def trim_key_prefix(f):
+    """
+    Drop a leading key= from filth, so the finding is the value alone.
+    EmailDetector allows '=' in the local part and reads 'email=a@b.c' as one address.
+    """
+    match = KV_REGEX.match(f.text)
+    if match is None or match.end() == len(f.text):
+        return f
+    return portable_filth(f)._replace(text=f.text[match.end():], beg=f.beg + match.end())
+
+
+def merge_portable_filth(text: str, filth_list: List[ChunkFilth], detector_names) -> List[ChunkFilth]:
+    """
+    Merge overlapping or touching filth the way Scrubber does, so findings from separate
+    scans match one scan with every detector. Filth is ordered by start, longer first,
+    then by detector order; a merged span is reported as its first hit.
+    """
+    order = {name: index for index, name in enumerate(detector_names)}
+    merged = []
+    for f in sorted(filth_list, key=lambda f: (f.beg, -f.end, order.get(f.detector_name, len(order)))):
+        if merged and f.beg <= merged[-1].end:
+            if f.end > merged[-1].end:
+                merged[-1] = merged[-1]._replace(text=text[merged[-1].beg:f.end], end=f.end)
+        else:
+            merged.append(f)
+    return merged
+
+_pool_lock = threading.Lock()
+_pool = None
+_pool_key = None
+
+
+def _init_scan_worker(detector_names) -> None:
+    """Pool initializer: build the detectors once per worker process."""
+    DETECTOR_REGISTRY.get_detectors(detector_names)
+
+
+def _scan_chunk_worker(detector_names, prefilter: bool, offset: int, chunk: str) -> List[ChunkFilth]:
+    """Scan one chunk in a worker and return filth with absolute offsets."""
+    active_detectors = select_detectors(detector_names, chunk) if prefilter else None
+    scrubber = DETECTOR_REGISTRY.get_scrubber(detector_names, active_detectors)
+    if scrubber is None:
+        return []
+    return [portable_filth(f, offset) for f in scrubber.iter_filth(chunk)]
+
+
+def _scan_lines_worker(detector_names, prefilter: bool, lines: List[str], line_detectors=None) -> List[List[ChunkFilth]]:
+    """
+    Scan each line on its own in a worker and return filth per line with line-relative offsets.
+    line_detectors limits the scan to a subset of detector_names, which the worker preloads.
+    """
+    filth_by_line = []
+    for line in lines:
+        if line_detectors is None:
+            active_detectors = select_detectors(detector_names, line) if prefilter else None
+        else:
+            active_detectors = select_detectors(line_detectors, line) if prefilter else set(line_detectors)
+        scrubber = DETECTOR_REGISTRY.get_scrubber(detector_names, active_detectors)
+        filth_by_line.append([portable_filth(f) for f in scrubber.iter_filth(line)] if scrubber is not None else [])
+    return filth_by_line
+
+
+def get_process_pool(detector_names, max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    Return the shared scan pool, starting it if needed.
+    The pool is restarted when the detector list or worker count changes.
+    Args:
+        detector_names (list): Detector list the workers preload
+        max_workers (int): Worker count, or None for os.cpu_count()
+    Returns:
+        ProcessPoolExecutor
+    """
+    global _pool, _pool_key
+    key = (tuple(detector_names), max_workers)
+    with _pool_lock:
+        if _pool is not None and _pool_key == key:
+            return _pool
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        logging.info(f"Starting PII scan pool: workers={max_workers or os.cpu_count()}")
+        _pool = ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_scan_worker,
+            initargs=(list(detector_names),),
+        )
+        _pool_key = key
+        return _pool
+
+
+def shutdown_process_pool() -> None:
+    """Stop the shared scan pool, if running."""
+    global _pool, _pool_key
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+        _pool = None
+        _pool_key = None
+
+
+# Distinct examples kept per aggregated (type, field) group
+DEFAULT_MAX_EXAMPLES = 5
+
+
+def aggregate_pii_results(pii_results: List[Dict[str, Any]], max_examples: int = DEFAULT_MAX_EXAMPLES) -> List[Dict[str, Any]]:
+    """
+    Group PII results by (type, field) instead of returning one row per hit.
+    Args:
+        pii_results (list): PII results as produced by detect_pii
+        max_examples (int): Maximum number of distinct example values per group
+    Returns:
+        List[Dict[str, Any]]: One group per (type, field) with count, examples,
+        first/last offsets and a single regex pattern, in first-seen order
+    """
+    groups = OrderedDict()
+    for result in pii_results:
+        key = (result['type'], result['field'])
+        group = groups.get(key)
+        if group is None:
+            group = {
+                'type': result['type'],
+                'field': result['field'],
+                'count': 0,
+                'score': result['score'],
+                'examples': [],
+                'first_offset': result['start'],
+                'last_offset': result['start'],
+                'regex_pattern': result.get('regex_pattern', '')
+            }
+            for optional_key in ('detector', 'name'):
+                if optional_key in result:
+                    group[optional_key] = result[optional_key]
+            if 'event_index' in result:
+                group['first_event'] = group['last_event'] = result['event_index']
+            groups[key] = group
+        
+        group['count'] += 1
+        group['score'] = max(group['score'], result['score'])
+        group['first_offset'] = min(group['first_offset'], result['start'])
+        group['last_offset'] = max(group['last_offset'], result['start'])
+        if 'event_index' in result:
+            group['first_event'] = min(group['first_event'], result['event_index'])
+            group['last_event'] = max(group['last_event'], result['event_index'])
+        if len(group['examples']) < max_examples and result['text'] not in group['examples']:
+            group['examples'].append(result['text'])
+    return list(groups.values())
+
+
 class PiiDetectionLogic:
     """
     Core PII detection logic that can be used independently of Splunk.
     """
     
-    def __init__(self, selected_detectors=None, custom_patterns=None):
+    def __init__(self, selected_detectors=None, custom_patterns=None, prefilter=True,
+                 parallel=False, parallel_threshold=DEFAULT_PARALLEL_THRESHOLD, max_workers=None,
+                 backend='scrubadub', backend_options=None, diagnostics=False,
+                 time_budget_ms=None, detector_budget_ms=None, budget_chunk_size=DEFAULT_BUDGET_CHUNK_SIZE,
+                 pattern_timeout_ms=DEFAULT_PATTERN_TIMEOUT_MS, validation=DEFAULT_VALIDATION_MODE,
+                 line_cache=None):
         """
         Initialize the PII detection logic with optional detector list and custom patterns.
         Args:
             selected_detectors (list): List of detector names to use, or None for defaults
             custom_patterns (list): List of custom pattern dictionaries with 'name', 'regex', 'type' keys
+            prefilter (bool): Skip detectors whose literal prerequisites are absent from the text
+            parallel (bool): Scan large inputs in a process pool
+            parallel_threshold (int): Minimum text length (characters) before the pool is used
+            max_workers (int): Pool size, or None for os.cpu_count()
+            backend (str): 'scrubadub' or 'presidio' (spaCy NER; selected_detectors and parallel are ignored)
+            backend_options (dict): Presidio settings (spacy_model, nlp_batch_size, presidio_score_threshold, ...)
+            diagnostics (bool): Time every detector and custom pattern and return a diagnostics block
+            time_budget_ms (float): Stop scanning after this much wall time and return partial results
+            detector_budget_ms (float): Cut a detector for the remaining chunks once it has used this much time
+            budget_chunk_size (int): Chunk size (characters) for budgeted scans
+            pattern_timeout_ms (float): Per-match timeout for custom patterns (needs the regex module)
+            validation (str): Card/SSN/NINO candidates failing their checksum or allocation rules are
+                dropped ('drop'), kept with a reduced score ('score') or not checked ('off')
+            line_cache (LineResultCache): Reuse per-line scan results so only new or edited lines are scanned;
+                CROSS_LINE_DETECTORS still scan whole texts
         """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown PII backend '{backend}', expected one of {', '.join(BACKENDS)}")
+        if validation not in VALIDATION_MODES:
+            raise ValueError(f"Unknown validation mode '{validation}', expected one of {', '.join(VALIDATION_MODES)}")
         self.selected_detectors = selected_detectors or [
             'CredentialDetector', 'CreditCardDetector', 'DriversLicenceDetector', 'EmailDetector',
             'en_GB.NationalInsuranceNumberDetector', 'PhoneDetector', 'PostalCodeDetector',
@@ -71,145 +1027,674 @@ class PiiDetectionLogic:
             'IpAddressDetector'  # Add custom IP address detector
         ]
         self.custom_patterns = custom_patterns or []
+        self._custom_matcher = None
+        self.pattern_timeout_ms = pattern_timeout_ms
+        self.prefilter = prefilter
+        self.parallel = parallel
+        self.parallel_threshold = parallel_threshold
+        self.max_workers = max_workers
+        self.backend = backend
+        self.backend_options = backend_options or {}
+        self._presidio = None
+        self.diagnostics = diagnostics
+        self._diag = None
+        self.time_budget_ms = time_budget_ms or None
+        self.detector_budget_ms = detector_budget_ms or None
+        self.budget_chunk_size = budget_chunk_size
+        self._budget = None
+        self.validation = validation
+        self._validation_counts = None
+        self.line_cache = line_cache
+        self._line_config_keys = {}
+    
+    def presidio_backend(self):
+        """Return the Presidio backend, built from backend_options on first use."""
+        if self._presidio is None:
+            from presidio_backend import backend_from_settings
+            self._presidio = backend_from_settings(self.backend_options)
+        return self._presidio
     
     def load_detectors(self):
         """
         Load and return the list of detector instances.
+        Detectors are built once per process and served from DETECTOR_REGISTRY.
         Returns:
             list: List of detector instances
         """
-        detectors = []
-        for detector_name in self.selected_detectors:
-            try:
-                # Handle module-prefixed detectors (e.g., en_GB.NationalInsuranceNumberDetector)
-                if detector_name == 'IpAddressDetector' and IpAddressDetector is not None:
-                    detectors.append(IpAddressDetector())
-                elif '.' in detector_name:
-                    module_path, class_name = detector_name.rsplit('.', 1)
-                    module = importlib.import_module(f'scrubadub.detectors.{module_path}')
-                    detector_cls = getattr(module, class_name)
-                    detectors.append(detector_cls())
-                else:
-                    detector_cls = getattr(scrubadub.detectors, detector_name)
-                    detectors.append(detector_cls())
-            except Exception as e:
-                print(f"Could not load detector {detector_name}: {e}")
-                logging.error(f"Could not load detector {detector_name}: {e}")
-        
-        if not detectors:
-            # fallback: add a basic detector to avoid empty list error
-            print("Warning: No detectors loaded successfully, using fallback EmailDetector")
-            logging.warning("No detectors loaded successfully, using fallback EmailDetector")
-            detectors.append(EmailDetector())
-        
-        print(f"Successfully loaded {len(detectors)} detectors")
-        logging.info(f"Successfully loaded {len(detectors)} detectors")
-        return detectors
+        return DETECTOR_REGISTRY.get_detectors(self.selected_detectors)
     
     def detect_custom_patterns(self, text: str) -> List[Dict[str, Any]]:
         """
-        Detect custom patterns in the text using regex.
+        Detect custom patterns in the text using a single-pass combined regex.
         Args:
             text (str): Text to analyze
         Returns:
             List of detected custom patterns with position and metadata
         """
-        results = []
+        if not self.custom_patterns:
+            return []
         
-        for pattern_info in self.custom_patterns:
-            try:
-                pattern_name = pattern_info.get('name', 'CUSTOM_PATTERN')
-                regex_pattern = pattern_info.get('regex', '')
-                
-                if not regex_pattern:
+        try:
+            if self._custom_matcher is None:
+                self._custom_matcher = CustomPatternMatcher(self.custom_patterns, timeout_ms=self.pattern_timeout_ms)
+            if self._diag is None:
+                return self._custom_matcher.find_all(text)
+            
+            start = time.perf_counter()
+            custom_results = self._custom_matcher.find_all(text)
+            self._diag.record('CustomPatternMatcher', time.perf_counter() - start, len(custom_results),
+                              kind='custom_pattern', emitted=len(custom_results))
+            emitted = {}
+            for res in custom_results:
+                emitted[res['name']] = emitted.get(res['name'], 0) + 1
+            for pattern_name, seconds, count in self._custom_matcher.profile(text):
+                self._diag.record(f"custom:{pattern_name}", seconds, count, kind='custom_pattern',
+                                  emitted=emitted.get(pattern_name, 0))
+            return custom_results
+        except Exception as e:
+            print(f"Error processing custom patterns: {e}")
+            logging.error(f"Error processing custom patterns: {e}")
+            return []
+    
+    def _validate_filth(self, filth_by_text: List[List[Any]]):
+        """
+        Check every candidate across all texts against its validator in one bulk pass,
+        before any enrichment work is spent on it. Candidates that swallowed their key= are trimmed first.
+        Args:
+            filth_by_text (list): Filth lists, one per text
+        Returns:
+            list: (filth list, failed flags) per text; failing filth is removed in 'drop' mode
+        """
+        filth_by_text = [[trim_key_prefix(portable_filth(f) if f.detector_name is None else f) for f in filth_list]
+                         for filth_list in filth_by_text]
+        if self.validation == 'off':
+            return [(filth_list, [False] * len(filth_list)) for filth_list in filth_by_text]
+        
+        flat = [f for filth_list in filth_by_text for f in filth_list]
+        valid = validate_findings([f.detector_name for f in flat], [f.text for f in flat])
+        counts = self._validation_counts
+        validated = []
+        position = 0
+        for filth_list in filth_by_text:
+            kept, failed = [], []
+            for f in filth_list:
+                ok = valid[position]
+                position += 1
+                if ok is None:
+                    kept.append(f)
+                    failed.append(False)
                     continue
-                
-                # Compile the regex pattern
-                compiled_pattern = re.compile(regex_pattern, re.IGNORECASE)
-                
-                # Find all matches
-                for match in compiled_pattern.finditer(text):
-                    results.append({
-                        'type': pattern_name.upper(),
-                        'text': match.group(),
-                        'start': match.start(),
-                        'end': match.end(),
-                        'score': 0.9,  # High confidence for custom patterns
-                        'detector': 'CustomPatternDetector',
-                        'name': pattern_name
-                    })
-                    
-            except re.error as e:
-                print(f"Invalid regex pattern '{regex_pattern}': {e}")
-                continue
-            except Exception as e:
-                print(f"Error processing custom pattern '{pattern_name}': {e}")
-                continue
+                if counts is not None:
+                    counts['checked'] += 1
+                    if not ok:
+                        counts['failed'][f.detector_name] = counts['failed'].get(f.detector_name, 0) + 1
+                if ok or self.validation == 'score':
+                    kept.append(f)
+                    failed.append(not ok)
+            validated.append((kept, failed))
+        return validated
+    
+    def _build_pii_results(self, text_to_analyze: str, filth_list, failed=None,
+                           value_patterns: Optional[ValuePatterns] = None) -> List[Dict[str, Any]]:
+        """
+        Turn scrubadub filth and custom pattern hits for one text into enriched results.
+        Args:
+            text_to_analyze (str): Text the filth was found in
+            filth_list (list): Filth objects detected in the text
+            failed (list): Per-filth validation failures when the filth was already validated in bulk
+            value_patterns (ValuePatterns): Values of every type across the request; collected from
+                filth_list if omitted
+        Returns:
+            List[Dict[str, Any]]: PII results with field and regex enrichment
+        """
+        if failed is None:
+            filth_list, failed = self._validate_filth([filth_list])[0]
+        filtered_results = [(f, bad) for f, bad in zip(filth_list, failed) if len(f.text.strip()) >= 3]
+        index = DocumentIndex(text_to_analyze)
+        if value_patterns is None:
+            value_patterns = ValuePatterns()
+            for f, _bad in filtered_results:
+                value_patterns.add(f.detector_name, f.text)
+            value_patterns.add_non_pii(text_to_analyze, [(f.beg, f.end) for f in filth_list])
+        if self._diag is not None:
+            for f, _bad in filtered_results:
+                self._diag.emitted(f.detector_name)
+        
+        pii_results = []
+        for f, bad in filtered_results:
+            # Generate regex pattern for this PII type
+            regex_pattern = self.generate_regex_for_pii(f.text, f.detector_name, value_patterns)
+            
+            score = getattr(f, 'score', 1.0)
+            result = {
+                'type': f.detector_name,
+                'text': f.text,
+                'score': min(score, FAILED_VALIDATION_SCORE) if bad else score,
+                'start': f.beg,
+                'end': f.end,
+                'field': self.infer_field_name(text_to_analyze, f.beg, f.end, f.detector_name, index),
+                'examples': [],
+                'regex_pattern': regex_pattern
+            }
+            if bad:
+                result['validation'] = 'failed'
+            # IpAddressDetector filth carries the address family and its range classification
+            address_kind = getattr(f, 'kind', None)
+            if address_kind:
+                result['address_kind'] = address_kind
+                classification = getattr(f, 'classification', None)
+                if classification:
+                    result['classification'] = classification
+            pii_results.append(result)
+        
+        # Add custom pattern detection
+        custom_results = self.detect_custom_patterns(text_to_analyze)
+        for custom_result in custom_results:
+            pii_results.append({
+                'type': custom_result['type'],
+                'text': custom_result['text'],
+                'score': custom_result['score'],
+                'start': custom_result['start'],
+                'end': custom_result['end'],
+                'field': self.infer_field_name(text_to_analyze, custom_result['start'], custom_result['end'], custom_result['type'], index),
+                'examples': [],
+                'detector': custom_result['detector'],
+                'name': custom_result['name'],
+                'regex_pattern': custom_result.get('regex_pattern', custom_result.get('regex', ''))
+            })
+        return pii_results
+    
+    @staticmethod
+    def _suggestion(pii_results: List[Dict[str, Any]]) -> str:
+        suggestion = "No PII detected."
+        if pii_results:
+            pii_types = sorted(list(set([res['type'] for res in pii_results])))
+            suggestion = f"Detected PII types: {', '.join(pii_types)}. Recommended action: Review and mask sensitive data before indexing."
+        return suggestion
+    
+    def _get_scrubber(self, active_detectors):
+        """
+        Return the cached Scrubber for the active detectors, or with diagnostics
+        or budgets on, a one-off Scrubber whose detectors are wrapped in timing proxies.
+        """
+        timing = self._budget.timing if self._budget is not None else self._diag
+        if timing is None:
+            return DETECTOR_REGISTRY.get_scrubber(self.selected_detectors, active_detectors)
         
-        return results
+        timed = []
+        for name, detector in DETECTOR_REGISTRY.get_active_detectors(self.selected_detectors):
+            if active_detectors is None or name in active_detectors:
+                timed.append(timed_detector(detector, timing, name))
+            else:
+                timing.skip(name)
+        return scrubadub.Scrubber(detector_list=timed) if timed else None
+    
+    def _start_budget(self) -> None:
+        """Start the time budget for this call, if any budget is configured."""
+        if self.time_budget_ms or self.detector_budget_ms:
+            self._budget = ScanBudget(self.time_budget_ms, self.detector_budget_ms, timing=self._diag)
+        else:
+            self._budget = None
+    
+    def _scan_presidio_budgeted(self, texts: List[str]) -> Optional[List[List[Any]]]:
+        """Analyze texts with Presidio as one budgeted detector; None once it has been cut."""
+        if self._budget.is_cut('PresidioBackend'):
+            return None
+        start = time.perf_counter()
+        filth_by_text = self.presidio_backend().analyze_batch(texts)
+        self._budget.timing.record('PresidioBackend', time.perf_counter() - start,
+                                   sum(len(filth) for filth in filth_by_text), kind='backend')
+        return filth_by_text
+    
+    def _scan_filth_budgeted(self, text: str) -> List[Any]:
+        """
+        Scan the text chunk by chunk, cutting detectors that exceed their budget
+        and stopping when the request budget runs out.
+        """
+        budget = self._budget
+        filth_list = []
+        for offset, chunk in iter_line_chunks(text, self.budget_chunk_size):
+            if budget.out_of_time():
+                break
+            if self.backend == 'presidio':
+                chunk_filth = self._scan_presidio_budgeted([chunk])
+                chunk_filth = chunk_filth[0] if chunk_filth is not None else []
+            else:
+                active_detectors = select_detectors(self.selected_detectors, chunk) if self.prefilter else None
+                scrubber = self._get_scrubber(budget.active(self.selected_detectors, active_detectors))
+                chunk_filth = scrubber.iter_filth(chunk) if scrubber is not None else []
+            filth_list.extend(portable_filth(f, offset) for f in chunk_filth)
+            budget.advance(offset + len(chunk), len(text))
+        if not text:
+            budget.advance(0, 0)
+        return filth_list
+    
+    def _timed_backend_scan(self, label: str, scan, source, batch: bool = False):
+        """Run a scan that can't be split per detector, recording it as one entry."""
+        if self._diag is None:
+            return scan(source)
+        start = time.perf_counter()
+        filth = scan(source)
+        candidates = sum(len(event_filth) for event_filth in filth) if batch else len(filth)
+        self._diag.record(label, time.perf_counter() - start, candidates, kind='backend')
+        return filth
+    
+    def _scan_filth(self, text: str) -> List[Any]:
+        """Run the (prefiltered) cached Scrubber over the text and return its filth."""
+        if self._budget is not None:
+            return self._scan_filth_budgeted(text)
+        if self.line_cache is not None:
+            return self._scan_filth_incremental(text)
+        if self.backend == 'presidio':
+            return self._timed_backend_scan('PresidioBackend', self.presidio_backend().iter_filth, text)
+        if self.parallel and len(text) >= self.parallel_threshold:
+            return self._timed_backend_scan('ProcessPool', self._scan_filth_parallel, text)
+        active_detectors = select_detectors(self.selected_detectors, text) if self.prefilter else None
+        scrubber = self._get_scrubber(active_detectors)
+        return list(scrubber.iter_filth(text)) if scrubber is not None else []
     
-    def detect_pii(self, text_to_analyze: str) -> Dict[str, Any]:
+    def _scan_filth_incremental(self, text: str) -> List[CachedFilth]:
+        """
+        Scan the text line by line, reusing cached results for lines seen before
+        and shifting their offsets to where the lines are now. Selected
+        CROSS_LINE_DETECTORS scan the whole text and their findings are merged in.
+        """
+        line_detectors = None
+        cross_line_detectors = []
+        if self.backend != 'presidio':
+            cross_line_detectors = [name for name in self.selected_detectors if name in CROSS_LINE_DETECTORS]
+            if cross_line_detectors:
+                line_detectors = [name for name in self.selected_detectors if name not in CROSS_LINE_DETECTORS]
+        
+        lines = text.split('\n')
+        filth_list = []
+        offset = 0
+        for line, line_filth in zip(lines, self._scan_lines_cached(lines, line_detectors)):
+            if offset:
+                filth_list.extend(f._replace(beg=f.beg + offset, end=f.end + offset) for f in line_filth)
+            else:
+                filth_list.extend(line_filth)
+            offset += len(line) + 1
+        if not cross_line_detectors:
+            return filth_list
+        
+        active_detectors = select_detectors(cross_line_detectors, text) if self.prefilter else set(cross_line_detectors)
+        scrubber = self._get_scrubber(active_detectors)
+        if scrubber is None:
+            return filth_list
+        filth_list.extend(portable_filth(f) for f in scrubber.iter_filth(text))
+        return merge_portable_filth(text, filth_list, self.selected_detectors)
+    
+    def _scan_lines_cached(self, lines: List[str], line_detectors=None) -> List[List[CachedFilth]]:
+        """
+        Return filth per line with line-relative offsets, scanning only lines the
+        line cache has no results for (each distinct line once).
+        line_detectors limits the scan to a subset of the selected detectors.
+        """
+        cache = self.line_cache
+        detectors = tuple(line_detectors if line_detectors is not None else self.selected_detectors)
+        config_key = self._line_config_keys.get(detectors)
+        if config_key is None:
+            config_key = self._line_config_keys[detectors] = cache.make_config_key(
+                detectors=list(detectors), backend=self.backend,
+                backend_options=self.backend_options, prefilter=self.prefilter)
+        line_keys = [cache.line_key(line) for line in lines]
+        cached = cache.get_many(config_key, line_keys)
+        
+        missing = OrderedDict()
+        for line, line_key, line_filth in zip(lines, line_keys, cached):
+            if line_filth is None:
+                missing.setdefault(line_key, line)
+        if missing:
+            missing_lines = list(missing.values())
+            if (self.parallel and self.backend != 'presidio'
+                    and sum(len(line) for line in missing_lines) >= self.parallel_threshold):
+                filth_by_line = self._timed_backend_scan(
+                    'ProcessPool', lambda lines: self._scan_lines_parallel(lines, line_detectors), missing_lines, batch=True)
+            else:
+                filth_by_line = self._scan_filth_batch_direct(missing_lines, line_detectors)
+            scanned = {
+                line_key: tuple(portable_filth(f) for f in line_filth)
+                for line_key, line_filth in zip(missing, filth_by_line)
+            }
+            cache.put_many(config_key, scanned)
+            cached = [scanned[line_key] if line_filth is None else line_filth
+                      for line_key, line_filth in zip(line_keys, cached)]
+        logging.info(f"Line cache: {len(lines)} lines, {len(missing)} scanned")
+        return [list(line_filth) for line_filth in cached]
+    
+    def _scan_lines_parallel(self, lines: List[str], line_detectors=None) -> List[List[ChunkFilth]]:
+        """Scan lines the line cache has no results for in the shared process pool, in groups of lines."""
+        pool = get_process_pool(self.selected_detectors, self.max_workers)
+        workers = self.max_workers or os.cpu_count() or 1
+        group_size = max(MIN_PARALLEL_CHUNK_SIZE, sum(len(line) for line in lines) // (workers * 4) + 1)
+        groups, group, size = [], [], 0
+        for line in lines:
+            if group and size + len(line) > group_size:
+                groups.append(group)
+                group, size = [], 0
+            group.append(line)
+            size += len(line) + 1
+        groups.append(group)
+        
+        count = len(groups)
+        filth_by_line = []
+        for group_filth in pool.map(_scan_lines_worker, [self.selected_detectors] * count,
+                                    [self.prefilter] * count, groups, [line_detectors] * count):
+            filth_by_line.extend(group_filth)
+        return filth_by_line
+    
+    def _scan_filth_parallel(self, text: str) -> List[ChunkFilth]:
+        """
+        Scan line-aligned chunks of the text in the shared process pool.
+        Chunks are merged back in input order with absolute offsets, so the
+        result matches the serial scan for findings that do not span lines.
+        """
+        pool = get_process_pool(self.selected_detectors, self.max_workers)
+        workers = self.max_workers or os.cpu_count() or 1
+        chunk_size = max(MIN_PARALLEL_CHUNK_SIZE, len(text) // (workers * 4) + 1)
+        offsets, chunks = zip(*iter_line_chunks(text, chunk_size))
+        count = len(chunks)
+        
+        filth_list = []
+        for chunk_filth in pool.map(_scan_chunk_worker, [self.selected_detectors] * count,
+                                    [self.prefilter] * count, offsets, chunks):
+            filth_list.extend(chunk_filth)
+        return filth_list
+    
+    def detect_pii(self, text_to_analyze: str, aggregate: bool = False) -> Dict[str, Any]:
         """
         Detect PII in the given text.
         Args:
             text_to_analyze (str): Text to analyze for PII
+            aggregate (bool): Return pii_groups grouped by (type, field) instead of one row per hit
         Returns:
             Dict[str, Any]: PII detection results
         """
+        self._diag = ScanDiagnostics() if self.diagnostics else None
+        self._start_budget()
+        self._validation_counts = {'checked': 0, 'failed': {}}
         try:
-            detectors = self.load_detectors()
+            filth_list = self._scan_filth(text_to_analyze)
+            pii_results = self._build_pii_results(text_to_analyze, filth_list)
             
-            scrubber = scrubadub.Scrubber(detector_list=detectors)
-            filth_list = list(scrubber.iter_filth(text_to_analyze))
-            filtered_results = [f for f in filth_list if len(f.text.strip()) >= 3]
+            if aggregate:
+                response = {
+                    'pii_groups': aggregate_pii_results(pii_results),
+                    'suggestion': self._suggestion(pii_results),
+                    'total_detected': len(pii_results)
+                }
+            else:
+                response = {
+                    'pii_results': pii_results,
+                    'suggestion': self._suggestion(pii_results),
+                    'total_detected': len(pii_results)
+                }
+            self._finish_response(response)
+            return response
             
-            pii_results = []
-            for f in filtered_results:
-                # Generate regex pattern for this PII type
-                regex_pattern = self.generate_regex_for_pii(f.text, f.detector_name)
-                
-                pii_results.append({
-                    'type': f.detector_name,
-                    'text': f.text,
-                    'score': 1.0,
-                    'start': f.beg,
-                    'end': f.end,
-                    'field': self.infer_field_name(text_to_analyze, f.beg, f.end, f.detector_name),
-                    'examples': [],
-                    'regex_pattern': regex_pattern
-                })
+        except Exception as e:
+            return {'error': str(e)}
+        finally:
+            self._diag = None
+            self._budget = None
+            self._validation_counts = None
+    
+    def _finish_response(self, response: Dict[str, Any]) -> None:
+        """
+        Attach rejected custom patterns, this call's budget outcome, validation
+        counts and diagnostics to the response, folding the diagnostics into the histograms.
+        """
+        if self._custom_matcher is not None and self._custom_matcher.rejected:
+            response['rejected_patterns'] = list(self._custom_matcher.rejected)
+        if self._budget is not None:
+            response.update(self._budget.as_dict())
+        if self._validation_counts and self._validation_counts['checked']:
+            failed = self._validation_counts['failed']
+            response['validation'] = {
+                'mode': self.validation,
+                'checked': self._validation_counts['checked'],
+                'failed': sum(failed.values()),
+                'failed_by_type': dict(failed),
+            }
+        if self._diag is None:
+            return
+        DETECTOR_HISTOGRAMS.observe(self._diag)
+        response['diagnostics'] = self._diag.as_dict()
+    
+    def iter_pii(self, lines_or_file, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """
+        Stream PII findings over arbitrarily large input with bounded memory.
+        Input is processed in line-aligned chunks; only one chunk and its
+        findings are held at a time. Field inference uses the chunk as context.
+        Args:
+            lines_or_file: A string, an open text file, or an iterable of lines
+            chunk_size (int): Target chunk size in characters
+        Yields:
+            Dict[str, Any]: PII results with offsets into the whole input
+        """
+        for offset, chunk in iter_line_chunks(lines_or_file, chunk_size):
+            for result in self._build_pii_results(chunk, self._scan_filth(chunk)):
+                result['start'] += offset
+                result['end'] += offset
+                yield result
+    
+    def _scan_filth_batch(self, events: List[str]) -> List[List[Any]]:
+        """Return filth per event, scanning events that share a detector subset together."""
+        if self._budget is not None:
+            return self._scan_filth_batch_budgeted(events)
+        if self.line_cache is not None:
+            return self._scan_lines_cached(events)
+        return self._scan_filth_batch_direct(events)
+    
+    def _scan_filth_batch_direct(self, events: List[str], detector_names=None) -> List[List[Any]]:
+        """Scan every event, without the line cache or budgets, with all or detector_names of the selected detectors."""
+        if self.backend == 'presidio':
+            return self._timed_backend_scan('PresidioBackend', self.presidio_backend().analyze_batch, events, batch=True)
+        
+        filth_by_event = [[] for _ in events]
+        self._scan_events(events, range(len(events)), filth_by_event, detector_names)
+        return filth_by_event
+    
+    def _scan_filth_batch_budgeted(self, events: List[str]) -> List[List[Any]]:
+        """Scan events in slices of about budget_chunk_size characters, checking budgets between slices."""
+        budget = self._budget
+        filth_by_event = [[] for _ in events]
+        start = 0
+        while start < len(events):
+            if budget.out_of_time():
+                break
+            end, size = start, 0
+            while end < len(events) and (end == start or size + len(events[end]) <= self.budget_chunk_size):
+                size += len(events[end])
+                end += 1
+            if self.backend == 'presidio':
+                slice_filth = self._scan_presidio_budgeted(events[start:end])
+                if slice_filth is not None:
+                    filth_by_event[start:end] = slice_filth
+            else:
+                self._scan_events(events, range(start, end), filth_by_event)
+            budget.advance(end, len(events))
+            start = end
+        if not events:
+            budget.advance(0, 0)
+        return filth_by_event
+    
+    def _scan_events(self, events: List[str], indexes, filth_by_event: List[List[Any]], detector_names=None) -> None:
+        """Scan the indexed events with all or detector_names of the selected detectors, adding their filth to filth_by_event."""
+        # Group events by the detector subset their markers allow
+        groups = {}
+        for index in indexes:
+            if detector_names is None:
+                active_detectors = frozenset(select_detectors(self.selected_detectors, events[index])) if self.prefilter else None
+            else:
+                active_detectors = frozenset(select_detectors(detector_names, events[index]) if self.prefilter else detector_names)
+            if self._budget is not None:
+                active_detectors = frozenset(self._budget.active(self.selected_detectors, active_detectors))
+            groups.setdefault(active_detectors, []).append(index)
+        
+        for active_detectors, indexes in groups.items():
+            scrubber = self._get_scrubber(active_detectors)
+            if scrubber is None:
+                continue
+            documents = {str(index): events[index] for index in indexes}
+            for f in scrubber.iter_filth_documents(documents):
+                filth_by_event[int(f.document_name)].append(f)
+    
+    def detect_pii_batch(self, events: List[str], aggregate: bool = False) -> Dict[str, Any]:
+        """
+        Detect PII in many events with one detector set.
+        Events that pass the same prefilter checks are scanned together through
+        scrubadub's multi-document iteration (or in nlp.pipe batches with the
+        presidio backend); offsets are relative to each event.
+        Args:
+            events (list): Event strings to analyze
+            aggregate (bool): Replace per-event results with pii_groups across all events
+        Returns:
+            Dict[str, Any]: Per-event results and an aggregate summary
+        """
+        self._diag = ScanDiagnostics() if self.diagnostics else None
+        self._start_budget()
+        self._validation_counts = {'checked': 0, 'failed': {}}
+        try:
+            filth_by_event = self._scan_filth_batch(events)
+            # Validate every event's candidates together so each validator runs once
+            validated = self._validate_filth(filth_by_event)
+            # Regexes are generalized from every event's values of a type, not one event's
+            value_patterns = ValuePatterns()
+            for event, (kept, _failed) in zip(events, validated):
+                for f in kept:
+                    if len(f.text.strip()) >= 3:
+                        value_patterns.add(f.detector_name, f.text)
+                value_patterns.add_non_pii(event, [(f.beg, f.end) for f in kept])
             
-            # Add custom pattern detection
-            custom_results = self.detect_custom_patterns(text_to_analyze)
-            for custom_result in custom_results:
-                pii_results.append({
-                    'type': custom_result['type'],
-                    'text': custom_result['text'],
-                    'score': custom_result['score'],
-                    'start': custom_result['start'],
-                    'end': custom_result['end'],
-                    'field': self.infer_field_name(text_to_analyze, custom_result['start'], custom_result['end'], custom_result['type']),
-                    'examples': [],
-                    'detector': custom_result['detector'],
-                    'name': custom_result['name'],
-                    'regex_pattern': custom_result.get('regex_pattern', custom_result.get('regex', ''))
+            results = []
+            by_type = {}
+            all_results = []
+            for index, event in enumerate(events):
+                pii_results = self._build_pii_results(event, *validated[index], value_patterns=value_patterns)
+                for res in pii_results:
+                    by_type[res['type']] = by_type.get(res['type'], 0) + 1
+                    if aggregate:
+                        res['event_index'] = index
+                all_results.extend(pii_results)
+                results.append({
+                    'event_index': index,
+                    'pii_results': pii_results,
+                    'total_detected': len(pii_results)
                 })
             
-            suggestion = "No PII detected."
-            if pii_results:
-                pii_types = sorted(list(set([res['type'] for res in pii_results])))
-                suggestion = f"Detected PII types: {', '.join(pii_types)}. Recommended action: Review and mask sensitive data before indexing."
-            
-            return {
-                'pii_results': pii_results,
-                'suggestion': suggestion,
-                'total_detected': len(pii_results)
+            response = {
+                'summary': {
+                    'total_events': len(events),
+                    'events_with_pii': sum(1 for res in results if res['total_detected']),
+                    'total_detected': len(all_results),
+                    'by_type': by_type
+                },
+                'suggestion': self._suggestion(all_results),
+                'total_detected': len(all_results)
             }
+            if aggregate:
+                response['pii_groups'] = aggregate_pii_results(all_results)
+            else:
+                response['results'] = results
+            self._finish_response(response)
+            return response
             
         except Exception as e:
             return {'error': str(e)}
+        finally:
+            self._diag = None
+            self._budget = None
+            self._validation_counts = None
     
-    def infer_field_name(self, text: str, start: int, end: int, entity_type: str) -> str:
+    def detect_pii_sampled(self, lines_or_file, sample_size: int = DEFAULT_SAMPLE_SIZE, method: str = 'reservoir',
+                           seed: Optional[int] = None, confidence: float = DEFAULT_CONFIDENCE) -> Dict[str, Any]:
+        """
+        Estimate how often each PII type and field occurs from a sample of lines.
+        Only the sampled lines are scanned, as a batch of events; rates are
+        extrapolated to every line of the input with confidence intervals.
+        Args:
+            lines_or_file: A string, an open text file, or an iterable of lines
+            sample_size (int): Lines to scan
+            method (str): 'reservoir' (uniform) or 'stratified' (by line shape)
+            seed (int): Random seed, for a reproducible sample
+            confidence (float): Confidence level of the intervals
+        Returns:
+            Dict[str, Any]: sampling details, prevalence estimates and the sample's pii_groups
+        """
+        try:
+            sample = draw_sample(lines_or_file, sample_size, method, seed)
+        except Exception as e:
+            return {'error': str(e)}
+        batch = self.detect_pii_batch(sample.lines)
+        if 'error' in batch:
+            return batch
+        
+        results_by_line = [event['pii_results'] for event in batch['results']]
+        all_results = []
+        for index, pii_results in enumerate(results_by_line):
+            for res in pii_results:
+                res['event_index'] = index
+            all_results.extend(pii_results)
+        response = {
+            'sampling': dict(sample.as_dict(), confidence=confidence),
+            'prevalence': estimate_prevalence(sample, results_by_line, confidence),
+            'pii_groups': aggregate_pii_results(all_results),
+            'suggestion': self._suggestion(all_results),
+            'total_detected': len(all_results)
+        }
+        for key in ('diagnostics', 'partial', 'cut_detectors', 'coverage', 'rejected_patterns', 'validation'):
+            if key in batch:
+                response[key] = batch[key]
+        return response
+    
+    def redact_preview(self, text_to_analyze: str, minimize: bool = False) -> Dict[str, Any]:
+        """
+        Detect PII, then apply the SEDCMD rules generated for the findings to the text.
+        Args:
+            text_to_analyze (str): Sample to analyze and redact
+            minimize (bool): Merge the rules into the smallest set that redacts the sample identically
+        Returns:
+            Dict[str, Any]: detect_pii results plus a redact_preview block with the
+            redacted text, per-rule match counts and time, and findings the rules missed
+        """
+        from sedcmd_rules import redact_preview
+        response = self.detect_pii(text_to_analyze)
+        if 'error' in response:
+            return response
+        try:
+            response['redact_preview'] = redact_preview(text_to_analyze, response['pii_results'],
+                                                          minimize=minimize)
+        except Exception as e:
+            logging.error(f"Error building redaction preview: {e}")
+            return {'error': str(e)}
+        return response
+    
+    def estimate_rule_cost(self, text_to_analyze: str, eps: float) -> Dict[str, Any]:
+        """
+        Detect PII, then benchmark the SEDCMD and EXTRACT rules generated for the findings.
+        Args:
+            text_to_analyze (str): Sample to analyze; each line is timed as an event
+            eps (float): Events per second to project cores for
+        Returns:
+            Dict[str, Any]: detect_pii results plus a rule_cost block with the rules
+            ranked by µs per event, their worst case on adversarial inputs and projected cores
+        """
+        from rule_cost import estimate_rule_cost
+        response = self.detect_pii(text_to_analyze)
+        if 'error' in response:
+            return response
+        try:
+            response['rule_cost'] = estimate_rule_cost(text_to_analyze, response['pii_results'], eps,
+                                                       timeout_ms=self.pattern_timeout_ms)
+        except Exception as e:
+            logging.error(f"Error estimating rule cost: {e}")
+            return {'error': str(e)}
+        return response
+    
+    def infer_field_name(self, text: str, start: int, end: int, entity_type: str,
+                         index: Optional[DocumentIndex] = None) -> str:
         """
         Try to infer the field name for this PII based on its context in the text.
         Args:
@@ -217,51 +1702,46 @@ class PiiDetectionLogic:
             start (int): Start index of the PII entity.
             end (int): End index of the PII entity.
             entity_type (str): The type of PII entity.
+            index (DocumentIndex): Prebuilt index of text; built on demand if omitted.
         Returns:
-            str: Inferred field name or entity type as fallback.
+            str: Nearest enclosing field name or entity type as fallback.
         """
-        # Get some context around the PII
-        context_start = max(0, start - 50)
-        context_end = min(len(text), end + 50)
-        context = text[context_start:context_end]
-        pii_text = text[start:end]
-        
-        # Try key-value format
-        kv_match = KV_REGEX.search(context)
-        if kv_match:
-            return kv_match.group(1)
-        
-        # Try JSON format
-        json_match = JSON_REGEX.search(context)
-        if json_match:
-            return json_match.group(1)
-        
-        # For Apache logs, infer based on position
-        if APACHE_IP_REGEX.match(text.strip()):
-            if start < 20:
-                return 'clientip'
-            elif '[' in context and ']' in context:
-                return 'timestamp'
-            elif '"' in context:
-                return 'request'
+        if index is None:
+            index = DocumentIndex(text)
+        _kind, field = index.classify(start, end)
         
         # Fallback: use entity type as field name
-        return entity_type.lower()
+        return field or entity_type.lower()
 
-    def generate_regex_for_pii(self, pii_text: str, detector_name: str) -> str:
+    def generate_regex_for_pii(self, pii_text: str, detector_name: str,
+                               value_patterns: Optional[ValuePatterns] = None) -> str:
         """
         Generate a regex pattern to match and redact PII of the same type.
+        A pattern synthesized from the type's values in the sample is preferred
+        over the per-detector patterns below, unless it matches non-PII text in
+        the sample. Other types fall back to the escaped value when their values
+        don't generalize.
         Args:
             pii_text (str): The detected PII text
             detector_name (str): The detector that found this PII
+            value_patterns (ValuePatterns): Values of each type observed in the sample
         Returns:
             str: Regex pattern to match similar PII
         """
+        synthesized = value_patterns.get(detector_name) if value_patterns is not None else None
+        if synthesized:
+            return synthesized
+
         # Escape the specific PII text for exact matching
         escaped_text = re.escape(pii_text)
         
-        # Generate patterns based on detector type
+        # Generate patterns based on detector type, under the scrubadub result name too
+        detector_name = RESULT_TYPE_DETECTORS.get(detector_name, detector_name)
         if 'IpAddressDetector' in detector_name:
+            if MAC_TEXT_REGEX.fullmatch(pii_text):
+                return MAC_RULE_PATTERN
+            if pii_text.count(':') >= 2:
+                return IPV6_RULE_PATTERN
             return r'\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b'
         elif 'EmailDetector' in detector_name:
             return r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
@@ -274,12 +1754,13 @@ class PiiDetectionLogic:
         elif 'UrlDetector' in detector_name:
             return r'\bhttps?://[^\s"\'<>]+\b'
         else:
-            # For other types, use a pattern that matches the specific text
-            # but allows for variations in spacing and formatting
+            # For other types, the specific text
             return escaped_text
 
 
-def generate_sedcmd_regex(text: str, start: int, end: int, entity_type: str, pii_text: str) -> Dict[str, str]:
+def generate_sedcmd_regex(text: str, start: int, end: int, entity_type: str, pii_text: str,
+                          index: Optional[DocumentIndex] = None,
+                          value_patterns: Optional[ValuePatterns] = None) -> Dict[str, str]:
     """
     Generate a field-specific regex pattern for SEDCMD based on the PII location and context.
     Returns a dict with 'pattern' and 'replacement' for the SEDCMD rule.
@@ -289,70 +1770,85 @@ def generate_sedcmd_regex(text: str, start: int, end: int, entity_type: str, pii
         end (int): End index of the PII entity.
         entity_type (str): The type of PII entity.
         pii_text (str): The detected PII text.
+        index (DocumentIndex): Prebuilt index of text; built on demand if omitted.
+        value_patterns (ValuePatterns): Values of each type observed in the sample.
     Returns:
         Dict[str, str]: Regex pattern and replacement for SEDCMD.
     """
-    # Get some context around the PII
-    context_start = max(0, start - 50)
-    context_end = min(len(text), end + 50)
-    context = text[context_start:context_end]
+    if index is None:
+        index = DocumentIndex(text)
+    kind, field_name = index.classify(start, end)
+    value_pattern = get_value_pattern_for_type(entity_type, value_patterns, pii_text)
     
-    # Try to detect key-value format (field=value)
-    kv_match = KV_REGEX.search(context)
-    if kv_match:
-        field_name = kv_match.group(1)
-        value_pattern = get_value_pattern_for_type(entity_type)
+    # Key-value format (field=value)
+    if kind == 'kv':
         return {
             'pattern': f'{field_name}=({value_pattern})',
             'replacement': f'{field_name}=[REDACTED_{entity_type.upper()}]'
         }
     
-    # Try to detect JSON format ("field":"value")
-    json_match = JSON_REGEX.search(context)
-    if json_match:
-        field_name = json_match.group(1)
-        value_pattern = get_value_pattern_for_type(entity_type)
+    # JSON format ("field":"value")
+    if kind == 'json':
         return {
             'pattern': f'"{field_name}"\\s*:\\s*"({value_pattern})"',
             'replacement': f'"{field_name}":"[REDACTED_{entity_type.upper()}]"'
         }
     
-    # Try to detect Apache log format (positional)
-    if APACHE_IP_REGEX.match(text.strip()):
-        # This looks like an Apache log
-        if start < 20:  # Likely the client IP at the beginning
-            value_pattern = get_value_pattern_for_type(entity_type)
-            return {
-                'pattern': f'^({value_pattern})',
-                'replacement': f'[REDACTED_{entity_type.upper()}]'
-            }
-        elif '[' in context and ']' in context:  # Likely timestamp in brackets
-            value_pattern = get_value_pattern_for_type(entity_type)
-            return {
-                'pattern': f'\\[({value_pattern})\\]',
-                'replacement': f'[[REDACTED_{entity_type.upper()}]]'
-            }
-        elif '"' in context:  # Likely in the quoted request field
-            value_pattern = get_value_pattern_for_type(entity_type)
-            return {
-                'pattern': f'"([^"]*{re.escape(pii_text)}[^"]*)"',
-                'replacement': f'"[REDACTED_{entity_type.upper()}]"'
-            }
+    # Apache log format (positional)
+    if kind == 'apache_start':  # Likely the client IP at the beginning
+        return {
+            'pattern': f'^({value_pattern})',
+            'replacement': f'[REDACTED_{entity_type.upper()}]'
+        }
+    if kind == 'apache_bracket':  # Likely timestamp in brackets
+        return {
+            'pattern': f'\\[({value_pattern})\\]',
+            'replacement': f'[[REDACTED_{entity_type.upper()}]]'
+        }
+    if kind == 'apache_quote':  # Likely in the quoted request field
+        return {
+            'pattern': f'"([^"]*{re.escape(pii_text)}[^"]*)"',
+            'replacement': f'"[REDACTED_{entity_type.upper()}]"'
+        }
     
     # Fallback: use type-specific pattern without field context
-    value_pattern = get_value_pattern_for_type(entity_type)
     return {
         'pattern': value_pattern,
         'replacement': f'[REDACTED_{entity_type.upper()}]'
     }
 
 
-def get_value_pattern_for_type(entity_type: str) -> str:
+def compile_entity_type_patterns() -> Dict[str, Any]:
+    """
+    Compile ENTITY_TYPE_PATTERNS into the shared pattern cache (used by warm-up).
+    Returns:
+        Dict[str, Any]: Entity type to compiled pattern
+    """
+    return {entity_type: PATTERN_CACHE.get(pattern) for entity_type, pattern in ENTITY_TYPE_PATTERNS.items()}
+
+
+def get_value_pattern_for_type(entity_type: str, value_patterns: Optional[ValuePatterns] = None,
+                               pii_text: str = '') -> str:
     """
     Get a regex pattern that matches values of the given PII type.
+    A pattern synthesized from the values observed in the sample is preferred.
+    When there is none, or it matches non-PII text, ENTITY_TYPE_PATTERNS is used
+    under the type's Presidio or scrubadub name (IP addresses get the pattern of
+    their address family), else the catch-all fallback.
     Args:
         entity_type (str): The type of PII entity.
+        value_patterns (ValuePatterns): Values of each type observed in the sample.
+        pii_text (str): The detected PII text, which picks the IP address family.
     Returns:
         str: Regex pattern for the entity type.
     """
-    return ENTITY_TYPE_PATTERNS.get(entity_type, r'[^\s,="]+') 
\ No newline at end of file
+    synthesized = value_patterns.get(entity_type) if value_patterns is not None else None
+    if synthesized:
+        return synthesized
+    static_type = STATIC_PATTERN_TYPES.get(entity_type, entity_type)
+    if static_type == 'IP_ADDRESS':
+        if MAC_TEXT_REGEX.fullmatch(pii_text):
+            return MAC_RULE_PATTERN
+        if pii_text.count(':') >= 2:
+            return IPV6_RULE_PATTERN
+    return ENTITY_TYPE_PATTERNS.get(static_type, r'[^\s,="]+')
\ No newline at end of file
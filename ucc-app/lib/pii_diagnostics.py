@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Per-detector instrumentation and time budgets for PII scans.
+When diagnostics are requested, detectors are wrapped in a timing proxy that
+records wall time and candidate count, custom patterns are timed per pattern,
+and each call is folded into rolling per-process histograms. Time budgets use
+the same proxy to cut slow detectors. Nothing here runs when both are off.
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional
+
+from lazy_imports import LazyModule
+
+scrubadub = LazyModule('scrubadub')
+
+# Latency histogram bucket upper bounds in milliseconds
+HISTOGRAM_BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000)
+# Calls per detector kept in the rolling window
+DEFAULT_HISTOGRAM_WINDOW = 1000
+
+
+class ScanDiagnostics:
+    """
+    Wall time, candidate and emitted-finding counts for one detect_pii call.
+    Candidates are what a detector yielded; emitted is what made it into pii_results.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.entries = OrderedDict()
+        self.skipped = OrderedDict()
+        self._labels = {}
+
+    def _entry(self, name: str, kind: str) -> Dict[str, Any]:
+        entry = self.entries.get(name)
+        if entry is None:
+            entry = self.entries[name] = {'kind': kind, 'calls': 0, 'seconds': 0.0, 'candidates': 0, 'emitted': 0}
+        return entry
+
+    def record(self, name: str, seconds: float, candidates: int, kind: str = 'detector',
+               filth_name: Optional[str] = None, emitted: int = 0) -> None:
+        """
+        Add one timed pass.
+        Args:
+            name (str): Detector or custom pattern label
+            seconds (float): Wall time of the pass
+            candidates (int): Items the pass produced
+            kind (str): 'detector', 'custom_pattern' or 'backend'
+            filth_name (str): detector_name the pass puts on its filth, for attributing emitted findings
+            emitted (int): Findings kept, when known up front
+        """
+        entry = self._entry(name, kind)
+        entry['calls'] += 1
+        entry['seconds'] += seconds
+        entry['candidates'] += candidates
+        entry['emitted'] += emitted
+        if filth_name:
+            self._labels[filth_name] = name
+
+    def emitted(self, filth_name: str, count: int = 1) -> None:
+        """Count findings that survived filtering, by the detector_name on their filth."""
+        name = self._labels.get(filth_name, filth_name)
+        self._entry(name, 'detector')['emitted'] += count
+
+    def skip(self, name: str) -> None:
+        """Record a detector skipped by the prefilter."""
+        self.skipped[name] = self.skipped.get(name, 0) + 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the diagnostics block, slowest first."""
+        rows = [
+            {
+                'name': name,
+                'kind': entry['kind'],
+                'ms': round(entry['seconds'] * 1000, 3),
+                'calls': entry['calls'],
+                'candidates': entry['candidates'],
+                'emitted': entry['emitted'],
+            }
+            for name, entry in self.entries.items()
+        ]
+        rows.sort(key=lambda row: row['ms'], reverse=True)
+        return {
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 3),
+            'detectors': rows,
+            'skipped': dict(self.skipped),
+        }
+
+
+class DetectorHistograms:
+    """
+    Rolling per-process latency histograms for each detector and custom pattern.
+    Only the last `window` calls per name are kept.
+    """
+
+    def __init__(self, window: int = DEFAULT_HISTOGRAM_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._totals = {}
+
+    def observe(self, diagnostics: ScanDiagnostics) -> None:
+        """Fold one call's diagnostics into the histograms."""
+        with self._lock:
+            for name, entry in diagnostics.entries.items():
+                samples = self._samples.get(name)
+                if samples is None:
+                    samples = self._samples[name] = deque(maxlen=self.window)
+                    self._totals[name] = {'kind': entry['kind'], 'calls': 0, 'candidates': 0, 'emitted': 0}
+                samples.append(entry['seconds'] * 1000)
+                totals = self._totals[name]
+                totals['calls'] += 1
+                totals['candidates'] += entry['candidates']
+                totals['emitted'] += entry['emitted']
+
+    @staticmethod
+    def _percentile(ordered: List[float], fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def summary(self) -> Dict[str, Any]:
+        """Return bucket counts, percentiles and running totals per name."""
+        with self._lock:
+            snapshot = {name: (sorted(samples), dict(self._totals[name])) for name, samples in self._samples.items()}
+        summary = {}
+        for name, (ordered, totals) in snapshot.items():
+            buckets = OrderedDict((f"le_{bound}", 0) for bound in HISTOGRAM_BUCKETS_MS)
+            buckets['gt_max'] = 0
+            for ms in ordered:
+                for bound in HISTOGRAM_BUCKETS_MS:
+                    if ms <= bound:
+                        buckets[f"le_{bound}"] += 1
+                        break
+                else:
+                    buckets['gt_max'] += 1
+            summary[name] = dict(totals, window=len(ordered), buckets=buckets,
+                                 p50_ms=round(self._percentile(ordered, 0.5), 3),
+                                 p95_ms=round(self._percentile(ordered, 0.95), 3),
+                                 max_ms=round(ordered[-1], 3))
+        return summary
+
+    def clear(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+
+
+# Shared by every PiiDetectionLogic instance in the process
+DETECTOR_HISTOGRAMS = DetectorHistograms()
+
+
+class ScanBudget:
+    """
+    Per-request and per-detector time budgets for one scan.
+
+    The scan runs chunk by chunk. Between chunks, a detector whose accumulated
+    time is over its budget is cut for the remaining chunks, and the whole
+    scan stops once the request budget is spent. A chunk that has started is
+    never interrupted, so overshoot is bounded by one chunk.
+    """
+
+    def __init__(self, request_budget_ms: Optional[float] = None, detector_budget_ms: Optional[float] = None,
+                 timing: Optional[ScanDiagnostics] = None):
+        """
+        Args:
+            request_budget_ms (float): Wall time for the whole scan, or None for no limit
+            detector_budget_ms (float): Wall time per detector, or None for no limit
+            timing (ScanDiagnostics): Shared with diagnostics when those are on
+        """
+        self.request_budget_ms = request_budget_ms or None
+        self.detector_budget_ms = detector_budget_ms or None
+        self.timing = timing if timing is not None else ScanDiagnostics()
+        self.started = time.perf_counter()
+        self.cut = OrderedDict()
+        self.expired = False
+        self.done = 0
+        self.total = 0
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def out_of_time(self) -> bool:
+        """Check the request budget before starting the next chunk."""
+        if not self.expired and self.request_budget_ms and self.elapsed_ms() >= self.request_budget_ms:
+            self.expired = True
+        return self.expired
+
+    def is_cut(self, name: str) -> bool:
+        return name in self.cut
+
+    def active(self, detector_names, active_names=None) -> set:
+        """Return the detectors still allowed to run, out of active_names (or all)."""
+        names = set(detector_names) if active_names is None else set(active_names)
+        return names - set(self.cut)
+
+    def advance(self, done: int, total: int) -> None:
+        """
+        Record progress after a chunk and cut detectors over their budget.
+        Args:
+            done (int): Units (characters or events) scanned so far
+            total (int): Units in the whole input
+        """
+        self.done, self.total = done, total
+        if not self.detector_budget_ms:
+            return
+        for name, entry in self.timing.entries.items():
+            if entry['kind'] != 'custom_pattern' and name not in self.cut \
+                    and entry['seconds'] * 1000 > self.detector_budget_ms:
+                self.cut[name] = {
+                    'name': name,
+                    'ms': round(entry['seconds'] * 1000, 1),
+                    'coverage': round(done / total, 4) if total else 1.0,
+                }
+                logging.warning(f"Detector {name} exceeded its {self.detector_budget_ms} ms budget "
+                                f"after {self.cut[name]['coverage']:.1%} of the input")
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return partial, cut_detectors and coverage for the response."""
+        coverage = round(self.done / self.total, 4) if self.total else 1.0
+        return {
+            'partial': self.expired or bool(self.cut) or coverage < 1.0,
+            'cut_detectors': list(self.cut.values()),
+            'coverage': coverage,
+        }
+
+_timed_detector_cls = None
+
+
+def _make_timed_detector_class(base):
+    class _TimedDetector(base):
+        """
+        Proxy for a scrubadub detector that records wall time and candidate count.
+        Subclasses Detector so Scrubber accepts it; everything else is delegated.
+        """
+
+        def __init__(self, detector, diagnostics: ScanDiagnostics, label: str):
+            # Detector.__init__ is skipped; identity comes from the wrapped detector
+            self._detector = detector
+            self._diagnostics = diagnostics
+            self._label = label
+            self.name = detector.name
+            self.filth_cls = getattr(detector, 'filth_cls', None)
+
+        def __getattr__(self, attr):
+            return getattr(self._detector, attr)
+
+        def iter_filth(self, text, document_name=None, **kwargs):
+            return self._timed(self._detector.iter_filth, text, document_name=document_name, **kwargs)
+
+        def iter_filth_documents(self, *args, **kwargs):
+            return self._timed(self._detector.iter_filth_documents, *args, **kwargs)
+
+        def _timed(self, method, *args, **kwargs):
+            # The wrapped method is called here rather than inside a generator, so a
+            # NotImplementedError reaches Scrubber at call time and it falls back to iter_filth.
+            # The call itself is timed too, for detectors that do their work eagerly.
+            start = time.perf_counter()
+            filth_iter = method(*args, **kwargs)
+            return self._timed_iter(filth_iter, time.perf_counter() - start)
+
+        def _timed_iter(self, filth_iter, seconds):
+            # Only time spent inside the wrapped detector counts, not the consumer's work
+            candidates = 0
+            start = time.perf_counter()
+            try:
+                for filth in filth_iter:
+                    seconds += time.perf_counter() - start
+                    candidates += 1
+                    yield filth
+                    start = time.perf_counter()
+                seconds += time.perf_counter() - start
+            finally:
+                self._diagnostics.record(self._label, seconds, candidates, filth_name=self.name)
+
+    return _TimedDetector
+
+
+def timed_detector(detector, diagnostics: ScanDiagnostics, label: str):
+    """
+    Wrap a detector in a _TimedDetector proxy.
+    Args:
+        detector: scrubadub detector instance
+        diagnostics (ScanDiagnostics): Where timings are recorded
+        label (str): Name to record under (the configured detector name)
+    Returns:
+        A Detector subclass instance usable in a Scrubber
+    """
+    global _timed_detector_cls
+    if _timed_detector_cls is None:
+        _timed_detector_cls = _make_timed_detector_class(scrubadub.detectors.Detector)
+    return _timed_detector_cls(detector, diagnostics, label)
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Result caches for PII detection.
+Repeat scans of the same sample (e.g. users moving between wizard steps) are
+served from memory, and optionally from disk across persistent-process restarts.
+When a sample is edited, per-line scan results let only the changed lines be rescanned.
+"""
+
+import os
+import json
+import time
+import logging
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+# Lines whose scan results are kept by LineResultCache
+DEFAULT_LINE_CACHE_SIZE = 100000
+
+
+class ResultCache:
+    """
+    TTL and size-bounded LRU of detection results keyed by
+    (text hash, detector list, custom-pattern fingerprint, options).
+    """
+
+    def __init__(self, ttl: float = 600, maxsize: int = 64, persist_dir: Optional[str] = None):
+        """
+        Args:
+            ttl (float): Seconds an entry stays valid
+            maxsize (int): Maximum number of entries kept
+            persist_dir (str): Directory for on-disk persistence, or None to keep results in memory only
+        """
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.persist_dir = persist_dir
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure(self, ttl: float, maxsize: int, persist_dir: Optional[str] = None) -> None:
+        """Apply new settings, trimming the cache if it shrank."""
+        with self._lock:
+            self.ttl = ttl
+            self.maxsize = maxsize
+            self.persist_dir = persist_dir
+            self._trim()
+
+    @staticmethod
+    def make_key(text_hash: str, detector_names: List[str], custom_patterns: List[Dict[str, Any]], **options) -> str:
+        """
+        Build the cache key for a request.
+        Args:
+            text_hash (str): sha256 of the analyzed text
+            detector_names (list): Configured detector list
+            custom_patterns (list): Custom patterns sent with the request
+            **options: Anything else that changes the response shape (e.g. aggregate)
+        Returns:
+            str: Hex digest identifying the request
+        """
+        fingerprint = json.dumps({
+            'detectors': list(detector_names),
+            'custom_patterns': custom_patterns or [],
+            'options': options,
+        }, sort_keys=True)
+        return hashlib.sha256(f"{text_hash}:{fingerprint}".encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Optional[str]:
+        if not self.persist_dir:
+            return None
+        return os.path.join(self.persist_dir, f"{key}.json")
+
+    def _remove_file(self, key: str) -> None:
+        path = self._path(key)
+        if path and os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError as e:
+                logging.warning(f"Could not remove cached result {path}: {e}")
+
+    def _trim(self) -> None:
+        while len(self._entries) > self.maxsize:
+            key, _entry = self._entries.popitem(last=False)
+            self._remove_file(key)
+            self.evictions += 1
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as cache_file:
+                return json.load(cache_file)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read cached result {path}: {e}")
+            return None
+
+    def _store(self, key: str, entry: Dict[str, Any]) -> None:
+        path = self._path(key)
+        if not path:
+            return
+        try:
+            os.makedirs(self.persist_dir, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as cache_file:
+                json.dump(entry, cache_file)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Could not persist cached result {path}: {e}")
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Return the cached result for key, or None if missing or expired.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            from_disk = False
+            if entry is None:
+                entry = self._load(key)
+                from_disk = entry is not None
+            if entry is not None and entry['expires'] <= now:
+                self._entries.pop(key, None)
+                self._remove_file(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+
+            if from_disk:
+                self.disk_hits += 1
+                self._entries[key] = entry
+                self._trim()
+            else:
+                self.hits += 1
+            self._entries.move_to_end(key)
+            return entry['value']
+
+    def put(self, key: str, value: Any) -> None:
+        """Cache a result for key."""
+        entry = {'expires': time.time() + self.ttl, 'value': value}
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._store(key, entry)
+            self._trim()
+
+    def clear(self) -> None:
+        """Drop every cached result, including persisted ones."""
+        with self._lock:
+            for key in list(self._entries):
+                self._remove_file(key)
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss and eviction counters."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'persistent': bool(self.persist_dir),
+            }
+
+
+class LineResultCache:
+    """
+    Size-bounded LRU of per-line scan results keyed by (scan configuration, line hash).
+    Values are the filth found in the line, with offsets relative to the line.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_LINE_CACHE_SIZE):
+        """
+        Args:
+            maxsize (int): Maximum number of lines kept across all configurations
+        """
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure(self, maxsize: int) -> None:
+        """Apply a new size, trimming the cache if it shrank."""
+        with self._lock:
+            self.maxsize = maxsize
+            self._trim()
+
+    @staticmethod
+    def make_config_key(**config) -> str:
+        """
+        Fingerprint everything that changes what a line scan finds (detectors, backend and its options).
+        """
+        return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def line_key(line: str) -> bytes:
+        """128-bit digest of a line, so cached entries don't hold the (PII-bearing) text as keys."""
+        return hashlib.blake2b(line.encode('utf-8'), digest_size=16).digest()
+
+    def _trim(self) -> None:
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_many(self, config_key: str, line_keys: Sequence[bytes]) -> List[Optional[Any]]:
+        """
+        Look up many lines at once.
+        Returns:
+            list: Cached value per line key, or None where the line has not been scanned
+        """
+        values = []
+        with self._lock:
+            for line_key in line_keys:
+                key = (config_key, line_key)
+                value = self._entries.get(key)
+                if value is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                values.append(value)
+        return values
+
+    def put_many(self, config_key: str, values: Dict[bytes, Any]) -> None:
+        """Cache scan results for many lines, by line key."""
+        with self._lock:
+            for line_key, value in values.items():
+                key = (config_key, line_key)
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+            self._trim()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss and eviction counters."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+            }
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Line sampling and prevalence estimation for very large inputs.
+A fixed-size sample of lines is drawn in one streaming pass, either as a
+uniform reservoir or stratified by line shape (the keys a line carries), and
+the share of lines carrying each PII type and field is extrapolated to the
+whole input with a confidence interval.
+"""
+
+import io
+import re
+import math
+import random
+from collections import deque
+from functools import lru_cache
+from itertools import islice
+from statistics import NormalDist
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+SAMPLING_METHODS = ('reservoir', 'stratified')
+DEFAULT_SAMPLE_SIZE = 2000
+DEFAULT_CONFIDENCE = 0.95
+# Lines whose shape is not among the first MAX_STRATA shapes seen share one stratum
+MAX_STRATA = 64
+OTHER_STRATUM = ('__other__',)
+# Keys that make up a line's shape, looked for in the start of the line
+STRATUM_KEYS = 8
+STRATUM_SCAN_CHARS = 256
+
+# key= or "key":
+STRATUM_KEY_REGEX = re.compile(r'(\w+)(?:=|"\s*:)')
+
+
+def line_shape(line: str) -> Tuple[str, ...]:
+    """
+    Stratum key for a line: its first few key=value or JSON keys, or ('text',) when it has none.
+    Args:
+        line (str): Log line
+    Returns:
+        tuple: Sorted key names
+    """
+    return _shape_of_keys(tuple(STRATUM_KEY_REGEX.findall(line, 0, STRATUM_SCAN_CHARS)))
+
+
+@lru_cache(maxsize=4096)
+def _shape_of_keys(keys: Tuple[str, ...]) -> Tuple[str, ...]:
+    # Lines of one format repeat the same keys in the same order, so this is mostly a cache hit
+    if not keys:
+        return ('text',)
+    return tuple(sorted(list(dict.fromkeys(keys))[:STRATUM_KEYS]))
+
+
+def iter_lines(source) -> Iterable[str]:
+    """
+    Yield the non-blank lines of a string, an open text file or an iterable of lines.
+    Strings are read through StringIO so a large input is never split into a list.
+    """
+    if isinstance(source, str):
+        source = io.StringIO(source)
+    # filter() runs str.strip in C; lines are only rstripped once they are kept
+    return filter(str.strip, source)
+
+
+class LineSample:
+    """
+    Lines drawn from an input, with the stratum each came from and every stratum's size.
+    A reservoir sample is a single stratum.
+    """
+
+    def __init__(self, method: str, lines: List[str], strata: List[int], population: List[int],
+                 labels: Optional[List[Hashable]] = None, seed: Optional[int] = None):
+        """
+        Args:
+            method (str): 'reservoir' or 'stratified'
+            lines (list): Sampled lines, in input order
+            strata (list): Stratum index of each sampled line
+            population (list): Number of input lines in each stratum
+            labels (list): Stratum keys, for reporting
+            seed (int): Seed the sample was drawn with
+        """
+        self.method = method
+        self.lines = lines
+        self.strata = strata
+        self.population = population
+        self.labels = labels or [None] * len(population)
+        self.seed = seed
+        self.sampled = [0] * len(population)
+        for stratum in strata:
+            self.sampled[stratum] += 1
+
+    @property
+    def total_lines(self) -> int:
+        return sum(self.population)
+
+    def as_dict(self) -> Dict[str, Any]:
+        info = {
+            'method': self.method,
+            'population_lines': self.total_lines,
+            'sampled_lines': len(self.lines),
+            'seed': self.seed,
+        }
+        if self.method == 'stratified':
+            info['strata'] = [
+                {'shape': '|'.join(label) if isinstance(label, tuple) else str(label),
+                 'lines': population, 'sampled': sampled}
+                for label, population, sampled in zip(self.labels, self.population, self.sampled)
+            ]
+        return info
+
+
+def reservoir_sample(source, sample_size: int = DEFAULT_SAMPLE_SIZE, seed: Optional[int] = None) -> LineSample:
+    """
+    Draw a uniform sample of lines in one pass (Algorithm L).
+    Between replacements, lines are skipped in C with islice, so the cost per
+    unsampled line is reading it and nothing more.
+    Args:
+        source: A string, an open text file, or an iterable of lines
+        sample_size (int): Lines to keep
+        seed (int): Random seed, for a reproducible sample
+    Returns:
+        LineSample: The sample, as one stratum
+    """
+    rng = random.Random(seed)
+    lines = enumerate(iter_lines(source))
+    reservoir = list(islice(lines, sample_size))
+    total = len(reservoir)
+    if total == sample_size and sample_size > 0:
+        weight = math.exp(math.log(1 - rng.random()) / sample_size)
+        while True:
+            skip = int(math.log(1 - rng.random()) / math.log(1 - weight)) if weight < 1 else 0
+            # Consume the skipped lines, remembering only the last to count them
+            skipped = deque(islice(lines, skip), maxlen=1)
+            if skipped:
+                total = skipped[0][0] + 1
+            chosen = next(lines, None)
+            if chosen is None:
+                break
+            total = chosen[0] + 1
+            reservoir[rng.randrange(sample_size)] = chosen
+            weight *= math.exp(math.log(1 - rng.random()) / sample_size)
+    reservoir.sort()
+    return LineSample('reservoir', [line.rstrip('\r\n') for _, line in reservoir],
+                      [0] * len(reservoir), [total], seed=seed)
+
+
+def allocate_sample(sample_size: int, population: List[int], available: List[int]) -> List[int]:
+    """
+    Split a sample across strata in proportion to their size, never more than sample_size lines in all.
+    Every stratum gets at least one line when there are at least as many lines as strata;
+    the remaining lines go to the strata furthest below their proportional share.
+    Args:
+        sample_size (int): Lines to allocate
+        population (list): Input lines in each stratum
+        available (list): Lines that can be drawn from each stratum
+    Returns:
+        list: Lines to draw from each stratum
+    """
+    size = min(sample_size, sum(available))
+    total = sum(population)
+    if size <= 0 or not total:
+        return [0] * len(population)
+    quotas = [size * count / total for count in population]
+    if size >= len(population):
+        allocation = [min(limit, max(1, int(quota))) for quota, limit in zip(quotas, available)]
+    else:
+        allocation = [0] * len(population)
+    allocated = sum(allocation)
+    strata = range(len(population))
+    while allocated > size:
+        # The one-line minimums can overshoot; take back from the strata furthest above their share
+        stratum = max((s for s in strata if allocation[s] > 1), key=lambda s: allocation[s] - quotas[s])
+        allocation[stratum] -= 1
+        allocated -= 1
+    while allocated < size:
+        stratum = max((s for s in strata if allocation[s] < available[s]), key=lambda s: quotas[s] - allocation[s])
+        allocation[stratum] += 1
+        allocated += 1
+    return allocation
+
+
+def stratified_sample(source, sample_size: int = DEFAULT_SAMPLE_SIZE, seed: Optional[int] = None,
+                      stratum_key: Callable[[str], Hashable] = line_shape) -> LineSample:
+    """
+    Draw a sample stratified by line shape, allocated to strata in proportion to their size.
+    Every stratum keeps its own reservoir during the pass, so rare line shapes are
+    represented even when a uniform sample would miss them.
+    Args:
+        source: A string, an open text file, or an iterable of lines
+        sample_size (int): Lines to keep in total
+        seed (int): Random seed, for a reproducible sample
+        stratum_key (callable): Maps a line to its stratum
+    Returns:
+        LineSample: The sample with per-stratum sizes
+    """
+    rng = random.Random(seed)
+    strata = {}
+    labels, population, reservoirs = [], [], []
+    for index, line in enumerate(iter_lines(source)):
+        key = stratum_key(line)
+        stratum = strata.get(key)
+        if stratum is None:
+            if len(labels) == MAX_STRATA - 1 and key != OTHER_STRATUM:
+                key = OTHER_STRATUM
+                stratum = strata.get(key)
+            if stratum is None:
+                stratum = strata[key] = len(labels)
+                labels.append(key)
+                population.append(0)
+                reservoirs.append([])
+        population[stratum] += 1
+        seen = population[stratum]
+        if seen <= sample_size:
+            reservoirs[stratum].append((index, line))
+        else:
+            slot = int(rng.random() * seen)
+            if slot < sample_size:
+                reservoirs[stratum][slot] = (index, line)
+
+    allocation = allocate_sample(sample_size, population, [len(reservoir) for reservoir in reservoirs])
+    chosen = []
+    for stratum, reservoir in enumerate(reservoirs):
+        chosen.extend((index, line, stratum) for index, line in rng.sample(reservoir, allocation[stratum]))
+    chosen.sort()
+    return LineSample('stratified', [line.rstrip('\r\n') for _, line, _ in chosen],
+                      [stratum for _, _, stratum in chosen], population, labels, seed)
+
+
+def draw_sample(source, sample_size: int = DEFAULT_SAMPLE_SIZE, method: str = 'reservoir',
+                seed: Optional[int] = None) -> LineSample:
+    """Draw a reservoir or stratified sample of lines."""
+    if method not in SAMPLING_METHODS:
+        raise ValueError(f"Unknown sampling method '{method}', expected one of {', '.join(SAMPLING_METHODS)}")
+    if method == 'stratified':
+        return stratified_sample(source, sample_size, seed)
+    return reservoir_sample(source, sample_size, seed)
+
+
+def wilson_interval(rate: float, size: float, z: float) -> Tuple[float, float]:
+    """Wilson score interval for a proportion observed over size trials."""
+    if size <= 0:
+        return 0.0, 1.0
+    denominator = 1 + z * z / size
+    centre = (rate + z * z / (2 * size)) / denominator
+    half_width = z * math.sqrt(rate * (1 - rate) / size + z * z / (4 * size * size)) / denominator
+    return max(0.0, centre - half_width), min(1.0, centre + half_width)
+
+
+def estimate_rate(sample: LineSample, hits: List[int], z: float) -> Tuple[float, float, float]:
+    """
+    Estimate the share of all lines with a property from per-stratum hit counts.
+    The stratified estimator's variance (with finite population correction) sets an
+    effective sample size for a Wilson interval, which stays sensible at rates near 0.
+    Args:
+        sample (LineSample): The sample
+        hits (list): Sampled lines with the property, per stratum
+        z (float): Normal quantile for the confidence level
+    Returns:
+        tuple: (rate, interval low, interval high)
+    """
+    total = sample.total_lines
+    rate = variance = 0.0
+    exhaustive = True
+    for population, sampled, hit in zip(sample.population, sample.sampled, hits):
+        if not sampled:
+            continue
+        weight = population / total
+        stratum_rate = hit / sampled
+        rate += weight * stratum_rate
+        if sampled < population:
+            exhaustive = False
+            variance += (weight * weight * (1 - sampled / population)
+                         * stratum_rate * (1 - stratum_rate) / max(sampled - 1, 1))
+    if exhaustive:
+        return rate, rate, rate
+    effective_size = rate * (1 - rate) / variance if variance > 0 else len(sample.lines)
+    low, high = wilson_interval(rate, effective_size, z)
+    return rate, low, high
+
+
+def estimate_prevalence(sample: LineSample, results_by_line: List[List[Dict[str, Any]]],
+                        confidence: float = DEFAULT_CONFIDENCE) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Extrapolate per-type and per-(type, field) prevalence from the sampled lines' findings.
+    Args:
+        sample (LineSample): The sample the findings came from
+        results_by_line (list): PII results for each sampled line
+        confidence (float): Confidence level of the intervals
+    Returns:
+        dict: 'by_type' and 'by_field' rows with the share of lines affected, its
+        interval, and estimated affected lines and occurrences in the whole input
+    """
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    strata_count = len(sample.population)
+    line_hits = {}
+    occurrences = {}
+    for stratum, results in zip(sample.strata, results_by_line):
+        keys = set()
+        for result in results:
+            for key in ((result['type'],), (result['type'], result['field'])):
+                keys.add(key)
+                occurrences.setdefault(key, [0] * strata_count)[stratum] += 1
+        for key in keys:
+            line_hits.setdefault(key, [0] * strata_count)[stratum] += 1
+
+    total = sample.total_lines
+    prevalence = {'by_type': [], 'by_field': []}
+    for key, hits in line_hits.items():
+        rate, low, high = estimate_rate(sample, hits, z)
+        per_line = sum(population * count / sampled
+                       for population, sampled, count in zip(sample.population, sample.sampled, occurrences[key])
+                       if sampled)
+        row = {'type': key[0]}
+        if len(key) == 2:
+            row['field'] = key[1]
+        row.update({
+            'sample_lines': sum(hits),
+            'rate': round(rate, 6),
+            'ci': [round(low, 6), round(high, 6)],
+            'estimated_lines': round(rate * total),
+            'estimated_lines_ci': [math.floor(low * total), math.ceil(high * total)],
+            'estimated_occurrences': round(per_line),
+        })
+        prevalence['by_field' if len(key) == 2 else 'by_type'].append(row)
+    for rows in prevalence.values():
+        rows.sort(key=lambda row: (-row['rate'], row['type'], row.get('field', '')))
+    return prevalence
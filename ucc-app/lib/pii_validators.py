@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Checksum and allocation-rule validators for PII candidates.
+Card numbers must pass the Luhn check, US SSNs the SSA area/group/serial
+rules and UK National Insurance numbers the HMRC prefix rules. Candidates
+are validated in bulk, one batch per validator; with NumPy installed, large
+batches of card numbers and SSNs are checked as digit arrays.
+"""
+
+import re
+import logging
+from typing import Dict, List, Optional, Sequence
+
+from lazy_imports import import_module_timed
+
+# What happens to candidates that fail validation: dropped, kept with a reduced score, or not checked
+VALIDATION_MODES = ('drop', 'score', 'off')
+DEFAULT_VALIDATION_MODE = 'drop'
+# Score reported for failing candidates in 'score' mode
+FAILED_VALIDATION_SCORE = 0.2
+# Smaller batches are checked in Python; array setup costs more than it saves
+NUMPY_MIN_BATCH = 32
+
+CARD_MIN_DIGITS = 12
+CARD_MAX_DIGITS = 19
+# Doubled Luhn digit with the tens digit added back (7 -> 14 -> 1 + 4)
+_LUHN_DOUBLED = (0, 2, 4, 6, 8, 1, 3, 5, 7, 9)
+
+# Numbers the SSA has voided after they were printed in advertising
+INVALID_SSNS = frozenset(('078051120', '219099999', '457555462'))
+
+# HMRC never allocates these first or second letters, nor these prefixes
+NINO_INVALID_FIRST = 'DFIQUV'
+NINO_INVALID_SECOND = 'DFIOQUV'
+NINO_INVALID_PREFIXES = frozenset(('BG', 'GB', 'KN', 'NK', 'NT', 'TN', 'ZZ'))
+NINO_REGEX = re.compile(r'([A-Z]{2})(\d{6})([A-D]?)')
+_LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+VALID_NINO_PREFIXES = frozenset(
+    first + second
+    for first in _LETTERS if first not in NINO_INVALID_FIRST
+    for second in _LETTERS if second not in NINO_INVALID_SECOND
+) - NINO_INVALID_PREFIXES
+
+_NON_DIGITS = re.compile(r'[^0-9]')
+_NINO_SEPARATORS = re.compile(r'[\s-]')
+
+_numpy = None
+
+
+def get_numpy():
+    """Return numpy, imported on first use, or None when it is not installed."""
+    global _numpy
+    if _numpy is None:
+        try:
+            _numpy = import_module_timed('numpy')
+        except ImportError:
+            logging.info("numpy not installed; PII validators run in pure Python")
+            _numpy = False
+    return _numpy or None
+
+
+def _digit_matrix(np, digit_strings: Sequence[str], length: int):
+    """Stack equal-length digit strings into an (n, length) array of digit values."""
+    buffer = np.frombuffer(''.join(digit_strings).encode('ascii'), dtype=np.uint8)
+    return buffer.reshape(len(digit_strings), length).astype(np.int32) - 48
+
+
+def _by_length(digit_strings: Sequence[str]) -> Dict[int, List[int]]:
+    groups = {}
+    for position, digits in enumerate(digit_strings):
+        groups.setdefault(len(digits), []).append(position)
+    return groups
+
+
+def luhn_valid(digits: str) -> bool:
+    """Check a string of ASCII digits against the Luhn checksum."""
+    total = sum(map(int, digits[-1::-2])) + sum(_LUHN_DOUBLED[int(digit)] for digit in digits[-2::-2])
+    return total % 10 == 0
+
+
+def validate_cards(texts: Sequence[str]) -> List[bool]:
+    """
+    Luhn-check card number candidates.
+    Args:
+        texts (list): Candidate texts, with or without spaces and dashes
+    Returns:
+        List[bool]: Whether each candidate is a plausible card number
+    """
+    digit_strings = [_NON_DIGITS.sub('', text) for text in texts]
+    valid = [False] * len(texts)
+    np = get_numpy() if len(texts) >= NUMPY_MIN_BATCH else None
+    for length, positions in _by_length(digit_strings).items():
+        if not CARD_MIN_DIGITS <= length <= CARD_MAX_DIGITS:
+            continue
+        if np is None or len(positions) < NUMPY_MIN_BATCH:
+            for position in positions:
+                valid[position] = luhn_valid(digit_strings[position])
+            continue
+        digits = _digit_matrix(np, [digit_strings[position] for position in positions], length)
+        # Every second digit from the right is doubled; a doubled digit over 9 loses 9
+        doubled = digits[:, -2::-2] * 2
+        totals = digits[:, -1::-2].sum(axis=1) + (doubled - 9 * (doubled > 9)).sum(axis=1)
+        for position, ok in zip(positions, (totals % 10 == 0).tolist()):
+            valid[position] = ok
+    return valid
+
+
+def ssn_valid(digits: str) -> bool:
+    """Check nine ASCII digits against the SSA area, group and serial rules."""
+    if len(digits) != 9:
+        return False
+    area = int(digits[:3])
+    return (area != 0 and area != 666 and area < 900
+            and digits[3:5] != '00' and digits[5:] != '0000' and digits not in INVALID_SSNS)
+
+
+def validate_ssns(texts: Sequence[str]) -> List[bool]:
+    """
+    Check US Social Security number candidates.
+    Area 000, 666 and 900-999, group 00, serial 0000 and voided numbers are rejected.
+    Args:
+        texts (list): Candidate texts, with or without separators
+    Returns:
+        List[bool]: Whether each candidate could have been issued
+    """
+    digit_strings = [_NON_DIGITS.sub('', text) for text in texts]
+    positions = [position for position, digits in enumerate(digit_strings) if len(digits) == 9]
+    valid = [False] * len(texts)
+    np = get_numpy() if len(positions) >= NUMPY_MIN_BATCH else None
+    if np is None:
+        for position in positions:
+            valid[position] = ssn_valid(digit_strings[position])
+        return valid
+
+    digits = _digit_matrix(np, [digit_strings[position] for position in positions], 9)
+    area = digits[:, 0] * 100 + digits[:, 1] * 10 + digits[:, 2]
+    group = digits[:, 3] * 10 + digits[:, 4]
+    serial = digits[:, 5] * 1000 + digits[:, 6] * 100 + digits[:, 7] * 10 + digits[:, 8]
+    ok = (area != 0) & (area != 666) & (area < 900) & (group != 0) & (serial != 0)
+    for position, passed in zip(positions, ok.tolist()):
+        valid[position] = passed and digit_strings[position] not in INVALID_SSNS
+    return valid
+
+
+def validate_ninos(texts: Sequence[str]) -> List[bool]:
+    """
+    Check UK National Insurance number candidates against the HMRC prefix rules.
+    Args:
+        texts (list): Candidate texts, with or without spaces
+    Returns:
+        List[bool]: Whether each candidate has an allocatable prefix and suffix
+    """
+    valid = []
+    for text in texts:
+        match = NINO_REGEX.fullmatch(_NINO_SEPARATORS.sub('', text).upper())
+        valid.append(match is not None and match.group(1) in VALID_NINO_PREFIXES)
+    return valid
+
+
+# Batch validator per finding type, by scrubadub filth name and by detector class name
+VALIDATORS = {
+    'credit_card': validate_cards,
+    'CreditCardDetector': validate_cards,
+    'social_security_number': validate_ssns,
+    'en_US.SocialSecurityNumberDetector': validate_ssns,
+    'national_insurance_number': validate_ninos,
+    'en_GB.NationalInsuranceNumberDetector': validate_ninos,
+}
+
+
+def validate_findings(types: Sequence[str], texts: Sequence[str]) -> List[Optional[bool]]:
+    """
+    Validate many findings at once, one batch per validator.
+    Args:
+        types (list): Finding type (detector name) of each finding
+        texts (list): Finding text of each finding
+    Returns:
+        List[Optional[bool]]: True or False per finding, or None where the type has no validator
+    """
+    batches = {}
+    for position, finding_type in enumerate(types):
+        validator = VALIDATORS.get(finding_type)
+        if validator is not None:
+            batches.setdefault(validator, []).append(position)
+
+    results = [None] * len(types)
+    for validator, positions in batches.items():
+        for position, ok in zip(positions, validator([texts[position] for position in positions])):
+            results[position] = ok
+    return results
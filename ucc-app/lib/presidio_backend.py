@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Presidio/spaCy NER backend for PII detection.
+The spaCy model is loaded once per process with unneeded pipeline components
+disabled, and events are analyzed in batches through nlp.pipe.
+Results are returned as filth-like records so PiiDetectionLogic can enrich
+them exactly like scrubadub filth.
+"""
+
+import logging
+import threading
+from collections import namedtuple
+from typing import Any, Dict, Iterable, List, Optional
+
+from lazy_imports import import_module_timed
+
+DEFAULT_SPACY_MODEL = 'en_core_web_md'
+DEFAULT_NLP_BATCH_SIZE = 32
+DEFAULT_SCORE_THRESHOLD = 0.5
+# Presidio uses NER, lemmas and token attributes; the dependency parser is never used
+DEFAULT_DISABLED_COMPONENTS = ('parser',)
+
+# Presidio entity types mapped to the names scrubadub detectors report,
+# so both backends produce the same types for aggregation and rule generation
+PRESIDIO_TYPE_MAP = {
+    'EMAIL_ADDRESS': 'email',
+    'PHONE_NUMBER': 'phone',
+    'CREDIT_CARD': 'credit_card',
+    'US_SSN': 'social_security_number',
+    'UK_NINO': 'national_insurance_number',
+    'US_DRIVER_LICENSE': 'drivers_licence',
+    'URL': 'url',
+    'IP_ADDRESS': 'IpAddressDetector',
+    'PERSON': 'name',
+}
+
+# [pii_detection] settings read by backend_from_settings
+SETTING_KEYS = ('spacy_model', 'nlp_batch_size', 'presidio_score_threshold', 'presidio_entities',
+                'spacy_disable_components')
+
+# Same attributes PiiDetectionLogic reads from scrubadub filth, plus the Presidio score
+PresidioFilth = namedtuple('PresidioFilth', ['detector_name', 'text', 'beg', 'end', 'score'])
+
+_lock = threading.Lock()
+_engines = {}
+
+
+def presidio_type(entity_type: str) -> str:
+    """Map a Presidio entity type to the type name used in pii_results."""
+    return PRESIDIO_TYPE_MAP.get(entity_type, entity_type.lower())
+
+
+def get_batch_analyzer(model_name: str = DEFAULT_SPACY_MODEL, language: str = 'en',
+                       disabled_components=DEFAULT_DISABLED_COMPONENTS):
+    """
+    Return a BatchAnalyzerEngine for the model, loading it on first use.
+    Engines are cached per (model, language, disabled components) for the life of the process.
+    Args:
+        model_name (str): Installed spaCy model package
+        language (str): Language code the model serves
+        disabled_components (iterable): Pipeline components to disable when loading
+    Returns:
+        BatchAnalyzerEngine
+    Raises:
+        ImportError: If presidio-analyzer, spaCy or the model is not installed
+    """
+    key = (model_name, language, tuple(disabled_components))
+    engine = _engines.get(key)
+    if engine is not None:
+        return engine
+    with _lock:
+        engine = _engines.get(key)
+        if engine is not None:
+            return engine
+        spacy = import_module_timed('spacy')
+        presidio_analyzer = import_module_timed('presidio_analyzer')
+        nlp_engine_module = import_module_timed('presidio_analyzer.nlp_engine')
+        try:
+            nlp = spacy.load(model_name, disable=list(disabled_components))
+        except OSError as e:
+            raise ImportError(f"spaCy model {model_name} is not installed: {e}")
+
+        # Hand the preloaded pipeline to Presidio instead of letting it load its own copy
+        nlp_engine = nlp_engine_module.SpacyNlpEngine(models=[{'lang_code': language, 'model_name': model_name}])
+        nlp_engine.nlp = {language: nlp}
+        analyzer = presidio_analyzer.AnalyzerEngine(nlp_engine=nlp_engine, supported_languages=[language])
+        engine = presidio_analyzer.BatchAnalyzerEngine(analyzer_engine=analyzer)
+        _engines[key] = engine
+        logging.info(f"Loaded Presidio analyzer with {model_name} (disabled: {list(disabled_components)})")
+        return engine
+
+
+class PresidioBackend:
+    """
+    Analyze texts with Presidio and return PresidioFilth per text.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_SPACY_MODEL, batch_size: int = DEFAULT_NLP_BATCH_SIZE,
+                 score_threshold: float = DEFAULT_SCORE_THRESHOLD, entities: Optional[List[str]] = None,
+                 disabled_components=DEFAULT_DISABLED_COMPONENTS, language: str = 'en'):
+        """
+        Args:
+            model_name (str): Installed spaCy model package
+            batch_size (int): Texts per nlp.pipe batch
+            score_threshold (float): Minimum Presidio score to report
+            entities (list): Presidio entity types to detect, or None for all
+            disabled_components (iterable): spaCy components to disable
+            language (str): Language code
+        """
+        self.model_name = model_name
+        self.batch_size = max(1, int(batch_size))
+        self.score_threshold = score_threshold
+        self.entities = entities or None
+        self.disabled_components = tuple(disabled_components)
+        self.language = language
+
+    def load(self):
+        """Load (or fetch the already loaded) analyzer for this configuration."""
+        return get_batch_analyzer(self.model_name, self.language, self.disabled_components)
+
+    def analyze_batch(self, texts: Iterable[str]) -> List[List[PresidioFilth]]:
+        """
+        Analyze many texts in nlp.pipe batches.
+        Args:
+            texts (iterable): Texts to analyze
+        Returns:
+            List[List[PresidioFilth]]: Findings per text, in input order
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        engine = self.load()
+        analyzed = engine.analyze_iterator(
+            texts,
+            language=self.language,
+            batch_size=self.batch_size,
+            entities=self.entities,
+            score_threshold=self.score_threshold,
+        )
+        filth_by_text = []
+        for text, recognizer_results in zip(texts, analyzed):
+            filth_by_text.append([
+                PresidioFilth(presidio_type(res.entity_type), text[res.start:res.end], res.start, res.end,
+                              round(float(res.score), 2))
+                for res in sorted(recognizer_results, key=lambda res: (res.start, res.end))
+            ])
+        return filth_by_text
+
+    def iter_filth(self, text: str) -> List[PresidioFilth]:
+        """Analyze a single text."""
+        return self.analyze_batch([text])[0]
+
+
+def backend_from_settings(settings: Dict[str, Any]) -> PresidioBackend:
+    """
+    Build a PresidioBackend from the [pii_detection] settings stanza.
+    Args:
+        settings (dict): Stanza contents (values may be strings)
+    Returns:
+        PresidioBackend
+    """
+    disabled = settings.get('spacy_disable_components')
+    entities = settings.get('presidio_entities')
+    return PresidioBackend(
+        model_name=settings.get('spacy_model') or DEFAULT_SPACY_MODEL,
+        batch_size=int(settings.get('nlp_batch_size') or DEFAULT_NLP_BATCH_SIZE),
+        score_threshold=float(settings.get('presidio_score_threshold') or DEFAULT_SCORE_THRESHOLD),
+        entities=[name for name in entities.split('|') if name] if entities else None,
+        disabled_components=[name for name in disabled.split('|') if name] if disabled is not None else DEFAULT_DISABLED_COMPONENTS,
+    )
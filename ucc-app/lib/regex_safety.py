@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Safety checks for user-supplied custom regex patterns.
+Patterns are statically screened for constructs prone to catastrophic
+backtracking before they run. When the `regex` module is installed they
+are also executed with a per-match timeout; stdlib `re` has none.
+"""
+
+import re
+from functools import lru_cache
+from typing import Optional
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+try:
+    import regex
+except ImportError:
+    regex = None
+
+# Engine used to compile custom patterns; only `regex` supports timeouts
+REGEX_ENGINE = regex if regex is not None else re
+SUPPORTS_TIMEOUT = regex is not None
+REGEX_ERRORS = (re.error, regex.error) if regex is not None else (re.error,)
+
+# Default per-match timeout for custom patterns, in milliseconds
+DEFAULT_PATTERN_TIMEOUT_MS = 100
+# Text one timeout covers: a search over a longer span gets a proportionally longer timeout,
+# so a linear pattern is never mistaken for a catastrophic one on a large input
+TIMEOUT_WINDOW_CHARS = 64 * 1024
+# Longer patterns are rejected outright
+MAX_PATTERN_LENGTH = 1000
+
+# Characters used to approximate character classes when testing for overlap
+_ALPHABET = [chr(code) for code in range(256)] + ['é', '中', ' ', '٣']
+
+_CATEGORY_TESTS = {
+    sre_parse.CATEGORY_DIGIT: lambda char: char.isdigit(),
+    sre_parse.CATEGORY_NOT_DIGIT: lambda char: not char.isdigit(),
+    sre_parse.CATEGORY_SPACE: lambda char: char.isspace(),
+    sre_parse.CATEGORY_NOT_SPACE: lambda char: not char.isspace(),
+    sre_parse.CATEGORY_WORD: lambda char: char.isalnum() or char == '_',
+    sre_parse.CATEGORY_NOT_WORD: lambda char: not (char.isalnum() or char == '_'),
+}
+
+_REPEATS = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT)
+
+
+class PatternTimeout(Exception):
+    """A custom pattern exceeded its per-match timeout."""
+
+
+def _same_char(char: str, code: int) -> bool:
+    # Custom patterns run case-insensitively, so compare that way
+    return char.lower() == chr(code).lower()
+
+
+def _case_variants(char: str):
+    return {variant for variant in (char, char.lower(), char.upper()) if len(variant) == 1}
+
+
+def _in_matches(items, char: str) -> bool:
+    negate = False
+    matched = False
+    for op, av in items:
+        if op is sre_parse.NEGATE:
+            negate = True
+        elif op is sre_parse.LITERAL:
+            matched = matched or _same_char(char, av)
+        elif op is sre_parse.RANGE:
+            low, high = av
+            matched = matched or any(low <= ord(variant) <= high for variant in _case_variants(char))
+        elif op is sre_parse.CATEGORY:
+            test = _CATEGORY_TESTS.get(av)
+            matched = matched or test is None or test(char)
+        else:
+            matched = True
+    return matched != negate
+
+
+def _chars(items) -> frozenset:
+    """Approximate the set of characters any single-character element inside items can match."""
+    chars = set()
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            chars.update(char for char in _ALPHABET if _same_char(char, av))
+        elif op is sre_parse.NOT_LITERAL:
+            chars.update(char for char in _ALPHABET if not _same_char(char, av))
+        elif op is sre_parse.ANY:
+            chars.update(_ALPHABET)
+        elif op is sre_parse.IN:
+            chars.update(char for char in _ALPHABET if _in_matches(av, char))
+        elif op in _REPEATS:
+            chars |= _chars(av[2])
+        elif op is sre_parse.SUBPATTERN:
+            chars |= _chars(av[-1])
+        elif op is sre_parse.BRANCH:
+            for branch in av[1]:
+                chars |= _chars(branch)
+    return frozenset(chars)
+
+
+def _is_unbounded(av) -> bool:
+    return av[1] == sre_parse.MAXREPEAT
+
+
+def _flatten(items):
+    """Inline groups, which don't change what a sequence matches."""
+    flat = []
+    for op, av in items:
+        if op is sre_parse.SUBPATTERN:
+            flat.extend(_flatten(av[-1]))
+        else:
+            flat.append((op, av))
+    return flat
+
+
+def _inner_unbounded_repeats(items):
+    """Yield unbounded repeats nested anywhere inside items."""
+    for op, av in items:
+        if op in _REPEATS:
+            if _is_unbounded(av):
+                yield op, av
+            yield from _inner_unbounded_repeats(av[2])
+        elif op is sre_parse.SUBPATTERN:
+            yield from _inner_unbounded_repeats(av[-1])
+        elif op is sre_parse.BRANCH:
+            for branch in av[1]:
+                yield from _inner_unbounded_repeats(branch)
+
+
+def _mandatory_elements(items):
+    """Yield elements of a sequence that must match at least one character."""
+    for op, av in items:
+        if op in _REPEATS:
+            if av[0] > 0:
+                yield op, av
+        elif op in (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            continue
+        else:
+            yield op, av
+
+
+def _check_repeat(body) -> Optional[str]:
+    """Explain why a repeated body is ambiguous, or return None if it is not."""
+    # (a+)+, (\w+\s?)+ : an unbounded repeat inside a repeat, with nothing mandatory
+    # in between that the inner repeat can't also match, so the text splits many ways
+    body = _flatten(body)
+    for _op, inner in _inner_unbounded_repeats(body):
+        inner_chars = _chars(inner[2])
+        separators = [element for element in _mandatory_elements(body) if element[1] is not inner]
+        if all(_chars([separator]) & inner_chars for separator in separators):
+            return "nested quantifier: an unbounded repeat inside another repeat can match the same text many ways"
+
+    # (\w|\d)+ : alternatives that overlap under a repeat
+    for op, av in body:
+        if op is sre_parse.BRANCH:
+            branches = [_chars(_flatten(branch)[:1]) for branch in av[1]]
+            for i, first in enumerate(branches):
+                if any(first & other for other in branches[i + 1:]):
+                    return "overlapping alternatives inside a repeat"
+    return None
+
+
+def _walk(items) -> Optional[str]:
+    for op, av in items:
+        if op in _REPEATS:
+            if _is_unbounded(av) or av[1] > 1:
+                reason = _check_repeat(av[2])
+                if reason:
+                    return reason
+            reason = _walk(av[2])
+        elif op is sre_parse.SUBPATTERN:
+            reason = _walk(av[-1])
+        elif op is sre_parse.BRANCH:
+            reason = next((r for r in (_walk(branch) for branch in av[1]) if r), None)
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            reason = _walk(av[1])
+        else:
+            reason = None
+        if reason:
+            return reason
+    return None
+
+
+@lru_cache(maxsize=256)
+def check_pattern(regex_pattern: str) -> Optional[str]:
+    """
+    Statically screen a custom pattern for catastrophic backtracking.
+    Args:
+        regex_pattern (str): Regex source
+    Returns:
+        str: Reason the pattern is rejected, or None if it looks safe
+    """
+    if len(regex_pattern) > MAX_PATTERN_LENGTH:
+        return f"pattern longer than {MAX_PATTERN_LENGTH} characters"
+    try:
+        parsed = sre_parse.parse(regex_pattern, re.IGNORECASE)
+    except (re.error, RecursionError, OverflowError) as e:
+        # The engine reports syntax errors itself; a pattern stdlib can't parse is left to it
+        return None if isinstance(e, re.error) else f"pattern too complex to check: {e}"
+    return _walk(list(parsed))
+
+
+def _crosses_line_end(items) -> bool:
+    """Check whether a match or lookahead could consume a newline or depend on the end of the text."""
+    for op, av in items:
+        if op is sre_parse.AT and av in (sre_parse.AT_END, sre_parse.AT_END_STRING):
+            return True
+        if op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            if av[0] > 0 and '\n' in _chars(av[1]):
+                return True
+            if _crosses_line_end(av[1]):
+                return True
+        elif op in _REPEATS and _crosses_line_end(av[2]):
+            return True
+        elif op is sre_parse.SUBPATTERN and _crosses_line_end(av[-1]):
+            return True
+        elif op is sre_parse.BRANCH and any(_crosses_line_end(branch) for branch in av[1]):
+            return True
+    return False
+
+
+@lru_cache(maxsize=256)
+def line_bounded(regex_pattern: str) -> bool:
+    """
+    Check whether matches of a pattern never span lines, so a search can stop at a
+    newline and find exactly what a search of the whole text would.
+    Args:
+        regex_pattern (str): Regex source
+    Returns:
+        bool: True if the pattern can be searched line window by line window
+    """
+    try:
+        parsed = list(sre_parse.parse(regex_pattern))
+    except (re.error, RecursionError, OverflowError):
+        return False
+    return '\n' not in _chars(parsed) and not _crosses_line_end(parsed)
+
+
+def iter_matches(compiled_pattern, text: str, timeout_ms: Optional[float] = None, overlapped: bool = False):
+    """
+    Yield matches like finditer, with a timeout on each match when supported.
+    Each search covers about TIMEOUT_WINDOW_CHARS of text, ending at a newline, for
+    patterns that can't span lines; other patterns search the rest of the text with
+    the timeout scaled to its length.
+    Args:
+        compiled_pattern: Pattern compiled with REGEX_ENGINE
+        text (str): Text to search
+        timeout_ms (float): Timeout per search of TIMEOUT_WINDOW_CHARS, ignored without the regex module
+        overlapped (bool): Resume each search one character after the previous match
+            starts, so there is a match at every position the pattern matches at
+    Raises:
+        PatternTimeout: If a single search takes longer than its timeout
+    """
+    if not timeout_ms or not SUPPORTS_TIMEOUT:
+        if not overlapped:
+            yield from compiled_pattern.finditer(text)
+            return
+        match = compiled_pattern.search(text)
+        while match is not None:
+            yield match
+            match = compiled_pattern.search(text, match.start() + 1)
+        return
+    windowed = line_bounded(compiled_pattern.pattern)
+    pos = 0
+    while pos <= len(text):
+        endpos = text.find('\n', pos + TIMEOUT_WINDOW_CHARS) if windowed else -1
+        if endpos < 0:
+            endpos = len(text)
+        timeout = timeout_ms / 1000 * max(1.0, (endpos - pos) / TIMEOUT_WINDOW_CHARS)
+        try:
+            match = compiled_pattern.search(text, pos, endpos, timeout=timeout)
+        except TimeoutError:
+            raise PatternTimeout(f"timed out after {timeout * 1000:g} ms")
+        if match is None:
+            if endpos == len(text):
+                return
+            pos = endpos
+            continue
+        yield match
+        if overlapped or match.end() == match.start():
+            pos = match.start() + 1
+        else:
+            pos = match.end()
+
+
+def match_at(compiled_pattern, text: str, pos: int, timeout_ms: Optional[float] = None):
+    """
+    Match a pattern anchored at pos, with a timeout when supported.
+    Raises:
+        PatternTimeout: If the match takes longer than timeout_ms
+    """
+    if not timeout_ms or not SUPPORTS_TIMEOUT:
+        return compiled_pattern.match(text, pos)
+    try:
+        return compiled_pattern.match(text, pos, timeout=timeout_ms / 1000)
+    except TimeoutError:
+        raise PatternTimeout(f"timed out after {timeout_ms:g} ms")
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Cost estimates for the SEDCMD and EXTRACT rules generated from PII findings.
+Every rule is timed over the sample's events and over adversarial inputs
+built to make it backtrack, and the per-event cost is projected to the
+cores needed at a given event rate, so expensive rules are caught before
+the props are deployed.
+"""
+
+import time
+import logging
+from typing import Any, Dict, List, Optional
+
+from pii_detection_logic import PATTERN_CACHE, DocumentIndex
+from regex_safety import DEFAULT_PATTERN_TIMEOUT_MS, SUPPORTS_TIMEOUT, PatternTimeout, check_pattern, iter_matches
+from sedcmd_rules import RULE_FLAGS, rules_for_findings, sub_template
+
+DEFAULT_EPS = 10000
+# Events timed per rule; larger samples are thinned evenly
+MAX_BENCH_EVENTS = 5000
+# Each rule is timed this many times over the events and the fastest run is kept
+BENCH_REPEAT = 3
+# Length of each adversarial input, in characters
+ADVERSARIAL_LENGTH = 2048
+# Per-search timeout on adversarial inputs, in milliseconds; a rule that exceeds it is reported over budget
+ADVERSARIAL_TIMEOUT_MS = DEFAULT_PATTERN_TIMEOUT_MS
+# Runs of one character class that generated value patterns consume and then fail on
+ADVERSARIAL_RUNS = {
+    'letters': 'a',
+    'digits': '7',
+    'spaces': ' ',
+    'dots': '.',
+    'quotes': '"',
+    'equals': '=',
+    'mixed': 'a7.-@:',
+}
+
+
+def extract_rules_for_findings(pii_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Collapse the findings' EXTRACT regexes (generate_regex_for_pii) into one rule per type and pattern.
+    Args:
+        pii_results (list): PII results with type and regex_pattern
+    Returns:
+        list: Rules with 'pattern', 'type' and the number of 'findings' they came from
+    """
+    rules = {}
+    for result in pii_results:
+        pattern = result.get('regex_pattern')
+        if not pattern:
+            continue
+        key = (result['type'], pattern)
+        if key not in rules:
+            rules[key] = {'pattern': pattern, 'type': result['type'], 'findings': 0}
+        rules[key]['findings'] += 1
+    return list(rules.values())
+
+
+def bench_events(text: str) -> List[str]:
+    """Split a sample into events, one per non-blank line, thinned to MAX_BENCH_EVENTS."""
+    events = [line for line in text.splitlines() if line.strip()]
+    if len(events) > MAX_BENCH_EVENTS:
+        step = len(events) / MAX_BENCH_EVENTS
+        events = [events[int(position * step)] for position in range(MAX_BENCH_EVENTS)]
+    return events
+
+
+def adversarial_inputs(compiled_pattern, events: List[str], length: int = ADVERSARIAL_LENGTH) -> Dict[str, str]:
+    """
+    Build inputs likely to be slow for a rule: long runs of one character class,
+    the longest event repeated, and the rule's own first match repeated whole and
+    with its last character cut, which leaves every attempt failing at the end.
+    Args:
+        compiled_pattern: The rule's compiled pattern
+        events (list): Sample events
+        length (int): Length of each input
+    Returns:
+        dict: Input name to input text
+    """
+    def fill(unit: str) -> str:
+        return (unit * (length // len(unit) + 1))[:length]
+
+    inputs = {f'run_of_{name}': fill(unit) for name, unit in ADVERSARIAL_RUNS.items()}
+    if events:
+        inputs['longest_event'] = fill(max(events, key=len) + ' ')
+    for event in events:
+        match = compiled_pattern.search(event)
+        if match and match.end() - match.start() > 1:
+            inputs['repeated_match'] = fill(match.group(0))
+            inputs['near_miss'] = fill(match.group(0)[:-1])
+            break
+    return inputs
+
+
+def _run_time(operation, inputs: List[str], repeat: int) -> float:
+    """Fastest of repeat runs of operation over every input, in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for value in inputs:
+            operation(value)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _adversarial_operation(compiled_pattern, kind: str, timeout_ms: Optional[float]):
+    """
+    Return the rule's work on one adversarial input, with every search limited to timeout_ms:
+    all matches for a SEDCMD, the first for an EXTRACT.
+    """
+    if kind == 'sedcmd':
+        def operation(value):
+            for _match in iter_matches(compiled_pattern, value, timeout_ms):
+                pass
+    else:
+        def operation(value):
+            return next(iter_matches(compiled_pattern, value, timeout_ms), None)
+    return operation
+
+
+def benchmark_rule(rule: Dict[str, Any], kind: str, events: List[str], eps: float,
+                   repeat: int = BENCH_REPEAT, timeout_ms: Optional[float] = ADVERSARIAL_TIMEOUT_MS) -> Dict[str, Any]:
+    """
+    Time one rule per event over the sample and on adversarial inputs.
+    A SEDCMD is timed as a substitution, an EXTRACT as a search.
+    Args:
+        rule (dict): Rule with 'pattern' (and 'replacement' for a SEDCMD)
+        kind (str): 'sedcmd' or 'extract'
+        events (list): Sample events
+        eps (float): Events per second to project cores for
+        repeat (int): Timed runs per input; the fastest is kept
+        timeout_ms (float): Per-search timeout on adversarial inputs, with the `regex` module
+    Returns:
+        dict: The rule with us_per_event, cores, worst_case_us and worst_case_input,
+        or over_budget in place of worst_case_us when an adversarial search timed out
+    """
+    row = dict(rule, kind=kind)
+    compiled_pattern = PATTERN_CACHE.get(rule['pattern'], RULE_FLAGS)
+    if compiled_pattern is None:
+        row['error'] = PATTERN_CACHE.error_for(rule['pattern'], RULE_FLAGS)
+        return row
+    if kind == 'sedcmd':
+        template = sub_template(rule['replacement'])
+
+        def operation(value):
+            return compiled_pattern.sub(template, value)
+    else:
+        operation = compiled_pattern.search
+
+    us_per_event = _run_time(operation, events, repeat) * 1e6 / len(events) if events else 0.0
+    row['us_per_event'] = round(us_per_event, 3)
+    row['cores'] = round(eps * us_per_event / 1e6, 4)
+
+    risk = check_pattern(rule['pattern'])
+    if risk:
+        row['risk'] = risk
+        if not (SUPPORTS_TIMEOUT and timeout_ms):
+            # Adversarial input could hang stdlib re for good; report the reason instead of timing it
+            logging.warning(f"Skipping adversarial timing for rule {rule['pattern']!r}: {risk}")
+            return row
+    operation = _adversarial_operation(compiled_pattern, kind, timeout_ms)
+    worst_name, worst_us = None, 0.0
+    for name, value in adversarial_inputs(compiled_pattern, events).items():
+        try:
+            elapsed_us = _run_time(operation, [value], repeat) * 1e6
+        except PatternTimeout as e:
+            logging.warning(f"Rule {rule['pattern']!r} {e} on adversarial input {name}")
+            row['over_budget'] = str(e)
+            row['worst_case_input'] = name
+            return row
+        if elapsed_us > worst_us:
+            worst_name, worst_us = name, elapsed_us
+    row['worst_case_us'] = round(worst_us, 3)
+    row['worst_case_input'] = worst_name
+    return row
+
+
+def estimate_rule_cost(text: str, pii_results: List[Dict[str, Any]], eps: float = DEFAULT_EPS,
+                       index: Optional[DocumentIndex] = None,
+                       timeout_ms: Optional[float] = ADVERSARIAL_TIMEOUT_MS) -> Dict[str, Any]:
+    """
+    Benchmark the SEDCMD and EXTRACT rules generated for the findings and rank them by cost.
+    Args:
+        text (str): Sample the findings were detected in; each line is an event
+        pii_results (list): PII results with type, text, start, end and regex_pattern
+        eps (float): Events per second to project cores for
+        index (DocumentIndex): Prebuilt index of text; built on demand if omitted
+        timeout_ms (float): Per-search timeout on adversarial inputs
+    Returns:
+        Dict[str, Any]: Rules ranked by µs per event, with per-kind and overall totals
+        and the patterns of rules over budget on adversarial input
+    """
+    events = bench_events(text)
+    rows = [benchmark_rule(rule, 'sedcmd', events, eps, timeout_ms=timeout_ms)
+            for rule in rules_for_findings(text, pii_results, index)]
+    rows.extend(benchmark_rule(rule, 'extract', events, eps, timeout_ms=timeout_ms)
+                for rule in extract_rules_for_findings(pii_results))
+    rows.sort(key=lambda row: -row.get('us_per_event', 0.0))
+
+    totals = {}
+    for kind in ('sedcmd', 'extract'):
+        us_per_event = sum(row.get('us_per_event', 0.0) for row in rows if row['kind'] == kind)
+        totals[kind] = {'us_per_event': round(us_per_event, 3), 'cores': round(eps * us_per_event / 1e6, 4)}
+    return {
+        'eps': eps,
+        'events': len(events),
+        'rules': rows,
+        'totals': totals,
+        'over_budget': [row['pattern'] for row in rows if 'over_budget' in row],
+    }
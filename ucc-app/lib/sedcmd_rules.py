@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+SEDCMD rules generated from PII findings, and a server-side preview of what
+they redact. Rules are compiled once and applied together in one pass over
+the sample, so coverage gaps and per-rule cost show up before deployment.
+Per-finding rules can be minimized into the smallest set that redacts the
+sample the same way, since every SEDCMD is a separate pass over every event.
+"""
+
+import re
+import time
+import logging
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from pattern_synthesis import ValuePatterns
+from pii_detection_logic import PATTERN_CACHE, CombinedPattern, DocumentIndex, generate_sedcmd_regex
+
+# Each line of a sample is an event, so ^ and $ anchor at line boundaries as they would per event
+RULE_FLAGS = re.MULTILINE
+# Replacement templates that refer back to groups of their own pattern
+REPLACEMENT_GROUP_REGEX = re.compile(r'\\(?:\d|g<)')
+
+# Field-context rules from generate_sedcmd_regex: key=(value) and "key":"(value)"
+KV_RULE_REGEX = re.compile(r'(\w+)=\((.*)\)', re.S)
+KV_REPLACEMENT_REGEX = re.compile(r'(\w+)=(.*)', re.S)
+JSON_RULE_REGEX = re.compile(r'"(\w+)"\\s\*:\\s\*"\((.*)\)"', re.S)
+JSON_REPLACEMENT_REGEX = re.compile(r'"(\w+)":"(.*)"', re.S)
+
+
+def rules_for_findings(text: str, pii_results: List[Dict[str, Any]],
+                       index: Optional[DocumentIndex] = None) -> List[Dict[str, Any]]:
+    """
+    Generate the SEDCMD rule for every finding and collapse identical rules.
+    Value patterns are synthesized from all findings of a type where they generalize
+    without matching the text outside the findings.
+    Args:
+        text (str): Text the findings were detected in
+        pii_results (list): PII results with type, text, start and end
+        index (DocumentIndex): Prebuilt index of text; built on demand if omitted
+    Returns:
+        List[Dict[str, Any]]: Rules with pattern, replacement and the number of findings that produced them
+    """
+    if index is None:
+        index = DocumentIndex(text)
+    value_patterns = ValuePatterns.from_results(pii_results, text)
+    rules = {}
+    for result in pii_results:
+        rule = generate_sedcmd_regex(text, result['start'], result['end'], result['type'], result['text'], index,
+                                     value_patterns)
+        key = (rule['pattern'], rule['replacement'])
+        if key in rules:
+            rules[key]['findings'] += 1
+        else:
+            rules[key] = dict(rule, findings=1)
+    return list(rules.values())
+
+
+class SedcmdRuleSet:
+    """
+    SEDCMD rules compiled once and applied together.
+
+    Rules are merged into a CombinedPattern and the text is walked once.
+    Rules that cannot be merged safely run in their own pass and only claim
+    text no earlier match covered.
+
+    Splunk applies each SEDCMD to the output of the previous one. The preview
+    matches that whenever rules don't overlap; where they do, the leftmost
+    match wins and the earlier rule wins ties, like a single regex would.
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]]):
+        """
+        Args:
+            rules (list): Dicts with 'pattern' and 'replacement' (as from rules_for_findings)
+        """
+        self.rules = rules
+        self.compiled = {}
+        self.invalid = []
+        for rule_index, rule in enumerate(rules):
+            compiled_pattern = PATTERN_CACHE.get(rule['pattern'], RULE_FLAGS)
+            if compiled_pattern is None:
+                self.invalid.append({'pattern': rule['pattern'], 'replacement': rule['replacement'],
+                                     'reason': f"invalid regex: {PATTERN_CACHE.error_for(rule['pattern'], RULE_FLAGS)}"})
+                continue
+            self.compiled[rule_index] = compiled_pattern
+        self.patterns = CombinedPattern(
+            ((rule_index, rules[rule_index]['pattern'], compiled_pattern)
+             for rule_index, compiled_pattern in self.compiled.items()), RULE_FLAGS)
+
+    def _replacement(self, rule_index: int, text: str, start: int) -> str:
+        replacement = self.rules[rule_index]['replacement']
+        if REPLACEMENT_GROUP_REGEX.search(replacement):
+            return self.compiled[rule_index].match(text, start).expand(replacement)
+        return replacement
+
+    def matches(self, text: str) -> List[Tuple[int, int, int]]:
+        """
+        Find the spans the rules replace.
+        Args:
+            text (str): Text to redact
+        Returns:
+            list: Non-overlapping (start, end, rule index) tuples in text order
+        """
+        spans = [(match.start(), match.end(), rule_index) for rule_index, match in self.patterns.iter_combined(text)]
+        for rule_index, compiled_pattern in self.patterns.fallback:
+            starts = [span[0] for span in spans]
+            claimed = []
+            for match in compiled_pattern.finditer(text):
+                start, end = match.span()
+                if start == end:
+                    continue
+                position = bisect_right(starts, start)
+                if position and spans[position - 1][1] > start:
+                    continue
+                if position < len(spans) and spans[position][0] < end:
+                    continue
+                claimed.append((start, end, rule_index))
+            spans = sorted(spans + claimed)
+        return spans
+
+    def apply(self, text: str) -> Tuple[str, List[Tuple[int, int, int]]]:
+        """
+        Redact the text in one pass.
+        Args:
+            text (str): Text to redact
+        Returns:
+            tuple: (redacted text, replaced spans as (start, end, rule index))
+        """
+        spans = self.matches(text)
+        pieces = []
+        position = 0
+        for start, end, rule_index in spans:
+            pieces.append(text[position:start])
+            pieces.append(self._replacement(rule_index, text, start))
+            position = end
+        pieces.append(text[position:])
+        return ''.join(pieces), spans
+
+    def profile(self, text: str):
+        """
+        Time each rule in its own pass, as Splunk would run it.
+        Args:
+            text (str): Text to scan
+        Yields:
+            tuple: (rule index, seconds, match count)
+        """
+        for rule_index, compiled_pattern in self.compiled.items():
+            start = time.perf_counter()
+            count = sum(1 for _match in compiled_pattern.finditer(text))
+            yield rule_index, time.perf_counter() - start, count
+
+
+def missed_findings(pii_results: List[Dict[str, Any]], spans: List[Tuple[int, int, int]]) -> List[Dict[str, Any]]:
+    """
+    Return the findings no replaced span fully covers.
+    Args:
+        pii_results (list): PII results with start and end offsets
+        spans (list): Replaced (start, end, rule index) spans in text order
+    """
+    starts = [span[0] for span in spans]
+    missed = []
+    for result in pii_results:
+        position = bisect_right(starts, result['start']) - 1
+        if position < 0 or spans[position][1] < result['end']:
+            missed.append({key: result[key] for key in ('type', 'field', 'text', 'start', 'end') if key in result})
+    return missed
+
+
+def sub_template(replacement: str) -> str:
+    """Return a rule's replacement as a re.sub template."""
+    if REPLACEMENT_GROUP_REGEX.search(replacement):
+        return replacement
+    # Literal replacement: don't let re interpret backslashes in it
+    return replacement.replace('\\', '\\\\')
+
+
+def apply_sequential(text: str, rules: List[Dict[str, Any]]) -> str:
+    """
+    Apply rules one after another, each to the previous rule's output, as Splunk applies SEDCMDs.
+    Invalid rules are skipped.
+    """
+    for rule in rules:
+        compiled_pattern = PATTERN_CACHE.get(rule['pattern'], RULE_FLAGS)
+        if compiled_pattern is not None:
+            text = compiled_pattern.sub(sub_template(rule['replacement']), text)
+    return text
+
+
+def _merge_key(rule: Dict[str, Any]):
+    """
+    Return (merge key, field) for a rule that can share a pattern with others,
+    or (None, None). Field-context rules merge when only the field differs;
+    other rules merge when their replacements are identical literals.
+    """
+    for shape, rule_regex, replacement_regex in (('kv', KV_RULE_REGEX, KV_REPLACEMENT_REGEX),
+                                                  ('json', JSON_RULE_REGEX, JSON_REPLACEMENT_REGEX)):
+        pattern_match = rule_regex.fullmatch(rule['pattern'])
+        replacement_match = replacement_regex.fullmatch(rule['replacement'])
+        if (pattern_match and replacement_match and pattern_match.group(1) == replacement_match.group(1)
+                and not REPLACEMENT_GROUP_REGEX.search(replacement_match.group(2))):
+            return (shape, pattern_match.group(2), replacement_match.group(2)), pattern_match.group(1)
+    if REPLACEMENT_GROUP_REGEX.search(rule['replacement']):
+        return None, None
+    return ('literal', rule['replacement']), None
+
+
+def _merged_rule(key, group: List[Dict[str, Any]], fields: List[str]) -> Dict[str, Any]:
+    """Build one rule covering every rule in a merge group."""
+    findings = sum(rule.get('findings', 0) for rule in group)
+    if key[0] == 'literal':
+        pattern = '|'.join(f"(?:{rule['pattern']})" for rule in group)
+        return {'pattern': pattern, 'replacement': key[1], 'findings': findings, 'merged_from': len(group)}
+    # Longest field first, so 'user_email' is tried before 'email' at the same position
+    alternation = '|'.join(sorted(dict.fromkeys(fields), key=lambda field: (-len(field), field)))
+    if key[0] == 'kv':
+        pattern, replacement = f'({alternation})=({key[1]})', f'\\1={key[2]}'
+    else:
+        pattern, replacement = f'"({alternation})"\\s*:\\s*"({key[1]})"', f'"\\1":"{key[2]}"'
+    return {'pattern': pattern, 'replacement': replacement, 'findings': findings, 'merged_from': len(group)}
+
+
+def minimize_rules(text: str, rules: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Reduce rules to the smallest set that redacts the sample exactly as the original set does.
+    Identical rules are deduplicated; field-context rules that differ only in the
+    field become one rule with a field alternation; other rules with the same
+    literal replacement become one alternation. Each merge is checked against
+    the sample and reverted if it redacts differently, and the final set is
+    checked as a whole.
+    Args:
+        text (str): Sample to verify against
+        rules (list): Rules with 'pattern' and 'replacement' (and optionally 'findings')
+    Returns:
+        tuple: (minimized rules, summary with rule counts and verification outcome)
+    """
+    deduped = {}
+    for rule in rules:
+        key = (rule['pattern'], rule['replacement'])
+        if key in deduped:
+            deduped[key]['findings'] = deduped[key].get('findings', 0) + rule.get('findings', 0)
+        else:
+            deduped[key] = dict(rule)
+    deduped = list(deduped.values())
+
+    groups = OrderedDict()
+    for rule in deduped:
+        compiled_pattern = PATTERN_CACHE.get(rule['pattern'], RULE_FLAGS)
+        key, field = _merge_key(rule)
+        if compiled_pattern is None or key is None or not CombinedPattern.can_merge(rule['pattern'], compiled_pattern):
+            key, field = ('single', len(groups)), None
+        groups.setdefault(key, []).append((rule, field))
+
+    minimized = []
+    reverted = 0
+    for key, members in groups.items():
+        group = [rule for rule, _field in members]
+        if len(group) == 1:
+            minimized.append(group[0])
+            continue
+        merged = _merged_rule(key, group, [field for _rule, field in members])
+        if PATTERN_CACHE.get(merged['pattern'], RULE_FLAGS) is not None \
+                and apply_sequential(text, [merged]) == apply_sequential(text, group):
+            minimized.append(merged)
+        else:
+            minimized.extend(group)
+            reverted += 1
+
+    expected = apply_sequential(text, rules)
+    verified = apply_sequential(text, minimized) == expected
+    if not verified:
+        # Merges that are equivalent alone can still interact through rule order
+        logging.warning("Minimized SEDCMD rules redact the sample differently; keeping the deduplicated rules")
+        minimized = deduped
+        verified = apply_sequential(text, minimized) == expected
+    summary = {
+        'original_rules': len(rules),
+        'deduplicated_rules': len(deduped),
+        'minimized_rules': len(minimized),
+        'reverted_merges': reverted,
+        'verified': verified,
+    }
+    return minimized, summary
+
+
+def redact_preview(text: str, pii_results: List[Dict[str, Any]], rules: Optional[List[Dict[str, Any]]] = None,
+                   index: Optional[DocumentIndex] = None, minimize: bool = False) -> Dict[str, Any]:
+    """
+    Apply the SEDCMD rules for the findings to the text and report coverage and cost.
+    Args:
+        text (str): Sample the findings were detected in
+        pii_results (list): PII results with type, text, start and end
+        rules (list): Rules to apply; generated from the findings if omitted
+        index (DocumentIndex): Prebuilt index of text; built on demand if omitted
+        minimize (bool): Preview the minimized rule set and report the minimization
+    Returns:
+        Dict[str, Any]: Redacted text, per-rule matches and time, and missed findings
+    """
+    if rules is None:
+        rules = rules_for_findings(text, pii_results, index)
+    minimization = None
+    if minimize:
+        rules, minimization = minimize_rules(text, rules)
+    rule_set = SedcmdRuleSet(rules)
+
+    start = time.perf_counter()
+    redacted_text, spans = rule_set.apply(text)
+    pass_seconds = time.perf_counter() - start
+
+    matched = [0] * len(rules)
+    for _start, _end, rule_index in spans:
+        matched[rule_index] += 1
+    rule_rows = [dict(rule, matches=matched[rule_index]) for rule_index, rule in enumerate(rules)]
+    for rule_index, seconds, count in rule_set.profile(text):
+        rule_rows[rule_index]['ms'] = round(seconds * 1000, 3)
+        rule_rows[rule_index]['standalone_matches'] = count
+
+    missed = missed_findings(pii_results, spans)
+    if missed:
+        logging.info(f"Redaction preview: {len(missed)} of {len(pii_results)} findings not covered by the rules")
+    preview = {
+        'redacted_text': redacted_text,
+        'rules': rule_rows,
+        'missed': missed,
+        'covered': len(pii_results) - len(missed),
+        'total_findings': len(pii_results),
+        'pass_ms': round(pass_seconds * 1000, 3),
+    }
+    if rule_set.invalid:
+        preview['invalid_rules'] = rule_set.invalid
+    if minimization is not None:
+        preview['minimization'] = minimization
+    return preview
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Background warm-up for the persistent REST handlers.
+Handlers can preload detectors, compile regex catalogs and open HTTP
+connections when splunkd spawns them, instead of on the first user request.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+import configparser
+from typing import Any, Callable, Dict, Optional
+
+app_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+SETTINGS_CONF = 'cim-plicity_settings.conf'
+
+
+def read_app_setting(stanza: str, key: str, default: Optional[str] = None) -> Optional[str]:
+    """
+    Read a setting straight from the app's conf files (local overrides default).
+    Used where no session key is available yet, e.g. in handler constructors.
+    Args:
+        stanza (str): Stanza name
+        key (str): Setting name
+        default (str): Value returned when the setting is absent
+    Returns:
+        str: Setting value
+    """
+    parser = configparser.ConfigParser(strict=False, interpolation=None)
+    parser.read([
+        os.path.join(app_path, 'default', SETTINGS_CONF),
+        os.path.join(app_path, 'local', SETTINGS_CONF),
+    ])
+    return parser.get(stanza, key, fallback=default)
+
+
+def warmup_enabled(handler_name: str) -> bool:
+    """Check whether warm-up is switched on for a handler in the [warmup] stanza."""
+    value = read_app_setting('warmup', handler_name, read_app_setting('warmup', 'enabled', 'false'))
+    return str(value).strip().lower() in ('1', 'true', 't', 'yes', 'y', 'on')
+
+
+def is_status_request(inbound_payload: Dict[str, Any]) -> bool:
+    """
+    Check whether a persistent handler request asks for warm-up status, with
+    {"action": "status"} in the payload or an action=status query parameter.
+    The HTTP method alone never makes a status request.
+    """
+    query = inbound_payload.get('query') or []
+    # splunkd passes query parameters as [name, value] pairs
+    pairs = query.items() if isinstance(query, dict) else query
+    if any(isinstance(pair, (list, tuple)) and len(pair) == 2 and tuple(pair) == ('action', 'status')
+           for pair in pairs):
+        return True
+    try:
+        posted_data = json.loads(inbound_payload.get('payload') or '{}')
+    except (TypeError, ValueError):
+        return False
+    return isinstance(posted_data, dict) and posted_data.get('action') == 'status'
+
+
+def prime_http_session(session, url: str, timeout: float = 5) -> bool:
+    """
+    Open a pooled connection (DNS, TCP and TLS) to the host serving url.
+    Args:
+        session: requests.Session to prime
+        url (str): Any URL on the target host
+        timeout (float): Seconds to wait
+    Returns:
+        bool: True if the host answered
+    """
+    try:
+        session.head(url, timeout=timeout, allow_redirects=False)
+        return True
+    except Exception as e:
+        logging.warning(f"Could not prime HTTP session for {url}: {e}")
+        return False
+
+
+class Warmup:
+    """
+    Runs a warm-up function once in a background thread and tracks readiness.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._thread = None
+        self.state = 'disabled'
+        self.started_at = None
+        self.duration_ms = None
+        self.error = None
+        self.details = {}
+
+    def start(self, warmup_func: Callable[[], Optional[Dict[str, Any]]]) -> None:
+        """
+        Start warming up without blocking the caller.
+        Args:
+            warmup_func (callable): Does the warm-up work; may return details to report
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.state = 'warming'
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._run, args=(warmup_func,),
+                                            name=f"{self.name}-warmup", daemon=True)
+            self._thread.start()
+
+    def _run(self, warmup_func) -> None:
+        start = time.perf_counter()
+        try:
+            details = warmup_func() or {}
+            with self._lock:
+                self.details = details
+                self.state = 'ready'
+        except Exception as e:
+            logging.error(f"Warm-up of {self.name} failed: {e}", exc_info=True)
+            with self._lock:
+                self.error = str(e)
+                self.state = 'failed'
+        finally:
+            with self._lock:
+                self.duration_ms = round((time.perf_counter() - start) * 1000, 1)
+            logging.info(f"Warm-up of {self.name} finished: {self.status()}")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until warm-up finishes; returns False on timeout."""
+        thread = self._thread
+        if thread is None:
+            return True
+        thread.join(timeout)
+        return not thread.is_alive()
+
+    def status(self) -> Dict[str, Any]:
+        """Return warm-up state, duration and readiness for the status endpoint."""
+        with self._lock:
+            return {
+                'handler': self.name,
+                'state': self.state,
+                'ready': self.state in ('ready', 'disabled'),
+                'duration_ms': self.duration_ms,
+                'error': self.error,
+                'details': dict(self.details),
+            }